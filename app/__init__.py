@@ -1,33 +1,170 @@
-import insightface
+import logging
+import time
 from config import \
-    VECTOR_DB, VECTOR_DB_HOST, VECTOR_DB_PORT, \
+    VECTOR_DB, VECTOR_DB_HOST, VECTOR_DB_PORT, VECTOR_DB_PATH, VECTOR_DB_DTYPE, SCROLL_PAGE_SIZE, SCROLL_PREFETCH, \
+    VECTOR_DB_PREFER_GRPC, VECTOR_DB_GRPC_PORT, VECTOR_DB_TIMEOUT, VECTOR_DB_MAX_CONNECTIONS, \
+    VECTOR_DB_KEEPALIVE_CONNECTIONS, VECTOR_DB_KEEPALIVE_SECONDS, VECTOR_DB_UPSERT_BATCH_SIZE, VECTOR_DB_UPSERT_PARALLEL, \
+    VECTOR_DB_ENSURE_SCHEMA, VECTOR_DB_QUANTIZATION, VECTOR_DB_ON_DISK, VECTOR_DB_HNSW_M, VECTOR_DB_HNSW_EF_CONSTRUCT, \
+    VECTOR_INDEX, ANN_NLIST, ANN_NPROBE, ANN_PQ_M, ANN_SAVE_EVERY_ROWS, \
     OBJECT_STORAGE, S3_ENDPOINT, S3_ACCESS_KEY, S3_SECRET_KEY, S3_SECURE, \
-    BUFFALO_L_PATH, INSWAPPER_PATH, CODEFORMER_MODEL
-from library.restore_faces import FaceRestorer
+    S3_MAX_CONNECTIONS, S3_FETCH_WORKERS, UPLOAD_WORKERS, UPLOAD_QUEUE_SIZE, \
+    S3_REGION, S3_URL_EXPIRY_SECONDS, S3_URL_CACHE_SIZE, S3_URL_MIN_REMAINING_SECONDS, \
+    LOCAL_STORAGE_PATH, LOCAL_STORAGE_URL_PREFIX, LOCAL_STORAGE_FSYNC, \
+    STORAGE_CACHE_MEMORY_BYTES, STORAGE_CACHE_DIR, STORAGE_CACHE_DISK_BYTES, STORAGE_CACHE_REVALIDATE_SECONDS, \
+    IMAGE_DERIVATIVES, IMAGE_DERIVATIVE_FORMAT, IMAGE_DERIVATIVE_QUALITY, \
+    IMAGE_JPEG_QUALITY, IMAGE_JPEG_OPTIMIZE, IMAGE_JPEG_PROGRESSIVE, IMAGE_USE_TURBOJPEG, \
+    BUFFALO_L_PATH, INSWAPPER_PATH, CODEFORMER_MODEL, FACE_ANALYSIS_MAX_BATCH_SIZE, \
+    RESTORER_BATCH_SIZE, RESTORER_POOL_SIZE, RESTORER_TORCH_THREADS, \
+    WARM_UP_MODELS, WARM_UP_IN_BACKGROUND, FACE_ANALYSIS_CACHE_DIR, \
+    INFERENCE_PROFILE, ORT_INTRA_OP_THREADS, ORT_INTER_OP_THREADS, ORT_GRAPH_OPTIMIZATION, \
+    ORT_EXECUTION_MODE, ORT_ENABLE_MEM_ARENA, ORT_ALLOW_SPINNING, ORT_PROVIDERS
+from library.lazy_registry import ModelRegistry
+from library.io_pipeline import IOPipeline
+from library.image_derivatives import parse_derivative_sizes
+from library.image_codec import ImageCodec
 from database import db_connection
 from storage import storage_client
 
+logger = logging.getLogger(__name__)
+_started_at = time.perf_counter()
+
 db = db_connection(
-    VECTOR_DB, 
-    host=VECTOR_DB_HOST, 
-    port=VECTOR_DB_PORT
+    VECTOR_DB,
+    host=VECTOR_DB_HOST,
+    port=VECTOR_DB_PORT,
+    path=VECTOR_DB_PATH,
+    dtype=VECTOR_DB_DTYPE,
+    scroll_page_size=SCROLL_PAGE_SIZE,
+    scroll_prefetch=SCROLL_PREFETCH,
+    index=VECTOR_INDEX,
+    nlist=ANN_NLIST,
+    nprobe=ANN_NPROBE,
+    pq_m=ANN_PQ_M,
+    index_save_rows=ANN_SAVE_EVERY_ROWS,
+    client_options=dict(
+        prefer_grpc=VECTOR_DB_PREFER_GRPC,
+        grpc_port=VECTOR_DB_GRPC_PORT,
+        timeout=VECTOR_DB_TIMEOUT,
+        max_connections=VECTOR_DB_MAX_CONNECTIONS,
+        keepalive_connections=VECTOR_DB_KEEPALIVE_CONNECTIONS,
+        keepalive_seconds=VECTOR_DB_KEEPALIVE_SECONDS,
+        upsert_batch_size=VECTOR_DB_UPSERT_BATCH_SIZE,
+        upsert_parallel=VECTOR_DB_UPSERT_PARALLEL,
+    )
     )
 
+def ensure_db_schema():
+    """
+    Create the collection and payload indexes if they are missing (VECTOR_DB_ENSURE_SCHEMA).
+    Called from the main of run_app.py / run_scheduler.py, not on import, so batch workers
+    and other importers do not all race to create the collection.
+    """
+    if not VECTOR_DB_ENSURE_SCHEMA:
+        return
+    # 없으면 만들고, 다른 설정은 경고만 남긴다 (기존 collection 은 변경하지 않음)
+    db.ensure_schema(
+        on_disk=VECTOR_DB_ON_DISK,
+        quantization=VECTOR_DB_QUANTIZATION or None,
+        hnsw_m=VECTOR_DB_HNSW_M,
+        hnsw_ef_construct=VECTOR_DB_HNSW_EF_CONSTRUCT
+        )
+
 storage = storage_client(
     OBJECT_STORAGE,
     endpoint=S3_ENDPOINT,
     access_key=S3_ACCESS_KEY,
     secret_key=S3_SECRET_KEY,
-    secure=S3_SECURE
+    secure=S3_SECURE,
+    max_connections=S3_MAX_CONNECTIONS,
+    fetch_workers=S3_FETCH_WORKERS,
+    region=S3_REGION,
+    url_expiry_seconds=S3_URL_EXPIRY_SECONDS,
+    url_cache_size=S3_URL_CACHE_SIZE,
+    url_min_remaining_seconds=S3_URL_MIN_REMAINING_SECONDS,
+    root=LOCAL_STORAGE_PATH,
+    url_prefix=LOCAL_STORAGE_URL_PREFIX,
+    fsync=LOCAL_STORAGE_FSYNC,
+    cache_memory_bytes=STORAGE_CACHE_MEMORY_BYTES,
+    cache_dir=STORAGE_CACHE_DIR,
+    cache_disk_bytes=STORAGE_CACHE_DISK_BYTES,
+    cache_revalidate_seconds=STORAGE_CACHE_REVALIDATE_SECONDS,
+    derivatives=parse_derivative_sizes(IMAGE_DERIVATIVES),
+    derivative_format=IMAGE_DERIVATIVE_FORMAT,
+    derivative_quality=IMAGE_DERIVATIVE_QUALITY,
+    codec=ImageCodec(
+        quality=IMAGE_JPEG_QUALITY,
+        optimize=IMAGE_JPEG_OPTIMIZE,
+        progressive=IMAGE_JPEG_PROGRESSIVE,
+        use_turbojpeg=IMAGE_USE_TURBOJPEG
+    )
     )
 
-face_detector = insightface.app.FaceAnalysis(name='buffalo_l', root=BUFFALO_L_PATH)
-face_detector.prepare(ctx_id=-1)
+io_pipeline = IOPipeline(max_workers=UPLOAD_WORKERS, max_pending=UPLOAD_QUEUE_SIZE)
+
+# AI 모델은 처음 사용될 때 로드된다 (WARM_UP_MODELS 로 미리 로드 가능)
+registry = ModelRegistry()
+
+def _load_inference_profile():
+    from library.onnx_profile import InferenceProfile
+    return InferenceProfile(
+        name=INFERENCE_PROFILE,
+        intra_op_threads=ORT_INTRA_OP_THREADS,
+        inter_op_threads=ORT_INTER_OP_THREADS,
+        graph_optimization=ORT_GRAPH_OPTIMIZATION,
+        execution_mode=ORT_EXECUTION_MODE,
+        enable_mem_arena=ORT_ENABLE_MEM_ARENA,
+        allow_spinning=ORT_ALLOW_SPINNING,
+        providers=ORT_PROVIDERS
+        )
+
+def _load_face_detector():
+    return inference_profile.load_face_analysis(BUFFALO_L_PATH)
+
+def _load_batch_face_detector():
+    from library.batch_face_analysis import BatchFaceAnalysis
+    return BatchFaceAnalysis(face_detector.get_object(), max_batch_size=FACE_ANALYSIS_MAX_BATCH_SIZE)
+
+def _load_face_swapper():
+    return inference_profile.load_model(inference_profile.model_path(INSWAPPER_PATH))
+
+def _load_face_restorer():
+    from library.restore_faces import FaceRestorerPool
+    return FaceRestorerPool(
+        model_path=CODEFORMER_MODEL,
+        size=RESTORER_POOL_SIZE,
+        batch_size=RESTORER_BATCH_SIZE,
+        torch_threads=RESTORER_TORCH_THREADS
+        )
+
+def _load_face_cache():
+    if not FACE_ANALYSIS_CACHE_DIR:
+        return None
+    from library.face_cache import FaceAnalysisCache
+    # 모델 profile 이 다르면 분석 결과도 다르므로 namespace 를 분리한다
+    return FaceAnalysisCache(FACE_ANALYSIS_CACHE_DIR, namespace=inference_profile.pack_name())
+
+def _load_base_faces():
+    from library.face_cache import load_analyzed_images
+    from library.face_swap import SwapTemplate
+    images = load_analyzed_images(storage, "base-images", ["m_", "f_"], face_detector, cache=face_cache.get_object())
+    # 템플릿 쪽 swap 연산은 이미지마다 한 번만 계산해 둔다
+    return {
+        "f_": [SwapTemplate(face_swapper, f, faces[0]) for f, faces in images["f_"] if faces],
+        "m_": [SwapTemplate(face_swapper, m, faces[0]) for m, faces in images["m_"] if faces],
+    }
+
+inference_profile = registry.register("inference_profile", _load_inference_profile)
+face_detector = registry.register("face_detector", _load_face_detector)
+batch_face_detector = registry.register("batch_face_detector", _load_batch_face_detector)
+face_swapper = registry.register("face_swapper", _load_face_swapper)
+face_restorer = registry.register("face_restorer", _load_face_restorer)
+face_cache = registry.register("face_cache", _load_face_cache)
+base_faces = registry.register("base_faces", _load_base_faces)
 
-face_swapper = insightface.model_zoo.get_model(INSWAPPER_PATH)
+F_BASE = registry.register("F_BASE", lambda: base_faces["f_"])
+M_BASE = registry.register("M_BASE", lambda: base_faces["m_"])
 
-face_restorer = FaceRestorer(model_path=CODEFORMER_MODEL)
+if WARM_UP_MODELS:
+    registry.warm_up(WARM_UP_MODELS, background=WARM_UP_IN_BACKGROUND)
 
-images = storage.load_base_images_list("base-images", ["m_", "f_"])
-F_BASE = [(f, face_detector.get(f)[0]) for f in images["f_"]]
-M_BASE = [(m, face_detector.get(m)[0]) for m in images["m_"]]
\ No newline at end of file
+logger.info(f"app initialized in {time.perf_counter() - _started_at:.2f}s")
@@ -1,14 +1,26 @@
 from app import storage, face_detector, face_swapper, face_restorer
 
-def update_images_by_face(bucket_name, file_name, image, face, target_face=None, face_seq=0, restore=False):
-    
-    if not target_face:
-        faces = face_detector.get(image)
-        target_face = faces[face_seq]
+def swap_face_image(image, face, target_face=None, face_seq=0, restore=False, template=None):
 
-    img_face = face_swapper.get(image, target_face, face)
+    if template is not None:
+        # precomputed SwapTemplate of a base image
+        img_face = template.swap(face)
+        target_face = template.face
+    else:
+        if not target_face:
+            faces = face_detector.get(image)
+            target_face = faces[face_seq]
+
+        img_face = face_swapper.get(image, target_face, face)
 
     if restore:
-        img_face = face_restorer.restore(img_face)
+        # swap 은 얼굴 위치를 바꾸지 않으므로 target_face 의 landmark 로 복원 (재검출 생략)
+        img_face = face_restorer.restore(img_face, landmarks=[target_face.kps])
+
+    return img_face
+
+def update_images_by_face(bucket_name, file_name, image, face, target_face=None, face_seq=0, restore=False, template=None):
+
+    img_face = swap_face_image(image, face, target_face=target_face, face_seq=face_seq, restore=restore, template=template)
 
     storage.upload_image(bucket_name, file_name, image=img_face)
\ No newline at end of file
@@ -3,9 +3,11 @@ import random
 import logging
 import cv2
 from datetime import datetime, timezone
-from config import S3_IMAGE_BUCKET, RESERVED_FACES, IS_FACE_RESTORATION_ENABLED, MIN_FACE_DETECTION_SCORE
-from app import F_BASE, M_BASE, db, storage, face_detector
-from app.common import update_images_by_face
+from config import S3_IMAGE_BUCKET, RESERVED_FACES, IS_FACE_RESTORATION_ENABLED, MIN_FACE_DETECTION_SCORE, \
+    NETWORK_GRAPH_MIN_SCORE, NETWORK_GRAPH_MAX_NODES, IMAGE_LIST_LIMIT
+from app import F_BASE, M_BASE, db, storage, face_detector, batch_face_detector, io_pipeline
+from app.common import swap_face_image
+from library.io_pipeline import PipelineHandle
 from library.gadget import load_and_resize_image
 from database.models import FaceEmbeddings
 
@@ -18,17 +20,79 @@ fail_color = (0, 0, 255)
 text_color = (235, 145, 45)
 
 def process_image(image, photo_title, photo_id):
+    handle = process_image_async(image, photo_title, photo_id)
+    if not handle:
+        return None
+
+    return handle.wait()
+
+def process_image_async(image, photo_title, photo_id):
+    """
+    Run detection and face swapping on the caller's thread and hand the
+    JPEG encoding, uploads and the DB write over to the I/O pipeline.
+
+    :return: A PipelineHandle whose result is the file name of the annotated original,
+             or None if no face was registered.
+             `wait()` returns once the images and the DB write are stored.
+             The DB rows are written only after all their images were uploaded.
+    """
     img = load_and_resize_image(image, max_width=1024, max_height=1024)
     faces = face_detector.get(img)
 
+    return _register_faces(img, faces, image, photo_title, photo_id)
+
+def process_images(items):
+    """
+    Batched variant of process_image.
+    Detection, recognition and genderage run once for all images in `items`.
+
+    :param items: List of (image, photo_title, photo_id) tuples.
+    :return: List of file names (None for images without registered faces), same order as `items`.
+    """
+    results = [None] * len(items)
+
+    imgs = []
+    indexes = []
+    for i, (image, _, _) in enumerate(items):
+        try:
+            imgs.append(load_and_resize_image(image, max_width=1024, max_height=1024))
+            indexes.append(i)
+        except ValueError as e:
+            logger.error(str(e))
+
+    if not imgs:
+        return results
+
+    faces_list = batch_face_detector.get(imgs)
+
+    # 업로드는 I/O 파이프라인에서 진행되는 동안 다음 이미지의 추론을 계속한다
+    handles = {}
+    for i, img, faces in zip(indexes, imgs, faces_list):
+        image, photo_title, photo_id = items[i]
+        handles[i] = _register_faces(img, faces, image, photo_title, photo_id)
+
+    for i, handle in handles.items():
+        if not handle:
+            continue
+        try:
+            results[i] = handle.wait()
+        except Exception as e:
+            logger.error(f"Failed to store the results of {items[i][0]} : {e}")
+
+    return results
+
+def _register_faces(img, faces, image, photo_title, photo_id):
+
     if not faces:
         logger.error(f"No faces detected in the image. Please upload a valid image with faces. file_name : {image}.")
         return None
     
     faces = sorted(faces, key=lambda face: face.bbox[0])
     file_name = f"{str(uuid.uuid4())}.jpg"
+    handle = PipelineHandle(result=file_name)
 
     face_data_list = []
+    uploads = []
     for i, face in enumerate(faces): # 얼굴 영역 표시
 
         bbox = face.bbox.astype(int)
@@ -42,19 +106,22 @@ def process_image(image, photo_title, photo_id):
         cv2.rectangle(img, (bbox[0], bbox[1]), (bbox[2], bbox[3]), color, 2)
         cv2.putText(img, f" {i}", (bbox[0] + 5, bbox[1] + 20), cv2.FONT_HERSHEY_SIMPLEX, 0.6, color, 2)
 
-        base_image, base_face = random.choice(M_BASE if face.gender else F_BASE)
+        template = random.choice(M_BASE if face.gender else F_BASE)
 
         id = str(uuid.uuid4())
 
-        update_images_by_face(
-            S3_IMAGE_BUCKET, 
-            f"{id}.jpg", 
-            base_image, 
+        img_face = swap_face_image(
+            template.image, 
             face, 
-            target_face=base_face,
-            restore=IS_FACE_RESTORATION_ENABLED
+            target_face=template.face,
+            restore=IS_FACE_RESTORATION_ENABLED,
+            template=template
         )
 
+        uploads.append(handle.add(
+            io_pipeline.submit(storage.upload_image, S3_IMAGE_BUCKET, f"{id}.jpg", image=img_face)
+        ))
+
         face_data_list.append(
             FaceEmbeddings(
                 id=id,
@@ -64,21 +131,24 @@ def process_image(image, photo_title, photo_id):
                 age=float(face.age),
                 gender=int(face.gender),
                 file_name=file_name,
-                embedding=face.embedding.tolist()
+                embedding=face.embedding
             )
         )
         
     if face_data_list:
-        storage.upload_image(S3_IMAGE_BUCKET, file_name, image=img)
-        db.save_data_batch(face_data_list)
+        uploads.append(handle.add(
+            io_pipeline.submit(storage.upload_image, S3_IMAGE_BUCKET, file_name, image=img)
+        ))
+        # 이미지 업로드가 하나라도 실패하면 깨진 이미지를 가리키는 row 를 쓰지 않는다
+        handle.add(io_pipeline.submit_after(uploads, db.save_data_batch, face_data_list))
     else:
         logger.error(f"No faces detected in the image.")
         return None
 
-    return file_name
+    return handle
 
 def get_image_list(photo_id=None, photo_title=None):
-    results = db.get_data(filters=dict(photo_id=photo_id, photo_title=photo_title))
+    results = db.get_data(filters=dict(photo_id=photo_id, photo_title=photo_title), limit=IMAGE_LIST_LIMIT)
     images = [
         {
             "face_id": item.id,
@@ -96,6 +166,9 @@ def get_image_list(photo_id=None, photo_title=None):
 def get_image_url(file_name):
     return storage.get_file_url(S3_IMAGE_BUCKET, file_name)
 
+def get_image_urls(file_names):
+    return storage.get_file_urls(S3_IMAGE_BUCKET, file_names)
+
 def get_average_faces():
 
     m_v = db.get_data_by_id(id=RESERVED_FACES[1])
@@ -127,9 +200,38 @@ def get_average_faces():
 
     return average_faces_info
 
+def get_leaderboard(id):
+    """
+    Faces closest to an average face, as maintained by the scheduler.
+
+    :param id: ID of an average face (reserved or group face).
+    :return: dict with the average face info and its ranked entries, or None if it has no leaderboard.
+    """
+    mean_face = db.get_data_by_id(id=id)
+    if not mean_face or not mean_face.leaderboard:
+        return None
+
+    entries = mean_face.leaderboard.get("entries", [])
+    file_names = [entry["file_name"] for entry in entries if entry.get("file_name")]
+    urls = dict(zip(file_names, get_image_urls(file_names)))
+    entries = [
+        {"rank": rank, **entry, "url": urls.get(entry.get("file_name"))}
+        for rank, entry in enumerate(entries, start=1)
+    ]
+
+    return {
+        "id": mean_face.id,
+        "photo_title": mean_face.photo_title,
+        "num_people": mean_face.num_people,
+        "last_processed_at": mean_face.last_processed_at,
+        # 저장된 점수가 현재 평균 기준 점수와 최대 이만큼 다를 수 있다
+        "max_score_error": mean_face.leaderboard.get("drift", 0.0),
+        "entries": entries,
+    }
+
 def view_network_graph(id):
 
-    data = db.search_vectors_by_min_score(id, min_score=0.2, include_self=True, batch_size=50)
+    data = db.search_vectors_by_min_score(id, min_score=NETWORK_GRAPH_MIN_SCORE, include_self=True, limit=NETWORK_GRAPH_MAX_NODES)
 
     if not data:
         return [], "<p style='color:red;'>No data found for the given ID.</p>"
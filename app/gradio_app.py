@@ -1,11 +1,12 @@
 import logging
 import re
 import gradio as gr
-from app.face_process import process_image, get_image_list, get_average_faces, \
+from app.face_process import process_image_async, get_image_list, get_average_faces, \
     get_image_url
 from ui.html import average_faces_html, images_table_html
 from ui.css import css
 from ui.js import js_to_network_graph_tab, js_send_faceid_to_selectedid
+from config import UPLOAD_CONCURRENCY
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -23,10 +24,13 @@ def upload_image(image, photo_title, photo_id):
         return "<p style='color:red;'>Photo ID must contain only letters, numbers, hyphens (-), or underscores (_).</p>"
 
     logger.info("Uploading image...")
-    file_name = process_image(image, photo_title, photo_id)
+    handle = process_image_async(image, photo_title, photo_id)
 
-    if not file_name:
+    if not handle:
         return f"<p style='color:red;'>No faces detected in the image</p>"
+
+    # 얼굴 이미지와 원본이 업로드되고 DB 에 기록될 때까지 기다린다
+    file_name = handle.wait()
     
     url = get_image_url(file_name)
 
@@ -100,7 +104,8 @@ with gr.Blocks(theme=gr.themes.Soft(primary_hue="blue", neutral_hue="slate", sec
         upload_button.click(
             fn=upload_image,
             inputs=[image_input, photo_title, photo_id],
-            outputs=output_html
+            outputs=output_html,
+            concurrency_limit=UPLOAD_CONCURRENCY
         )
 
     with gr.Tab("Image List"):
@@ -1,16 +1,170 @@
+import uuid
 import numpy as np
 import random
 import logging
+from typing import Dict, List, Optional
 from app import storage, db, face_detector, face_swapper, face_restorer
-from config import S3_IMAGE_BUCKET, RESERVED_FACES
+from config import S3_IMAGE_BUCKET, RESERVED_FACES, MEAN_FACE_CHECKPOINT, MEAN_FACE_GROUPS, AGE_BUCKET_SIZE, \
+    LEADERBOARD_SIZE, LEADERBOARD_RESCORE_DRIFT
 from datetime import datetime, timezone
-from library.gadget import create_face_from_vector, update_mean_vector
+from library.gadget import create_face_from_vector
+from library.mean_aggregator import MeanAggregator
+from library.leaderboard import Leaderboard, ENTRY_FIELDS, unit
 from database.models import FaceEmbeddings
 from app.common import update_images_by_face
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# reserved ID 의 namespace (group 평균 얼굴 ID = uuid5(namespace, group key))
+GROUP_FACE_NAMESPACE = uuid.UUID("5f0c3a52-8d1e-4b7a-9a4e-6f1d2c3b4a59")
+GROUP_FIELDS = ("gender", "age", "created_at", "photo_title")
+
+def group_face_id(key: str) -> str:
+    """
+    Deterministic reserved ID of the average face of a group, e.g. "photo_title=team A".
+    """
+    return str(uuid.uuid5(GROUP_FACE_NAMESPACE, f"mean_face/{key}"))
+
+def group_of(key) -> Optional[str]:
+    """
+    Grouping name of a group key ("age_bucket=20" -> "age_bucket"). None for the gender keys.
+    """
+    return key.split("=", 1)[0] if isinstance(key, str) else None
+
+def group_keys(grouping: str, columns: dict) -> np.ndarray:
+    """
+    Group key of every point of a page for one grouping (None if the field is missing).
+    """
+    if grouping == "photo_title":
+        return np.array([
+            None if t is None or t != t else f"photo_title={t}" for t in columns["photo_title"]
+        ], dtype=object)
+
+    buckets = np.floor(columns["age"] / AGE_BUCKET_SIZE) * AGE_BUCKET_SIZE
+    if grouping == "age_bucket":
+        return np.array([
+            None if np.isnan(b) else f"age_bucket={int(b)}" for b in buckets
+        ], dtype=object)
+    elif grouping == "gender_age_bucket":
+        return np.array([
+            None if np.isnan(g) or np.isnan(b) else f"gender_age_bucket={int(g)}_{int(b)}"
+            for g, b in zip(columns["gender"], buckets)
+        ], dtype=object)
+
+    raise ValueError(f"Unknown mean face group '{grouping}'. Available: photo_title, age_bucket, gender_age_bucket")
+
+def fold_groups(aggregator: MeanAggregator, vectors: np.ndarray, columns: dict, groupings: List[str], mask=None):
+    """
+    Add one page to every grouping with a single segment sum.
+    Every point is listed once per grouping; `mask` limits the points that are added.
+    """
+    if not groupings:
+        return
+
+    keys = []
+    for grouping in groupings:
+        grouping_keys = group_keys(grouping, columns)
+        if mask is not None:
+            grouping_keys[~mask] = None
+        keys.append(grouping_keys)
+
+    rows = np.tile(np.arange(len(vectors)), len(groupings))
+    aggregator.fold(vectors, np.concatenate(keys), ages=columns["age"], rows=rows)
+
+def seed_group_faces(aggregator: MeanAggregator, new_data: MeanAggregator):
+    """
+    Without a checkpoint, start the groups of this run from their stored average faces.
+    """
+    for key in new_data.sums:
+        if group_of(key) is None or key in aggregator.sums:
+            continue
+        stored = db.get_data_by_id(id=group_face_id(key), with_vectors=True)
+        if stored:
+            aggregator.seed(key, stored.embedding, stored.num_people, stored.age)
+
+def member_keys(key, columns: dict, cache: dict) -> np.ndarray:
+    """
+    Group key of every point of a page in the grouping of `key` (gender column for the gender keys).
+    """
+    grouping = group_of(key)
+    if grouping not in cache:
+        cache[grouping] = columns["gender"] if grouping is None else group_keys(grouping, columns)
+    return cache[grouping]
+
+def rank_leaderboards(aggregator: MeanAggregator, keys: list, previous: dict, stored: dict,
+                      max_l: float, last_processed_at: float) -> Dict[object, Leaderboard]:
+    """
+    Update the "closest to the average" board of every changed average face.
+
+    Only the points added in this run are scored against the new mean, unless the
+    normalized mean moved more than LEADERBOARD_RESCORE_DRIFT in total since the last
+    full re-score (or there is no board yet); those boards are re-scored from every point.
+
+    :param keys: Group keys of the average faces updated in this run.
+    :param previous: Mean of every key before this run (None if it is new).
+    :param stored: Leaderboard payload stored with every key (None if missing).
+    :return: {key: Leaderboard}
+    """
+    if LEADERBOARD_SIZE <= 0 or not keys:
+        return {}
+
+    boards, full = {}, set()
+    for key in keys:
+        board = Leaderboard.from_payload(stored.get(key), LEADERBOARD_SIZE)
+        if board is None or not board.move_mean(previous.get(key), aggregator.mean(key), LEADERBOARD_RESCORE_DRIFT):
+            board = Leaderboard(LEADERBOARD_SIZE)
+            full.add(key)
+        boards[key] = board
+
+    keys = list(boards)
+    means = np.stack([unit(aggregator.mean(key)) for key in keys])
+    fields = ("id",) + GROUP_FIELDS + tuple(f for f in ENTRY_FIELDS if f not in GROUP_FIELDS)
+
+    for vectors, columns in db.iter_vector_pages_after_date(0.0 if full else max_l, fields=fields):
+        # 이번 실행 이후에 들어온 얼굴은 다음 실행에서 평균과 함께 처리한다
+        counted = columns["created_at"] <= last_processed_at
+        is_new = counted & (columns["created_at"] > max_l)
+        scores = vectors @ means.T
+        cache = {}
+        for i, key in enumerate(keys):
+            members = (member_keys(key, columns, cache) == key) & (counted if key in full else is_new)
+            if members.any():
+                boards[key].offer(
+                    columns["id"][members], scores[members, i],
+                    {field: columns[field][members] for field in ENTRY_FIELDS}
+                )
+
+    if full:
+        logger.info(f"Re-scored {len(full)} leaderboards, {len(keys) - len(full)} updated incrementally.")
+    return boards
+
+def stored_leaderboards(keys: list) -> dict:
+    return {key: getattr(db.get_data_by_id(id=group_face_id(key)), "leaderboard", None) for key in keys}
+
+def save_group_faces(aggregator: MeanAggregator, keys: List[str], last_processed_at: float,
+                     boards: Optional[dict] = None):
+
+    for key in keys:
+        gender = None
+        if group_of(key) == "gender_age_bucket":
+            gender = int(key.split("=", 1)[1].split("_")[0])
+
+        db.save_data(FaceEmbeddings(
+            id=group_face_id(key),
+            age=aggregator.mean_age(key),
+            gender=gender,
+            photo_title=f"Average Face ({key})",
+            photo_id=f"average_face__{key}",
+            num_people=aggregator.count(key),
+            last_processed_at=last_processed_at,
+            embedding=aggregator.mean(key),
+            leaderboard=boards[key].to_payload() if boards and key in boards else None
+        ))
+
+    if keys:
+        logger.info(f"Updated {len(keys)} group average faces.")
+
 def update_mean_faces(mean_face_imgs, mean_f_face_img, mean_m_face_img):
 
     MEAN_FEMALE_FACE_ID = RESERVED_FACES[0]
@@ -27,41 +181,80 @@ def update_mean_faces(mean_face_imgs, mean_f_face_img, mean_m_face_img):
         if m_v else (0.0, 0, None, 0)
 
     max_l = max(f_l, m_l)
-    data_to_mean = db.get_data_after_date(max_l, with_vectors=True)
 
-    if not data_to_mean:
+    # float64 누적 합계. checkpoint 가 DB 의 마지막 처리 시각과 맞지 않으면 저장된 평균 얼굴에서 다시 시작한다
+    aggregator = MeanAggregator.load(MEAN_FACE_CHECKPOINT) if MEAN_FACE_CHECKPOINT else None
+    if aggregator is None or aggregator.cursor != max_l:
+        aggregator = MeanAggregator()
+        aggregator.seed(0, f_embedding, f_num_people, f_age)
+        aggregator.seed(1, m_embedding, m_num_people, m_age)
+        aggregator.cursor = max_l
+
+    # checkpoint 에 없는 group 은 처음부터 다시 합산한다 (같은 scroll 에서 함께 처리)
+    backfill = [g for g in MEAN_FACE_GROUPS if g not in aggregator.groupings] if MEAN_FACE_CHECKPOINT else []
+    # 설정에서 빠진 group 과 다시 합산할 group 의 이전 합계는 버린다 (중복 합산 방지)
+    aggregator.discard([
+        k for k in aggregator.sums
+        if group_of(k) is not None and (group_of(k) in backfill or group_of(k) not in MEAN_FACE_GROUPS)
+    ])
+
+    # 새 얼굴은 scroll page 단위로 합계에 더한다
+    new_data = MeanAggregator()
+    num_data = 0
+    for vectors, columns in db.iter_vector_pages_after_date(0.0 if backfill else max_l, fields=GROUP_FIELDS):
+        is_new = columns["created_at"] > max_l
+        if backfill:
+            fold_groups(aggregator, vectors, columns, backfill, mask=~is_new)
+        if not is_new.any():
+            continue
+        if not is_new.all():
+            vectors, columns = vectors[is_new], {k: v[is_new] for k, v in columns.items()}
+
+        num_data += len(vectors)
+        new_data.fold(vectors, columns["gender"], ages=columns["age"])
+        fold_groups(new_data, vectors, columns, MEAN_FACE_GROUPS)
+        new_data.cursor = max(new_data.cursor or max_l, float(np.nanmax(columns["created_at"])))
+
+    if not MEAN_FACE_CHECKPOINT:
+        seed_group_faces(aggregator, new_data)
+    previous = {k: aggregator.mean(k) for k in aggregator.sums}
+    aggregator.merge(new_data)
+    aggregator.groupings = list(MEAN_FACE_GROUPS)
+
+    if not num_data:
         logger.info("No new data to process.")
+        if backfill:
+            backfilled = [k for k in aggregator.sums if group_of(k) in backfill]
+            boards = rank_leaderboards(aggregator, backfilled, previous, stored_leaderboards(backfilled), max_l, max_l)
+            save_group_faces(aggregator, backfilled, max_l, boards)
+            aggregator.save(MEAN_FACE_CHECKPOINT)
         return
     else :
-        logger.info(f"Processing {len(data_to_mean)} new data.")
-
-    last_processed_at = data_to_mean[-1].created_at
-
-    new_f_embedding = []
-    new_m_embedding = []
-    new_f_ages = []
-    new_m_ages = []
-
-    for item in data_to_mean:
-        if item.embedding is not None:
-            if item.gender == 0:
-                new_f_embedding.append(item.embedding)
-                new_f_ages.append(item.age)
-            elif item.gender == 1:
-                new_m_embedding.append(item.embedding)
-                new_m_ages.append(item.age)
-    
+        logger.info(f"Processing {num_data} new data.")
+
+    last_processed_at = aggregator.cursor
+    changed_groups = [
+        k for k in aggregator.sums
+        if group_of(k) is not None and (group_of(k) in backfill or new_data.count(k))
+    ]
+
+    # 평균에 가장 가까운 얼굴 순위
+    changed = [g for g in (0, 1) if new_data.count(g)] + changed_groups
+    stored = {0: f_v.leaderboard if f_v else None, 1: m_v.leaderboard if m_v else None}
+    stored.update(stored_leaderboards(changed_groups) if LEADERBOARD_SIZE > 0 else {})
+    boards = rank_leaderboards(aggregator, changed, previous, stored, max_l, last_processed_at)
+
     num_ = random.randint(0, len(mean_face_imgs)-1)
     logger.info(f"Using {num_}th  mean face image. {len(mean_face_imgs)} images in total.")
     mean_face_img, mean_faces = mean_face_imgs[num_]
 
     updated_female_v = None
-    new_f_num_people = len(new_f_embedding)
+    new_f_num_people = new_data.count(0)
+    new_f_embedding_mean = aggregator.mean(0)
 
     if new_f_num_people > 0:
 
-        new_f_embedding_mean = update_mean_vector(f_embedding, f_num_people, new_f_embedding)
-        new_f_age_mean = float(update_mean_vector(f_age, f_num_people, new_f_ages))
+        new_f_age_mean = aggregator.mean_age(0)
 
         updated_female_v = FaceEmbeddings(
             id=MEAN_FEMALE_FACE_ID,
@@ -69,9 +262,10 @@ def update_mean_faces(mean_face_imgs, mean_f_face_img, mean_m_face_img):
             gender=0,
             photo_title="Average Female Face",
             photo_id="average_female_face",
-            num_people=f_num_people + new_f_num_people,
+            num_people=aggregator.count(0),
             last_processed_at=last_processed_at,
-            embedding=new_f_embedding_mean.tolist()
+            embedding=new_f_embedding_mean,
+            leaderboard=boards[0].to_payload() if 0 in boards else None
         )
 
         update_images_by_face(
@@ -82,20 +276,16 @@ def update_mean_faces(mean_face_imgs, mean_f_face_img, mean_m_face_img):
             restore=True
         )
 
-    elif f_v:
-
-        new_f_embedding_mean = f_embedding.copy()
-
-    if new_f_num_people > 0 or f_v:
+    if new_f_embedding_mean is not None:
         mean_face_img = face_swapper.get(mean_face_img, mean_faces[0], create_face_from_vector(new_f_embedding_mean))
 
     updated_male_v = None
-    new_m_num_people = len(new_m_embedding)
+    new_m_num_people = new_data.count(1)
+    new_m_embedding_mean = aggregator.mean(1)
 
     if new_m_num_people > 0:
 
-        new_m_embedding_mean = update_mean_vector(m_embedding, m_num_people, new_m_embedding)
-        new_m_age_mean = float(update_mean_vector(m_age, m_num_people, new_m_ages))
+        new_m_age_mean = aggregator.mean_age(1)
 
         updated_male_v = FaceEmbeddings(
             id=MEAN_MAIL_FACE_ID,
@@ -103,9 +293,10 @@ def update_mean_faces(mean_face_imgs, mean_f_face_img, mean_m_face_img):
             gender=1,
             photo_title="Average Male Face",
             photo_id="average_male_face",
-            num_people=m_num_people + new_m_num_people,
+            num_people=aggregator.count(1),
             last_processed_at=last_processed_at,
-            embedding=new_m_embedding_mean.tolist()
+            embedding=new_m_embedding_mean,
+            leaderboard=boards[1].to_payload() if 1 in boards else None
         )
 
         update_images_by_face(
@@ -115,14 +306,10 @@ def update_mean_faces(mean_face_imgs, mean_f_face_img, mean_m_face_img):
             create_face_from_vector(new_m_embedding_mean),
             restore=True
         )
-    elif m_v:
-
-        new_m_embedding_mean = m_v.embedding.copy()
-
-    if new_m_num_people > 0 or m_v:
+    if new_m_embedding_mean is not None:
         mean_face_img = face_swapper.get(mean_face_img, mean_faces[1], create_face_from_vector(new_m_embedding_mean))
 
-    img_face = face_restorer.restore(mean_face_img)
+    img_face = face_restorer.restore(mean_face_img, landmarks=[f.kps for f in mean_faces])
 
     timestamp = datetime.fromtimestamp(last_processed_at, tz=timezone.utc)\
         .strftime('%Y%m%d%H%M%S')
@@ -135,4 +322,9 @@ def update_mean_faces(mean_face_imgs, mean_f_face_img, mean_m_face_img):
         db.save_data(updated_female_v)
 
     if updated_male_v:
-        db.save_data(updated_male_v)
\ No newline at end of file
+        db.save_data(updated_male_v)
+
+    save_group_faces(aggregator, changed_groups, last_processed_at, boards)
+
+    if MEAN_FACE_CHECKPOINT:
+        aggregator.save(MEAN_FACE_CHECKPOINT)
\ No newline at end of file
@@ -1,7 +1,9 @@
-from fastapi import APIRouter
+from fastapi import APIRouter, HTTPException
 from fastapi.responses import HTMLResponse
 from ui.html import network_graph_html
-from app.face_process import view_network_graph
+from app.face_process import view_network_graph, get_leaderboard
+from app import face_restorer, storage
+from storage.cached import CachedStorage
 import logging
 
 logger = logging.getLogger(__name__)
@@ -16,3 +18,30 @@ def get_network_graph(id: str):
         return "<p style='color:red;'>No data found for the given ID.</p>"
 
     return network_graph_html(data, main_node_id)
+
+@router.get("/leaderboard/{id}")
+def get_mean_face_leaderboard(id: str):
+
+    leaderboard = get_leaderboard(id)
+    if leaderboard is None:
+        raise HTTPException(status_code=404, detail="No leaderboard found for the given ID.")
+
+    return leaderboard
+
+@router.get("/metrics/face-restorer")
+def get_face_restorer_metrics():
+    if not face_restorer.loaded:
+        return {"loaded": False}
+
+    return {"loaded": True, **face_restorer.metrics()}
+
+@router.get("/metrics/image-codec")
+def get_image_codec_metrics():
+    return storage.codec.stats()
+
+@router.get("/metrics/storage-cache")
+def get_storage_cache_metrics():
+    if not isinstance(storage, CachedStorage):
+        return {"enabled": False}
+
+    return {"enabled": True, **storage.stats()}
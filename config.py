@@ -11,11 +11,78 @@ S3_ACCESS_KEY = os.getenv("S3_ACCESS_KEY", "minioadmin")
 S3_SECRET_KEY = os.getenv("S3_SECRET_KEY", "minioadmin")
 S3_SECURE = os.getenv("S3_SECURE", "false").lower() == "true"
 S3_IMAGE_BUCKET = os.getenv("S3_IMAGE_BUCKET", "processed-images")
+S3_MAX_CONNECTIONS = int(os.getenv("S3_MAX_CONNECTIONS", 16))
+S3_FETCH_WORKERS = int(os.getenv("S3_FETCH_WORKERS", 8))
+# Region of the buckets (empty: looked up from the server before the first presigned URL)
+S3_REGION = os.getenv("S3_REGION", "")
+# Presigned URL lifetime, URLs kept for reuse, and the validity a reused URL must still have
+S3_URL_EXPIRY_SECONDS = int(os.getenv("S3_URL_EXPIRY_SECONDS", 86400))
+S3_URL_CACHE_SIZE = int(os.getenv("S3_URL_CACHE_SIZE", 10000))
+S3_URL_MIN_REMAINING_SECONDS = int(os.getenv("S3_URL_MIN_REMAINING_SECONDS", 3600))
+# OBJECT_STORAGE=LOCAL : buckets are directories under LOCAL_STORAGE_PATH, served at LOCAL_STORAGE_URL_PREFIX
+LOCAL_STORAGE_PATH = os.getenv("LOCAL_STORAGE_PATH", ".data/objects")
+LOCAL_STORAGE_URL_PREFIX = os.getenv("LOCAL_STORAGE_URL_PREFIX", "/static")
+LOCAL_STORAGE_FSYNC = os.getenv("LOCAL_STORAGE_FSYNC", "false").lower() == "true"
+# Buckets served at LOCAL_STORAGE_URL_PREFIX without expiry (comma separated). Other buckets are not served
+LOCAL_STORAGE_PUBLIC_BUCKETS = [
+    b.strip() for b in os.getenv("LOCAL_STORAGE_PUBLIC_BUCKETS", S3_IMAGE_BUCKET).split(",") if b.strip()
+]
+# Read cache of load_image : decoded images in memory (bytes, 0: off) and encoded files on disk (empty: off)
+STORAGE_CACHE_MEMORY_BYTES = int(os.getenv("STORAGE_CACHE_MEMORY_BYTES", 256 * 1024 * 1024))
+STORAGE_CACHE_DIR = os.getenv("STORAGE_CACHE_DIR", ".cache/objects")
+STORAGE_CACHE_DISK_BYTES = int(os.getenv("STORAGE_CACHE_DISK_BYTES", 1024 * 1024 * 1024))
+# Seconds a cached image is served before its ETag is checked again
+STORAGE_CACHE_REVALIDATE_SECONDS = float(os.getenv("STORAGE_CACHE_REVALIDATE_SECONDS", 60))
+# Downscaled copies uploaded with every processed image, name:longest side (empty: none), e.g. thumb:192,medium:512
+IMAGE_DERIVATIVES = os.getenv("IMAGE_DERIVATIVES", "")
+# Format (webp / jpg) and quality of the copies
+IMAGE_DERIVATIVE_FORMAT = os.getenv("IMAGE_DERIVATIVE_FORMAT", "webp")
+IMAGE_DERIVATIVE_QUALITY = int(os.getenv("IMAGE_DERIVATIVE_QUALITY", 80))
+# JPEG encoding of uploaded images. IMAGE_USE_TURBOJPEG uses PyTurboJPEG (libjpeg-turbo) when it is installed
+IMAGE_JPEG_QUALITY = int(os.getenv("IMAGE_JPEG_QUALITY", 95))
+IMAGE_JPEG_OPTIMIZE = os.getenv("IMAGE_JPEG_OPTIMIZE", "false").lower() == "true"
+IMAGE_JPEG_PROGRESSIVE = os.getenv("IMAGE_JPEG_PROGRESSIVE", "false").lower() == "true"
+IMAGE_USE_TURBOJPEG = os.getenv("IMAGE_USE_TURBOJPEG", "false").lower() == "true"
+UPLOAD_WORKERS = int(os.getenv("UPLOAD_WORKERS", 8))
+UPLOAD_QUEUE_SIZE = int(os.getenv("UPLOAD_QUEUE_SIZE", 32))
 
-# Qdrant configuration
+# Vector DB configuration (QDRANT / NUMPY)
 VECTOR_DB = os.getenv("VECTOR_DB", "QDRANT")
 VECTOR_DB_HOST = os.getenv("VECTOR_DB_HOST", "localhost")
 VECTOR_DB_PORT = int(os.getenv("VECTOR_DB_PORT", 6333))
+# Qdrant transport : gRPC (VECTOR_DB_GRPC_PORT) instead of REST/JSON, request timeout in seconds (0: client default)
+VECTOR_DB_PREFER_GRPC = os.getenv("VECTOR_DB_PREFER_GRPC", "false").lower() == "true"
+VECTOR_DB_GRPC_PORT = int(os.getenv("VECTOR_DB_GRPC_PORT", 6334))
+VECTOR_DB_TIMEOUT = int(os.getenv("VECTOR_DB_TIMEOUT", 0)) or None
+# Qdrant REST connection pool and keepalive (gRPC keepalive ping interval when VECTOR_DB_PREFER_GRPC)
+VECTOR_DB_MAX_CONNECTIONS = int(os.getenv("VECTOR_DB_MAX_CONNECTIONS", 16))
+VECTOR_DB_KEEPALIVE_CONNECTIONS = int(os.getenv("VECTOR_DB_KEEPALIVE_CONNECTIONS", 16))
+VECTOR_DB_KEEPALIVE_SECONDS = float(os.getenv("VECTOR_DB_KEEPALIVE_SECONDS", 30))
+# Points per upsert request and upsert requests in flight at once for batch saves
+VECTOR_DB_UPSERT_BATCH_SIZE = int(os.getenv("VECTOR_DB_UPSERT_BATCH_SIZE", 256))
+VECTOR_DB_UPSERT_PARALLEL = int(os.getenv("VECTOR_DB_UPSERT_PARALLEL", 4))
+# Create the collection and its payload indexes at startup, and log the settings an existing one does not match
+VECTOR_DB_ENSURE_SCHEMA = os.getenv("VECTOR_DB_ENSURE_SCHEMA", "true").lower() == "true"
+# Quantization of the collection : "" (none) / scalar (int8) / binary
+VECTOR_DB_QUANTIZATION = os.getenv("VECTOR_DB_QUANTIZATION", "")
+VECTOR_DB_ON_DISK = os.getenv("VECTOR_DB_ON_DISK", "false").lower() == "true"
+VECTOR_DB_HNSW_M = int(os.getenv("VECTOR_DB_HNSW_M", 16))
+VECTOR_DB_HNSW_EF_CONSTRUCT = int(os.getenv("VECTOR_DB_HNSW_EF_CONSTRUCT", 100))
+# Directory of the embedded store when VECTOR_DB=NUMPY
+VECTOR_DB_PATH = os.getenv("VECTOR_DB_PATH", ".data/vectors")
+# Storage type of its vectors when the store is created : float32 / float16 / int8
+VECTOR_DB_DTYPE = os.getenv("VECTOR_DB_DTYPE", "float32")
+# Points per scroll page, and whether the next page is fetched while the current one is processed
+SCROLL_PAGE_SIZE = int(os.getenv("SCROLL_PAGE_SIZE", 256))
+SCROLL_PREFETCH = os.getenv("SCROLL_PREFETCH", "true").lower() == "true"
+# Similarity index of the embedded store : FLAT (exact) / IVF (approximate, IVF-PQ when ANN_PQ_M > 0)
+VECTOR_INDEX = os.getenv("VECTOR_INDEX", "FLAT")
+ANN_NLIST = int(os.getenv("ANN_NLIST", 1024))
+ANN_NPROBE = int(os.getenv("ANN_NPROBE", 16))
+# Number of one-byte PQ codes per vector (must divide 512, e.g. 64 or 128). 0 : no PQ
+ANN_PQ_M = int(os.getenv("ANN_PQ_M", 0))
+# The index is saved to disk after this many upserted rows (0 : only when it is first trained and on close)
+ANN_SAVE_EVERY_ROWS = int(os.getenv("ANN_SAVE_EVERY_ROWS", 10000))
 
 RESERVED_FACES = [
     "00000000-0000-0000-0000-000000000000",
@@ -24,7 +91,40 @@ RESERVED_FACES = [
 
 # AI Option
 IS_FACE_RESTORATION_ENABLED = os.getenv("ENABLE_FACE_RESTORATION", "false").lower() == "true"
+# 한 번에 CodeFormer 로 복원할 최대 얼굴 수
+RESTORER_BATCH_SIZE = int(os.getenv("RESTORER_BATCH_SIZE", "4"))
+# 동시에 얼굴 복원을 처리할 worker 수와 torch intra-op thread 수 (0: torch 기본값)
+RESTORER_POOL_SIZE = int(os.getenv("RESTORER_POOL_SIZE", "1"))
+RESTORER_TORCH_THREADS = int(os.getenv("RESTORER_TORCH_THREADS", "0"))
+# Gradio upload 이벤트를 동시에 처리할 수 (기본값: RESTORER_POOL_SIZE)
+UPLOAD_CONCURRENCY = int(os.getenv("UPLOAD_CONCURRENCY", str(RESTORER_POOL_SIZE)))
 MIN_FACE_DETECTION_SCORE = float(os.getenv("MIN_FACE_DETECTION_SCORE", 0.75))
+FACE_ANALYSIS_MAX_BATCH_SIZE = int(os.getenv("FACE_ANALYSIS_MAX_BATCH_SIZE", 64))
+# Local cache of analyzed base/template images (empty: disabled)
+FACE_ANALYSIS_CACHE_DIR = os.getenv("FACE_ANALYSIS_CACHE_DIR", ".cache/face_analysis")
+
+# Inference Option (ONNX Runtime, applied to buffalo_l and inswapper)
+# fp32 / int8 / fp16 : int8, fp16 use the models built by quantize_models.py
+INFERENCE_PROFILE = os.getenv("INFERENCE_PROFILE", "fp32")
+# 0 : ONNX Runtime default (all cores)
+ORT_INTRA_OP_THREADS = int(os.getenv("ORT_INTRA_OP_THREADS", 0))
+ORT_INTER_OP_THREADS = int(os.getenv("ORT_INTER_OP_THREADS", 0))
+# disable / basic / extended / all
+ORT_GRAPH_OPTIMIZATION = os.getenv("ORT_GRAPH_OPTIMIZATION", "all")
+# sequential / parallel
+ORT_EXECUTION_MODE = os.getenv("ORT_EXECUTION_MODE", "sequential")
+ORT_ENABLE_MEM_ARENA = os.getenv("ORT_ENABLE_MEM_ARENA", "true").lower() == "true"
+ORT_ALLOW_SPINNING = os.getenv("ORT_ALLOW_SPINNING", "true").lower() == "true"
+ORT_PROVIDERS = [p.strip() for p in os.getenv("ORT_PROVIDERS", "CPUExecutionProvider").split(",") if p.strip()]
+
+# Image List Option
+# Maximum number of faces listed in the "Image List" tab
+IMAGE_LIST_LIMIT = int(os.getenv("IMAGE_LIST_LIMIT", 100))
+
+# Network Graph Option
+# Faces with a cosine similarity of at least NETWORK_GRAPH_MIN_SCORE, at most NETWORK_GRAPH_MAX_NODES of them
+NETWORK_GRAPH_MIN_SCORE = float(os.getenv("NETWORK_GRAPH_MIN_SCORE", 0.2))
+NETWORK_GRAPH_MAX_NODES = int(os.getenv("NETWORK_GRAPH_MAX_NODES", 500))
 
 # AI Model configuration
 BUFFALO_L_PATH = "C:\\"
@@ -35,4 +135,25 @@ CODEFORMER_MODEL = "C:\\models\\codeformer-v0.1.0.pth"
 #CODEFORMER_MODEL = "/models/codeformer.pth"
 
 # Scheduler Option
-SCHEDULER_INTERVAL_MINUTES = int(os.getenv("SCHEDULER_INTERVAL_MINUTES", 3))
\ No newline at end of file
+SCHEDULER_INTERVAL_MINUTES = int(os.getenv("SCHEDULER_INTERVAL_MINUTES", 3))
+# Running sums of the average faces (empty: re-derive them from the stored averages every run)
+MEAN_FACE_CHECKPOINT = os.getenv("MEAN_FACE_CHECKPOINT", ".data/mean_faces.npz")
+# Additional average faces, comma separated : photo_title, age_bucket, gender_age_bucket
+MEAN_FACE_GROUPS = [g.strip() for g in os.getenv("MEAN_FACE_GROUPS", "").split(",") if g.strip()]
+AGE_BUCKET_SIZE = int(os.getenv("AGE_BUCKET_SIZE", 10))
+# Faces closest to every average face (0: disabled). A board is re-scored from every face
+# once its average face moved more than LEADERBOARD_RESCORE_DRIFT (normalized distance).
+LEADERBOARD_SIZE = int(os.getenv("LEADERBOARD_SIZE", 20))
+LEADERBOARD_RESCORE_DRIFT = float(os.getenv("LEADERBOARD_RESCORE_DRIFT", 0.02))
+
+# Startup Option
+# Models loaded at startup: "all", a comma separated list (face_detector, batch_face_detector,
+# face_swapper, face_restorer, base_faces) or empty to load each model on first use.
+WARM_UP_MODELS = os.getenv("WARM_UP_MODELS", "")
+WARM_UP_IN_BACKGROUND = os.getenv("WARM_UP_IN_BACKGROUND", "false").lower() == "true"
+
+# Batch Option
+BATCH_WORKERS = int(os.getenv("BATCH_WORKERS", 1))
+BATCH_QUEUE_SIZE = int(os.getenv("BATCH_QUEUE_SIZE", 0))
+BATCH_SIZE = int(os.getenv("BATCH_SIZE", 1))
+BATCH_THREADS_PER_WORKER = int(os.getenv("BATCH_THREADS_PER_WORKER", 0))
\ No newline at end of file
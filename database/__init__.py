@@ -1,11 +1,42 @@
-from database.qdrant import DatabaseInterface
-
-def db_connection(vector_db: str, host=None, port=None) -> DatabaseInterface:
+from database.db_interface import DatabaseInterface
 
+def db_connection(vector_db: str, host=None, port=None, path=None, scroll_page_size=256, scroll_prefetch=True,
+                  index=None, dtype="float32", client_options=None, index_save_rows=10000,
+                  **index_params) -> DatabaseInterface:
+    """
+    :param index_save_rows: NUMPY only, the ANN index is saved after this many upserted rows.
+    :param client_options: Qdrant transport settings (prefer_grpc, timeout, pool, upsert batching),
+                           see QdrantDatabase.
+    """
     if vector_db == "QDRANT":
         from database.qdrant import QdrantDatabase
-        db = QdrantDatabase(host=host, port=port, collection_name="face_embeddings")  # Initialize the database interface
+        db = QdrantDatabase(
+            host=host, port=port, collection_name="face_embeddings",
+            scroll_page_size=scroll_page_size, scroll_prefetch=scroll_prefetch,
+            **(client_options or {})
+            )  # Initialize the database interface
+    elif vector_db == "NUMPY":
+        from database.numpy_store import NumpyDatabase
+        db = NumpyDatabase(
+            path=path, index=vector_index(index, **index_params), scroll_page_size=scroll_page_size, dtype=dtype,
+            index_save_rows=index_save_rows
+            )  # Embedded store in this process (single node)
     else:
-        raise ValueError("Invalid VECTOR_DB value. Please set VECTOR_DB to 'QDRANT'.")
+        raise ValueError("Invalid VECTOR_DB value. Please set VECTOR_DB to 'QDRANT' or 'NUMPY'.")
+
+    return db
 
-    return db
\ No newline at end of file
+def vector_index(index: str = None, dim=512, nlist=1024, nprobe=16, pq_m=0):
+    """
+    ANN index of the embedded store.
+
+    :param index: "FLAT" (or None) for exact search, "IVF" for an IVF / IVF-PQ index.
+    :return: IVFIndex or None.
+    """
+    if not index or index == "FLAT":
+        return None
+    elif index == "IVF":
+        from database.ann import IVFIndex
+        return IVFIndex(dim=dim, nlist=nlist, nprobe=nprobe, pq_m=pq_m)
+    else:
+        raise ValueError("Invalid VECTOR_INDEX value. Please set VECTOR_INDEX to 'FLAT' or 'IVF'.")
\ No newline at end of file
@@ -0,0 +1,306 @@
+import os
+import json
+import logging
+import tempfile
+import time
+import numpy as np
+from typing import Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+def kmeans(x: np.ndarray, k: int, iterations: int = 10, spherical: bool = False, seed: int = 0,
+           chunk_size: int = 8192) -> np.ndarray:
+    """
+    Lloyd's k-means.
+
+    :param x: (n, d) float32 training vectors, n >= k.
+    :param k: Number of centroids.
+    :param iterations: Number of assign/update rounds.
+    :param spherical: Assign by inner product and keep the centroids L2-normalized (cosine k-means).
+    :param seed: Random seed of the initial centroids.
+    :param chunk_size: Rows assigned per matrix product.
+    :return: (k, d) float32 centroids.
+    """
+    rng = np.random.default_rng(seed)
+    centroids = x[rng.choice(len(x), k, replace=False)].copy()
+
+    for _ in range(iterations):
+        assign = nearest_centroids(x, centroids, spherical=spherical, chunk_size=chunk_size)
+
+        order = np.argsort(assign, kind="stable")
+        counts = np.bincount(assign, minlength=k)
+        filled = np.flatnonzero(counts)
+        starts = np.concatenate(([0], np.cumsum(counts[filled])[:-1]))
+        centroids[filled] = np.add.reduceat(x[order], starts, axis=0) / counts[filled, np.newaxis]
+
+        # 비어 있는 cluster 는 임의의 점으로 다시 시작한다
+        empty = np.flatnonzero(counts == 0)
+        if len(empty):
+            centroids[empty] = x[rng.choice(len(x), len(empty), replace=False)]
+
+        if spherical:
+            centroids /= np.maximum(np.linalg.norm(centroids, axis=1, keepdims=True), 1e-12)
+
+    return centroids.astype(np.float32)
+
+def nearest_centroids(x: np.ndarray, centroids: np.ndarray, spherical: bool = False,
+                      chunk_size: int = 8192) -> np.ndarray:
+    """
+    :return: (n,) index of the nearest centroid of every row (max inner product if spherical, else min L2).
+    """
+    assign = np.empty(len(x), dtype=np.int64)
+    c_norms = None if spherical else (centroids ** 2).sum(axis=1)
+    for start in range(0, len(x), chunk_size):
+        products = x[start:start + chunk_size] @ centroids.T
+        if spherical:
+            assign[start:start + chunk_size] = products.argmax(axis=1)
+        else:
+            assign[start:start + chunk_size] = (c_norms - 2 * products).argmin(axis=1)
+    return assign
+
+class IVFIndex:
+    """
+    Inverted file index for cosine similarity of L2-normalized vectors,
+    optionally with product quantization (IVF-PQ).
+
+    The vectors are clustered into `nlist` lists by spherical k-means; a query
+    only scores the rows of its `nprobe` closest lists. With `pq_m > 0` each
+    vector is also kept as `pq_m` one-byte codes (2048 bytes -> pq_m bytes for
+    512-d float32), candidates are ranked by asymmetric distance on the codes
+    and only the best `rerank` of them are re-scored on the full vectors.
+
+    The index stores row numbers; the vectors themselves stay in the caller's
+    (memory-mapped) matrix, which is passed to search().
+    """
+    def __init__(self, dim: int, nlist: int = 1024, nprobe: int = 16, pq_m: int = 0,
+                 rerank: int = 8, train_size: Optional[int] = None):
+        """
+        :param dim: Vector dimension.
+        :param nlist: Number of inverted lists (k-means centroids).
+        :param nprobe: Number of lists scanned per query.
+        :param pq_m: Number of PQ sub-vectors (0: no PQ). Must divide dim.
+        :param rerank: With PQ, k * rerank candidates are re-scored on the full vectors.
+        :param train_size: Number of vectors needed before the index is trained (default 39 * nlist).
+        """
+        if pq_m and dim % pq_m:
+            raise ValueError(f"pq_m ({pq_m}) must divide the vector dimension ({dim}).")
+
+        self.dim = dim
+        self.nlist = nlist
+        self.nprobe = nprobe
+        self.pq_m = pq_m
+        self.rerank = rerank
+        self.train_size = train_size or 39 * nlist
+
+        self.centroids: Optional[np.ndarray] = None
+        self.codebooks: Optional[np.ndarray] = None
+        self._assign = np.empty(0, dtype=np.int32)
+        self._codes = np.empty((0, pq_m), dtype=np.uint8)
+        self._lists = [np.empty(0, dtype=np.int64) for _ in range(nlist)]
+        self.count = 0
+        # Unix time of the last save(); rows changed after it are not in the saved file
+        self.saved_at: Optional[float] = None
+
+    @property
+    def trained(self) -> bool:
+        return self.centroids is not None
+
+    def train(self, vectors: np.ndarray, max_samples: Optional[int] = None, seed: int = 0):
+        """
+        :param vectors: (n, dim) normalized vectors, n >= nlist.
+        :param max_samples: Training sample size (default 256 * nlist).
+        """
+        rng = np.random.default_rng(seed)
+        max_samples = max_samples or 256 * self.nlist
+        sample = vectors if len(vectors) <= max_samples else vectors[np.sort(rng.choice(len(vectors), max_samples, replace=False))]
+        sample = np.ascontiguousarray(sample, dtype=np.float32)
+
+        self.centroids = kmeans(sample, self.nlist, spherical=True, seed=seed)
+
+        if self.pq_m:
+            dsub = self.dim // self.pq_m
+            ksub = min(256, len(sample))
+            self.codebooks = np.stack([
+                kmeans(np.ascontiguousarray(sample[:, j * dsub:(j + 1) * dsub]), ksub, seed=seed + j)
+                for j in range(self.pq_m)
+            ])
+        logger.info(f"Trained IVF index on {len(sample)} vectors (nlist={self.nlist}, pq_m={self.pq_m})")
+
+    def _encode(self, vectors: np.ndarray) -> np.ndarray:
+        dsub = self.dim // self.pq_m
+        codes = np.empty((len(vectors), self.pq_m), dtype=np.uint8)
+        for j in range(self.pq_m):
+            codes[:, j] = nearest_centroids(vectors[:, j * dsub:(j + 1) * dsub], self.codebooks[j])
+        return codes
+
+    def _reserve(self, rows: int):
+        if rows <= len(self._assign):
+            return
+        capacity = max(rows, 2 * len(self._assign), 1024)
+        assign = np.full(capacity, -1, dtype=np.int32)
+        assign[:len(self._assign)] = self._assign
+        self._assign = assign
+        if self.pq_m:
+            codes = np.zeros((capacity, self.pq_m), dtype=np.uint8)
+            codes[:len(self._codes)] = self._codes
+            self._codes = codes
+
+    def add(self, rows: np.ndarray, vectors: np.ndarray):
+        """
+        Insert (or move) rows. A row that was added before is reassigned to its new list.
+
+        :param rows: (n,) row numbers in the caller's vector matrix.
+        :param vectors: (n, dim) normalized vectors of those rows.
+        """
+        rows = np.asarray(rows, dtype=np.int64)
+        vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+        if len(rows) == 0:
+            return
+
+        self._reserve(int(rows.max()) + 1)
+        lists = nearest_centroids(vectors, self.centroids, spherical=True)
+        self._assign[rows] = lists
+        if self.pq_m:
+            self._codes[rows] = self._encode(vectors)
+
+        # 이전 list 에 남은 항목은 검색할 때 _assign 으로 걸러진다
+        for list_id in np.unique(lists):
+            self._lists[list_id] = np.concatenate((self._lists[list_id], rows[lists == list_id]))
+        self.count = max(self.count, int(rows.max()) + 1)
+
+    def _candidates(self, query: np.ndarray, nprobe: int) -> np.ndarray:
+        probes = np.argsort(-(self.centroids @ query))[:nprobe]
+        candidates = []
+        for list_id in probes:
+            rows = self._lists[list_id]
+            candidates.append(rows[self._assign[rows] == list_id])
+        return np.unique(np.concatenate(candidates)) if candidates else np.empty(0, dtype=np.int64)
+
+    def _approximate_scores(self, query: np.ndarray, rows: np.ndarray) -> np.ndarray:
+        dsub = self.dim // self.pq_m
+        table = np.einsum("mkd,md->mk", self.codebooks, query.reshape(self.pq_m, dsub))
+        return table[np.arange(self.pq_m), self._codes[rows]].sum(axis=1)
+
+    def search(self, query: np.ndarray, k: int, vectors: np.ndarray,
+               nprobe: Optional[int] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Approximate top-k by cosine similarity.
+
+        :param query: (dim,) normalized query vector.
+        :param k: Number of results.
+        :param vectors: The caller's vector matrix, used to score (or re-rank) the candidates exactly.
+        :param nprobe: Lists to scan (default self.nprobe).
+        :return: (rows, scores), highest score first.
+        """
+        rows = self._candidates(query, nprobe or self.nprobe)
+        if self.pq_m and len(rows) > k * self.rerank:
+            approx = self._approximate_scores(query, rows)
+            keep = np.argpartition(-approx, k * self.rerank - 1)[:k * self.rerank]
+            rows = np.sort(rows[keep])
+
+        scores = vectors[rows] @ query
+        k = min(k, len(rows))
+        if k == 0:
+            return rows, scores
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top], kind="stable")]
+        return rows[top], scores[top]
+
+    def range_search(self, query: np.ndarray, min_score: float, vectors: np.ndarray,
+                     nprobe: Optional[int] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Rows of the probed lists with a cosine similarity of at least min_score.
+
+        :return: (rows, scores), highest score first.
+        """
+        rows = self._candidates(query, nprobe or self.nprobe)
+        scores = vectors[rows] @ query
+        keep = scores >= min_score
+        rows, scores = rows[keep], scores[keep]
+        order = np.argsort(-scores, kind="stable")
+        return rows[order], scores[order]
+
+    def save(self, path: str, saved_at: Optional[float] = None):
+        """
+        Write the index to an .npz file (atomically).
+
+        :param saved_at: Time up to which the caller's changes are in the index (default: now).
+        """
+        saved_at = time.time() if saved_at is None else saved_at
+        params = dict(dim=self.dim, nlist=self.nlist, nprobe=self.nprobe, pq_m=self.pq_m,
+                      rerank=self.rerank, train_size=self.train_size)
+        arrays = dict(params=np.asarray(json.dumps(params)), assign=self._assign[:self.count],
+                      saved_at=np.asarray(saved_at, dtype=np.float64))
+        if self.trained:
+            arrays["centroids"] = self.centroids
+        if self.pq_m and self.codebooks is not None:
+            arrays["codebooks"] = self.codebooks
+            arrays["codes"] = self._codes[:self.count]
+
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(path)), suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                np.savez(f, **arrays)
+            os.replace(tmp_path, path)
+        except Exception:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        self.saved_at = saved_at
+
+    @classmethod
+    def load(cls, path: str, nprobe: Optional[int] = None) -> "IVFIndex":
+        """
+        Read an index written by save(). The inverted lists are rebuilt from the row assignment.
+
+        :param nprobe: Override the saved nprobe.
+        """
+        with np.load(path, allow_pickle=False) as data:
+            params = json.loads(str(data["params"]))
+            if nprobe:
+                params["nprobe"] = nprobe
+            index = cls(**params)
+            assign = data["assign"]
+            if "saved_at" in data:
+                index.saved_at = float(data["saved_at"])
+            if "centroids" in data:
+                index.centroids = data["centroids"]
+            if "codebooks" in data:
+                index.codebooks = data["codebooks"]
+                codes = data["codes"]
+
+        index._reserve(len(assign))
+        index._assign[:len(assign)] = assign
+        if index.codebooks is not None:
+            index._codes[:len(codes)] = codes
+        index.count = len(assign)
+
+        rows = np.flatnonzero(assign >= 0)
+        order = rows[np.argsort(assign[rows], kind="stable")]
+        counts = np.bincount(assign[rows], minlength=index.nlist)
+        index._lists = np.split(order.astype(np.int64), np.cumsum(counts)[:-1])
+        return index
+
+def recall_at_k(index: IVFIndex, vectors: np.ndarray, k: int = 10, num_queries: int = 100,
+                seed: int = 0) -> float:
+    """
+    Mean fraction of the exact top-k that the index returns, using stored vectors as queries.
+
+    :param index: Trained index.
+    :param vectors: (n, dim) normalized vectors the index was built on.
+    :return: recall@k in [0, 1].
+    """
+    rng = np.random.default_rng(seed)
+    queries = rng.choice(len(vectors), min(num_queries, len(vectors)), replace=False)
+
+    hits = 0
+    total = 0
+    for row in queries:
+        query = np.asarray(vectors[row])
+        exact_scores = vectors @ query
+        kk = min(k, len(exact_scores))
+        exact = set(np.argpartition(-exact_scores, kk - 1)[:kk].tolist())
+        approx, _ = index.search(query, kk, vectors)
+        hits += len(exact & set(approx.tolist()))
+        total += kk
+    return hits / total if total else 1.0
@@ -1,9 +1,19 @@
 from abc import ABC, abstractmethod
-from typing import List, Dict
+from typing import List, Dict, Iterator, Tuple
+import numpy as np
 from pydantic import BaseModel
 
 # Abstract base class for database operations
 class DatabaseInterface(ABC):
+    @abstractmethod
+    def ensure_schema(self, dim: int = 512, on_disk: bool = False, quantization: str = None,
+                      hnsw_m: int = 16, hnsw_ef_construct: int = 100) -> List[str]:
+        """
+        Create the storage (collection, payload indexes) if it is missing. Idempotent.
+        :return: Differences between an existing storage and the requested settings.
+        """
+        pass
+
     @abstractmethod
     def save_data(self, face_data: BaseModel):
         """
@@ -19,9 +29,16 @@ class DatabaseInterface(ABC):
         pass
 
     @abstractmethod
-    def get_data(self, filters:Dict = None, with_vectors: bool = False) -> List[BaseModel]:
+    def get_data(self, filters:Dict = None, with_vectors: bool = False, limit: int = None) -> List[BaseModel]:
+        """
+        Retrieve data from the database based on filters (all matches unless limit is given).
+        """
+        pass
+
+    @abstractmethod
+    def iter_data(self, filters: Dict = None, with_vectors: bool = False, page_size: int = None) -> Iterator[BaseModel]:
         """
-        Retrieve data from the database based on filters.
+        Iterate over all data matching the filters, page by page.
         """
         pass
 
@@ -35,7 +52,24 @@ class DatabaseInterface(ABC):
     @abstractmethod
     def get_data_after_date(self, date_ts: float, with_vectors: bool = False) -> List[BaseModel]:
         """
-        Retrieve data created after a specific timestamp.
+        Retrieve all data created after a specific timestamp, oldest first.
+        """
+        pass
+
+    @abstractmethod
+    def iter_data_after_date(self, date_ts: float, with_vectors: bool = False, page_size: int = None) -> Iterator[BaseModel]:
+        """
+        Iterate over all data created after a specific timestamp, page by page.
+        The order is up to the backend.
+        """
+        pass
+
+    @abstractmethod
+    def iter_vector_pages_after_date(self, date_ts: float, fields=("created_at",), page_size: int = None) -> Iterator[Tuple[np.ndarray, Dict[str, np.ndarray]]]:
+        """
+        Iterate over data created after a specific timestamp as numpy pages:
+        (vectors (n, dim) float32, {field: (n,) payload column}) without building a model per point.
+        The pseudo field "id" returns the point IDs.
         """
         pass
 
@@ -47,8 +81,9 @@ class DatabaseInterface(ABC):
         pass
 
     @abstractmethod
-    def search_vectors_by_min_score(self, id: str, min_score: float, include_self: bool = False, batch_size: int = 50) -> List[BaseModel]:
+    def search_vectors_by_min_score(self, id: str, min_score: float, include_self: bool = False, limit: int = 1000) -> List[BaseModel]:
         """
-        Search for vectors with a minimum score threshold.
+        Search for vectors with a minimum score threshold in one query,
+        highest score first and at most `limit` results.
         """
         pass
\ No newline at end of file
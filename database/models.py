@@ -1,8 +1,24 @@
-from pydantic import BaseModel
-from typing import List, Optional
+from datetime import datetime, timezone
+import numpy as np
+from pydantic import BaseModel, BeforeValidator, ConfigDict, PlainSerializer
+from typing import Annotated, Optional
 
+def to_embedding(value) -> np.ndarray:
+    """
+    Embedding as a 1-D float32 array. A float32 array (or a row of a page matrix) is kept as is.
+    """
+    return np.asarray(value, dtype=np.float32).reshape(-1)
+
+# float32 numpy embedding, converted to a list only when serialized to JSON
+Embedding = Annotated[
+    np.ndarray,
+    BeforeValidator(to_embedding),
+    PlainSerializer(lambda v: v.tolist(), return_type=list, when_used="json"),
+]
 
 class FaceEmbeddings(BaseModel):
+    model_config = ConfigDict(arbitrary_types_allowed=True)
+
     id: str
     photo_id: Optional[str] = None
     photo_title: Optional[str] = None
@@ -14,5 +30,37 @@ class FaceEmbeddings(BaseModel):
     num_people: Optional[int] = None
     last_processed_at: Optional[float] = None
     updated_at: Optional[float] = None
-    embedding: Optional[List[float]] = None
-    score: Optional[float] = None
\ No newline at end of file
+    embedding: Optional[Embedding] = None
+    score: Optional[float] = None
+    leaderboard: Optional[dict] = None
+
+def create_metadata(face_data: FaceEmbeddings, created_at: Optional[float] = None) -> dict:
+    """
+    Create metadata dictionary for a FaceEmbeddings object.
+
+    :param face_data: A FaceEmbeddings object.
+    :param created_at: Optional timestamp for the created_at field. Defaults to the current time.
+    :return: Metadata dictionary.
+    """
+    return {
+        "photo_title": face_data.photo_title,
+        "photo_id": face_data.photo_id,
+        "face_index": face_data.face_index,
+        "age": face_data.age,
+        "gender": face_data.gender,
+        "file_name": face_data.file_name,
+        "last_processed_at": face_data.last_processed_at,
+        "num_people": face_data.num_people,
+        "updated_at": datetime.now(timezone.utc).timestamp(),
+        "created_at": created_at,
+        "leaderboard": face_data.leaderboard
+    }
+
+def payload_column(values: list) -> np.ndarray:
+    """
+    Payload values of one field as a numpy column:
+    float64 with NaN for missing values if the field is numeric, object otherwise.
+    """
+    if all(v is None or isinstance(v, (int, float)) for v in values):
+        return np.array([np.nan if v is None else v for v in values], dtype=np.float64)
+    return np.array(values, dtype=object)
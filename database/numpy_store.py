@@ -0,0 +1,567 @@
+import os
+import json
+import time
+import tempfile
+import threading
+import numpy as np
+from datetime import datetime, timezone
+from typing import List, Dict, Optional, Iterator, Tuple
+from pydantic import BaseModel
+from database.db_interface import DatabaseInterface
+from database.models import FaceEmbeddings, create_metadata, payload_column
+from database.ann import IVFIndex, recall_at_k
+
+PAYLOAD_FIELDS = (
+    "photo_title", "photo_id", "face_index", "age", "gender", "file_name",
+    "last_processed_at", "num_people", "updated_at", "created_at", "leaderboard",
+)
+
+# Storage types of the vectors : float32, float16 (half the size) or int8 (a quarter)
+STORAGE_DTYPES = {"float32": np.float32, "float16": np.float16, "int8": np.int8}
+# int8 stores component * 254. Components of normalized 512-d embeddings are far below 0.5,
+# so the range is used twice as finely as with 127 and the (rare) larger ones are clipped.
+INT8_SCALE = 254.0
+
+def _lock_directory(path: str):
+    """
+    Take an exclusive, non-blocking lock on `<path>/LOCK`. The OS releases it when the process exits.
+
+    :return: The open lock file (keep it open while the store is used).
+    """
+    lock_path = os.path.join(path, "LOCK")
+    lock_file = open(lock_path, "a+")
+    try:
+        if os.name == "nt":
+            import msvcrt
+            lock_file.seek(0)
+            msvcrt.locking(lock_file.fileno(), msvcrt.LK_NBLCK, 1)
+        else:
+            import fcntl
+            fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except OSError:
+        lock_file.close()
+        raise RuntimeError(
+            f"The NUMPY vector store '{path}' is already opened by another process. "
+            "Only one process may use it : run the scheduler / batch workers with VECTOR_DB=QDRANT, "
+            "or stop the other process first."
+        )
+    return lock_file
+
+def encode_vectors(vectors: np.ndarray, dtype: str) -> np.ndarray:
+    """
+    Normalized float32 vectors in the storage type.
+    """
+    if dtype == "int8":
+        return np.clip(np.rint(vectors * INT8_SCALE), -127, 127).astype(np.int8)
+    return vectors.astype(STORAGE_DTYPES[dtype], copy=False)
+
+def decode_vectors(stored: np.ndarray, dtype: str) -> np.ndarray:
+    """
+    Stored vectors as float32 (a copy unless they are stored as float32).
+    """
+    if dtype == "int8":
+        return stored.astype(np.float32) * np.float32(1 / INT8_SCALE)
+    return np.asarray(stored, dtype=np.float32)
+
+class StoredVectors:
+    """
+    float32 view of the first `count` float16 / int8 rows.
+    Rows are decoded when they are indexed, and `@` scores the matrix in chunks,
+    so the full float32 matrix is never materialized.
+    """
+    CHUNK_ROWS = 65536
+
+    def __init__(self, stored: np.ndarray, dtype: str, count: int):
+        self.stored = stored
+        self.dtype = dtype
+        self.count = count
+
+    @property
+    def shape(self):
+        return (self.count, self.stored.shape[1])
+
+    def __len__(self):
+        return self.count
+
+    def __getitem__(self, rows):
+        return decode_vectors(self.stored[:self.count][rows], self.dtype)
+
+    def __array__(self, dtype=None, copy=None):
+        return self[:] if dtype is None else self[:].astype(dtype)
+
+    def __matmul__(self, query: np.ndarray) -> np.ndarray:
+        query = np.asarray(query, dtype=np.float32)
+        return np.concatenate([
+            self[start:start + self.CHUNK_ROWS] @ query
+            for start in range(0, self.count, self.CHUNK_ROWS)
+        ]) if self.count else np.empty((0,) + query.shape[1:], dtype=np.float32)
+
+# Embedded NumPy implementation of the database interface
+class NumpyDatabase(DatabaseInterface):
+    """
+    Single-node vector store kept in the application process.
+
+    Vectors are L2-normalized and stored in one contiguous float32 matrix,
+    memory-mapped from `<path>/vectors.f32`, so cosine similarity is a single
+    matrix-vector product. Payloads are appended to `<path>/payload.jsonl`
+    (one line per upsert) and replayed into per-field column arrays on open.
+    An upsert of an existing id overwrites its row in place, and the log is
+    rewritten with one line per row on close or once its superseded lines
+    exceed `compact_ratio` of the file. The matrix can be stored as float16
+    or int8 to halve / quarter its size; rows are decoded to float32 when
+    they are read.
+
+    Similarity search is exact by default. With an IVFIndex it becomes
+    approximate once enough vectors are stored to train the index; the index
+    is kept up to date on every upsert and saved to `<path>/index.npz` every
+    `index_save_rows` upserted rows. On open, rows appended or updated after
+    the saved index are added to it again.
+
+    Row numbers and the payload columns live in this process, so the directory
+    is locked (`<path>/LOCK`) while it is open and a second process fails to open it.
+    """
+    def __init__(self, path, dim=512, initial_capacity=1024, index: Optional[IVFIndex] = None, scroll_page_size=256,
+                 dtype="float32", index_save_rows=10000, compact_ratio=0.5):
+        """
+        :param path: Directory of the store (created if missing).
+        :param dim: Vector dimension, used when the store is created.
+        :param dtype: Storage type of the vectors (float32 / float16 / int8), used when the store is created.
+        :param initial_capacity: Number of rows allocated when the store is created.
+        :param index: Optional ANN index. A saved index in the directory replaces it (keeping its nprobe).
+        :param scroll_page_size: Default page size of iter_data / iter_data_after_date.
+        :param index_save_rows: Save the ANN index after this many upserted rows (0: only when trained and on close).
+        :param compact_ratio: Rewrite payload.jsonl once this share of its lines is superseded (0: only on close).
+        """
+        self.path = path
+        self.scroll_page_size = scroll_page_size
+        self.compact_ratio = compact_ratio
+        os.makedirs(path, exist_ok=True)
+        self._lock_file = _lock_directory(path)
+        self._vectors_path = os.path.join(path, "vectors.f32")
+        self._payload_path = os.path.join(path, "payload.jsonl")
+        self._meta_path = os.path.join(path, "meta.json")
+        self._lock = threading.RLock()
+
+        if os.path.exists(self._meta_path):
+            with open(self._meta_path, "r", encoding="utf-8") as f:
+                meta = json.load(f)
+            self.dim, capacity = meta["dim"], meta["capacity"]
+            self.dtype = meta.get("dtype", "float32")
+        else:
+            if dtype not in STORAGE_DTYPES:
+                raise ValueError(f"Unknown vector storage type '{dtype}'. Available: {list(STORAGE_DTYPES)}")
+            self.dim, capacity, self.dtype = dim, max(initial_capacity, 1), dtype
+            self._write_meta(capacity)
+
+        self._vectors = self._open_vectors(capacity)
+
+        # columns
+        self._ids: List[str] = []
+        self._rows: Dict[str, int] = {}
+        self._columns: Dict[str, list] = {field: [] for field in PAYLOAD_FIELDS}
+        self._arrays: Dict[str, np.ndarray] = {}
+        # payload.jsonl 의 줄 수 (같은 id 의 이전 줄 포함)
+        self._payload_lines = 0
+
+        if os.path.exists(self._payload_path):
+            with open(self._payload_path, "r", encoding="utf-8") as f:
+                for line in f:
+                    if line.strip():
+                        record = json.loads(line)
+                        self._set_payload(record["id"], record["payload"])
+                        self._payload_lines += 1
+
+        self._payload_file = open(self._payload_path, "a", encoding="utf-8")
+
+        self._index_path = os.path.join(path, "index.npz")
+        self.index = index
+        self.index_save_rows = index_save_rows
+        if index is not None and os.path.exists(self._index_path):
+            self.index = IVFIndex.load(self._index_path, nprobe=index.nprobe)
+        # 저장 이후 추가되었거나 제자리에서 갱신된 row 를 다시 색인한다
+        stale = np.arange(self.index.count if self.index else 0, self.count)
+        if self.index is not None and self.index.count:
+            updated_at = self._column("updated_at")[:self.index.count]
+            saved_at = self.index.saved_at if self.index.saved_at is not None else -np.inf
+            stale = np.concatenate((np.flatnonzero(updated_at >= saved_at), stale))
+        self._unsaved_rows = len(stale)
+        self._update_index(stale)
+
+    @property
+    def count(self) -> int:
+        return len(self._ids)
+
+    def _write_meta(self, capacity):
+        with open(self._meta_path, "w", encoding="utf-8") as f:
+            json.dump({"dim": self.dim, "capacity": capacity, "dtype": self.dtype}, f)
+
+    def _open_vectors(self, capacity) -> np.memmap:
+        dtype = STORAGE_DTYPES[self.dtype]
+        size = capacity * self.dim * np.dtype(dtype).itemsize
+        with open(self._vectors_path, "ab") as f:
+            if f.tell() < size:
+                f.truncate(size)
+        return np.memmap(self._vectors_path, dtype=dtype, mode="r+", shape=(capacity, self.dim))
+
+    def _stored(self):
+        """
+        The stored rows as float32: the memmap itself, or a StoredVectors view of float16 / int8 rows.
+        """
+        if self.dtype == "float32":
+            return self._vectors[:self.count]
+        return StoredVectors(self._vectors, self.dtype, self.count)
+
+    def _reserve(self, rows):
+        capacity = self._vectors.shape[0]
+        if rows <= capacity:
+            return
+        while capacity < rows:
+            capacity *= 2
+        self._vectors.flush()
+        del self._vectors
+        self._vectors = self._open_vectors(capacity)
+        self._write_meta(capacity)
+
+    def _set_payload(self, id, payload) -> int:
+        row = self._rows.get(id)
+        if row is None:
+            row = len(self._ids)
+            self._rows[id] = row
+            self._ids.append(id)
+            for field in PAYLOAD_FIELDS:
+                self._columns[field].append(payload.get(field))
+        else:
+            for field in PAYLOAD_FIELDS:
+                self._columns[field][row] = payload.get(field)
+        self._arrays.clear()
+        return row
+
+    def _column(self, field) -> np.ndarray:
+        """
+        Column as a numpy array (float64 with NaN for numeric fields, object otherwise).
+        """
+        array = self._arrays.get(field)
+        if array is None:
+            array = payload_column(self._columns[field])
+            self._arrays[field] = array
+        return array
+
+    def _upsert(self, data_list: List[BaseModel], created_at: Optional[float]):
+        with self._lock:
+            new_ids = {data.id for data in data_list if data.id not in self._rows}
+            self._reserve(self.count + len(new_ids))
+
+            lines = []
+            rows = []
+            for data in data_list:
+                payload = create_metadata(data, created_at=created_at)
+                row = self._set_payload(data.id, payload)
+                rows.append(row)
+
+                vector = np.asarray(data.embedding, dtype=np.float32)
+                norm = np.linalg.norm(vector)
+                self._vectors[row] = encode_vectors(vector / norm if norm > 0 else vector, self.dtype)
+                lines.append(json.dumps({"id": data.id, "payload": payload}))
+
+            # 벡터를 먼저 기록한 다음 payload 를 append 한다 (payload 줄이 commit 기록)
+            self._vectors.flush()
+            self._payload_file.write("\n".join(lines) + "\n")
+            self._payload_file.flush()
+            self._payload_lines += len(lines)
+            if 0 < self.compact_ratio and self._payload_lines - self.count > self.compact_ratio * self._payload_lines:
+                self.compact_payload()
+
+            was_trained = self.index is not None and self.index.trained
+            self._update_index(np.asarray(rows, dtype=np.int64))
+            self._unsaved_rows += len(rows)
+            if self.index is not None and self.index.trained and (
+                    not was_trained or 0 < self.index_save_rows <= self._unsaved_rows):
+                self.save_index()
+
+    def _update_index(self, rows):
+        """
+        Add rows to the ANN index, training it first once enough vectors are stored.
+        """
+        if self.index is None:
+            return
+        if not self.index.trained:
+            if self.count < self.index.train_size:
+                return
+            self.index.train(np.asarray(self._stored()))
+            rows = np.arange(self.count)
+        vectors = self._stored()
+        for start in range(0, len(rows), 65536):
+            chunk = rows[start:start + 65536]
+            self.index.add(chunk, vectors[chunk])
+
+    def save_index(self):
+        """
+        Persist the ANN index so that the next start only loads it.
+        """
+        with self._lock:
+            if self.index is not None and self.index.trained:
+                self.index.save(self._index_path, saved_at=time.time())
+                self._unsaved_rows = 0
+
+    def compact_payload(self):
+        """
+        Rewrite payload.jsonl with one line per row (its latest payload).
+        The new log is written to a temporary file and renamed over the old one,
+        so a crash leaves either log complete.
+        """
+        with self._lock:
+            if self._payload_lines == self.count:
+                return
+            fd, temp_path = tempfile.mkstemp(dir=self.path, prefix=".tmp-payload-")
+            try:
+                with os.fdopen(fd, "w", encoding="utf-8") as f:
+                    for row, id in enumerate(self._ids):
+                        payload = {field: self._columns[field][row] for field in PAYLOAD_FIELDS}
+                        f.write(json.dumps({"id": id, "payload": payload}) + "\n")
+                    f.flush()
+                    os.fsync(f.fileno())
+                self._payload_file.close()
+                os.replace(temp_path, self._payload_path)
+            except BaseException:
+                if os.path.exists(temp_path):
+                    os.unlink(temp_path)
+                raise
+            finally:
+                if self._payload_file.closed:
+                    self._payload_file = open(self._payload_path, "a", encoding="utf-8")
+            self._payload_lines = self.count
+
+    def index_recall(self, k=10, num_queries=100) -> Optional[float]:
+        """
+        recall@k of the ANN index against exact search, using stored vectors as queries.
+
+        :return: recall in [0, 1], or None if there is no trained index.
+        """
+        with self._lock:
+            if self.index is None or not self.index.trained:
+                return None
+            return recall_at_k(self.index, self._stored(), k=k, num_queries=num_queries)
+
+    def _to_model(self, row, with_vectors=False, score=None, vector=None) -> FaceEmbeddings:
+        if with_vectors and vector is None:
+            vector = np.array(decode_vectors(self._vectors[row], self.dtype))
+        return FaceEmbeddings(
+            id=self._ids[row],
+            **{field: self._columns[field][row] for field in PAYLOAD_FIELDS},
+            embedding=vector,
+            score=score,
+        )
+
+    def _to_models(self, rows, with_vectors=False) -> List[FaceEmbeddings]:
+        """
+        Models of a page of rows. The vectors are read as one float32 matrix and every model keeps a row of it.
+        """
+        if not with_vectors:
+            return [self._to_model(row) for row in rows]
+        vectors = decode_vectors(self._vectors[np.asarray(rows, dtype=np.int64)], self.dtype)
+        return [self._to_model(row, vector=vectors[i]) for i, row in enumerate(rows)]
+
+    def _filter_rows(self, filters: Dict = None, created_after: Optional[float] = None) -> np.ndarray:
+        mask = np.ones(self.count, dtype=bool)
+        for key, value in (filters or {}).items():
+            if value:
+                mask &= self._column(key) == value
+        if created_after is not None:
+            created_at = self._column("created_at")
+            mask &= np.nan_to_num(created_at, nan=-np.inf) > created_after
+        return np.flatnonzero(mask)
+
+    def _query(self, id) -> Optional[np.ndarray]:
+        row = self._rows.get(id)
+        if row is None:
+            return None
+        return decode_vectors(self._vectors[row], self.dtype)
+
+    def _use_index(self) -> bool:
+        return self.index is not None and self.index.trained
+
+    def ensure_schema(self, dim=512, on_disk=False, quantization=None, hnsw_m=16, hnsw_ef_construct=100) -> List[str]:
+        """
+        The store is created when it is opened and has no payload indexes or HNSW graph,
+        so only the vector size is checked. Compact storage is VECTOR_DB_DTYPE here.
+        """
+        if self.dim != dim:
+            return [f"vector size is {self.dim}, configured {dim}"]
+        return []
+
+    def save_data(self, face_data: BaseModel):
+        """
+        Save a single face data record.
+
+        :param face_data: A FaceEmbeddings object.
+        """
+        self._upsert([face_data], created_at=None)
+
+    def save_data_batch(self, data_list: List[BaseModel]):
+        """
+        Save multiple face data records in one batch.
+
+        :param data_list: A list of FaceEmbeddings objects.
+        """
+        if data_list:
+            self._upsert(data_list, created_at=datetime.now(timezone.utc).timestamp())
+
+    def get_data(self, filters: Dict = None, with_vectors=False, limit=None) -> List[BaseModel]:
+        """
+        Retrieve the records whose payload matches every non-empty filter value (in insertion order).
+
+        :param filters: dict of payload field and value.
+        :param with_vectors: Whether to include vector data.
+        :param limit: The maximum number of records (None: all).
+        :return: A list of FaceEmbeddings objects.
+        """
+        with self._lock:
+            rows = self._filter_rows(filters)[:limit]
+            return self._to_models(rows, with_vectors=with_vectors)
+
+    def iter_data(self, filters: Dict = None, with_vectors=False, page_size=None) -> Iterator[BaseModel]:
+        """
+        Iterate over the records matching the filters (in insertion order).
+
+        :param filters: dict of payload field and value.
+        :param with_vectors: Whether to include vector data.
+        :param page_size: Records converted per lock acquisition (default: scroll_page_size).
+        :return: Generator of FaceEmbeddings objects.
+        """
+        with self._lock:
+            rows = self._filter_rows(filters)
+        return self._iter_rows(rows, with_vectors, page_size)
+
+    def _iter_rows(self, rows, with_vectors, page_size) -> Iterator[BaseModel]:
+        page_size = page_size or self.scroll_page_size
+        for start in range(0, len(rows), page_size):
+            with self._lock:
+                page = self._to_models(rows[start:start + page_size], with_vectors=with_vectors)
+            yield from page
+
+    def get_data_by_id(self, id, with_vectors=False) -> BaseModel:
+        """
+        Retrieve a single data record by ID.
+
+        :param id: The ID of the record.
+        :param with_vectors: Whether to include vector data.
+        :return: A FaceEmbeddings object or None.
+        """
+        with self._lock:
+            row = self._rows.get(id)
+            if row is None:
+                return None
+            return self._to_model(row, with_vectors=with_vectors)
+
+    def get_data_after_date(self, date_ts: float, with_vectors=False) -> List[BaseModel]:
+        """
+        Retrieve all records created after a specific timestamp, oldest first.
+
+        :param date_ts: The timestamp to filter data.
+        :param with_vectors: Whether to include vector data.
+        :return: A list of FaceEmbeddings objects.
+        """
+        return list(self.iter_data_after_date(date_ts, with_vectors=with_vectors))
+
+    def iter_data_after_date(self, date_ts: float, with_vectors=False, page_size=None) -> Iterator[BaseModel]:
+        """
+        Iterate over the records created after a specific timestamp, oldest first.
+
+        :param date_ts: The timestamp to filter data.
+        :param with_vectors: Whether to include vector data.
+        :param page_size: Records converted per lock acquisition (default: scroll_page_size).
+        :return: Generator of FaceEmbeddings objects.
+        """
+        with self._lock:
+            rows = self._filter_rows(created_after=date_ts)
+            rows = rows[np.argsort(self._column("created_at")[rows], kind="stable")]
+        return self._iter_rows(rows, with_vectors, page_size)
+
+    def iter_vector_pages_after_date(self, date_ts: float, fields=("created_at",), page_size=None) -> Iterator[Tuple[np.ndarray, Dict[str, np.ndarray]]]:
+        """
+        Iterate over the records created after a specific timestamp as numpy pages, oldest first.
+
+        :param date_ts: The timestamp to filter data.
+        :param fields: Payload fields returned as columns ("id" returns the point IDs).
+        :param page_size: Rows per page (default: scroll_page_size).
+        :return: Generator of (vectors (n, dim) float32, {field: (n,) array}) per page.
+        """
+        with self._lock:
+            rows = self._filter_rows(created_after=date_ts)
+            rows = rows[np.argsort(self._column("created_at")[rows], kind="stable")]
+
+        page_size = page_size or self.scroll_page_size
+        for start in range(0, len(rows), page_size):
+            page = rows[start:start + page_size]
+            with self._lock:
+                vectors = decode_vectors(self._vectors[page], self.dtype)
+                columns = {
+                    field: np.array([self._ids[row] for row in page], dtype=object) if field == "id"
+                    else self._column(field)[page]
+                    for field in fields
+                }
+            yield vectors, columns
+
+    def search_similar_vectors_by_id(self, id, top_n=10) -> List[BaseModel]:
+        """
+        Search for the most similar vectors by vector ID (cosine similarity).
+
+        :param id: The ID of the vector to search for.
+        :param top_n: The number of similar vectors to retrieve.
+        :return: A list of FaceEmbeddings objects.
+        """
+        with self._lock:
+            query = self._query(id)
+            if query is None:
+                return []
+
+            vectors = self._stored()
+            if self._use_index():
+                rows, scores = self.index.search(query, top_n, vectors)
+            else:
+                scores = vectors @ query
+                top_n = min(top_n, len(scores))
+                rows = np.argpartition(-scores, top_n - 1)[:top_n]
+                rows = rows[np.argsort(-scores[rows], kind="stable")]
+                scores = scores[rows]
+            return [self._to_model(row, score=float(score)) for row, score in zip(rows, scores)]
+
+    def search_vectors_by_min_score(self, id, min_score, include_self=False, limit=1000) -> List[BaseModel]:
+        """
+        Search for vectors with a minimum score threshold.
+        Without an index all vectors are scored at once; with one only the probed lists are.
+
+        :param id: The ID of the vector to search for.
+        :param min_score: The minimum score threshold.
+        :param include_self: Whether to include the vector itself.
+        :param limit: The maximum number of results.
+        :return: A list of FaceEmbeddings objects, highest score first.
+        """
+        with self._lock:
+            query = self._query(id)
+            if query is None:
+                return []
+
+            vectors = self._stored()
+            if self._use_index():
+                rows, scores = self.index.range_search(query, min_score, vectors)
+            else:
+                scores = vectors @ query
+                rows = np.flatnonzero(scores >= min_score)
+                if len(rows) > limit + 1:
+                    rows = rows[np.argpartition(-scores[rows], limit)[:limit + 1]]
+                rows = rows[np.argsort(-scores[rows], kind="stable")]
+                scores = scores[rows]
+            if not include_self:
+                keep = rows != self._rows[id]
+                rows, scores = rows[keep], scores[keep]
+            rows, scores = rows[:limit], scores[:limit]
+            return [self._to_model(row, score=float(score)) for row, score in zip(rows, scores)]
+
+    def close(self):
+        with self._lock:
+            self.save_index()
+            self._vectors.flush()
+            self.compact_payload()
+            self._payload_file.close()
+            self._lock_file.close()
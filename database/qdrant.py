@@ -1,12 +1,23 @@
+import asyncio
+import logging
 from datetime import datetime, timezone
 from qdrant_client import QdrantClient
-from qdrant_client.http.models import PointStruct, Filter, FieldCondition, Range
+from qdrant_client.http.models import PointStruct, Filter, FieldCondition, Range, Distance, VectorParams, \
+    HnswConfigDiff, PayloadSchemaType, ScalarQuantization, ScalarQuantizationConfig, ScalarType, \
+    BinaryQuantization, BinaryQuantizationConfig
 from database.db_interface import DatabaseInterface
-from typing import List, Dict, Optional
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from typing import List, Dict, Optional, Iterator, Tuple
+import numpy as np
 from pydantic import BaseModel
-from database.models import FaceEmbeddings
+from database.models import FaceEmbeddings, create_metadata, payload_column
 
-def get_result(point) -> FaceEmbeddings:
+logger = logging.getLogger(__name__)
+
+def get_result(point, vector: Optional[np.ndarray] = None) -> FaceEmbeddings:
+    """
+    :param vector: Embedding of the point as a float32 array (default: point.vector).
+    """
     metadata = point.payload
     return FaceEmbeddings(
         id=point.id,
@@ -20,37 +31,190 @@ def get_result(point) -> FaceEmbeddings:
         num_people=metadata.get("num_people"),
         last_processed_at=metadata.get("last_processed_at"),
         updated_at=metadata.get("updated_at"),
-        embedding=point.vector,
+        embedding=point.vector if vector is None else vector,
         score=getattr(point, 'score', None),
+        leaderboard=metadata.get("leaderboard"),
     )
 
-def create_metadata(face_data: FaceEmbeddings, created_at: Optional[float] = None) -> dict:
+def get_results(points) -> List[FaceEmbeddings]:
     """
-    Create metadata dictionary for a FaceData object.
-
-    :param face_data: A FaceData object.
-    :param created_at: Optional timestamp for the created_at field. Defaults to the current time.
-    :return: Metadata dictionary.
+    Models of a page of points. The vectors are converted into one float32 matrix
+    and every model keeps a row of it, instead of one conversion per point.
+    """
+    if not points:
+        return []
+    if points[0].vector is None:
+        return [get_result(point) for point in points]
+
+    vectors = np.array([point.vector for point in points], dtype=np.float32)
+    return [get_result(point, vectors[i]) for i, point in enumerate(points)]
+
+# 필터에 사용하는 payload field 와 index type
+PAYLOAD_INDEXES = {
+    "created_at": PayloadSchemaType.FLOAT,
+    "photo_id": PayloadSchemaType.KEYWORD,
+    "photo_title": PayloadSchemaType.KEYWORD,
+    "gender": PayloadSchemaType.INTEGER,
+}
+
+def quantization_config(quantization: Optional[str]):
+    """
+    :param quantization: None / "scalar" (int8, 4x smaller) / "binary" (32x smaller, needs rescoring to stay accurate).
     """
-    return {
-        "photo_title": face_data.photo_title,
-        "photo_id": face_data.photo_id,
-        "face_index": face_data.face_index,
-        "age": face_data.age,
-        "gender": face_data.gender,
-        "file_name": face_data.file_name,
-        "last_processed_at": face_data.last_processed_at,
-        "num_people": face_data.num_people,
-        "updated_at": datetime.now(timezone.utc).timestamp(),
-        "created_at": created_at
-    }
+    if not quantization:
+        return None
+    elif quantization == "scalar":
+        return ScalarQuantization(scalar=ScalarQuantizationConfig(type=ScalarType.INT8, quantile=0.99, always_ram=True))
+    elif quantization == "binary":
+        return BinaryQuantization(binary=BinaryQuantizationConfig(always_ram=True))
+    raise ValueError(f"Unknown quantization '{quantization}'. Available: scalar, binary")
+
+def _quantization_name(config) -> Optional[str]:
+    if isinstance(config, ScalarQuantization):
+        return "scalar"
+    elif isinstance(config, BinaryQuantization):
+        return "binary"
+    return None if config is None else type(config).__name__
+
+def _created_after(date_ts: float) -> Filter:
+    # 숫자형 필드 "created_at"를 대상으로 Range 필터 적용
+    return Filter(
+        must=[
+            FieldCondition(
+                key="created_at",
+                range=Range(gt=date_ts)
+            )
+        ]
+    )
 
 # Qdrant implementation of the database interface
 class QdrantDatabase(DatabaseInterface):
 
-    def __init__(self, host, port, collection_name):
-        self.client = QdrantClient(host=host, port=port)
+    def __init__(self, host, port, collection_name, scroll_page_size=256, scroll_prefetch=True,
+                 prefer_grpc=False, grpc_port=6334, timeout=None, max_connections=16, keepalive_connections=16,
+                 keepalive_seconds=30.0, upsert_batch_size=256, upsert_parallel=1):
+        """
+        :param prefer_grpc: Use gRPC (grpc_port) instead of REST/JSON for every call.
+        :param timeout: Request timeout in seconds (None: client default).
+        :param max_connections: REST connection pool size.
+        :param keepalive_connections: REST connections kept open between requests.
+        :param keepalive_seconds: Idle time before a REST connection is closed, or the gRPC keepalive ping interval.
+        :param upsert_batch_size: Points per upsert request in save_data_batch.
+        :param upsert_parallel: Upsert requests in flight at once in save_data_batch.
+        """
+        self.host = host
+        self.port = port
+        self.grpc_port = grpc_port
+        self.prefer_grpc = prefer_grpc
+        self.timeout = timeout
+        self.max_connections = max_connections
+        self.keepalive_connections = keepalive_connections
+        self.keepalive_seconds = keepalive_seconds
+        self.upsert_batch_size = upsert_batch_size
+        self.upsert_parallel = max(upsert_parallel, 1)
+
+        self.client = QdrantClient(**self.client_options())
+        self._async_client = None
         self.collection_name = collection_name
+        self.scroll_page_size = scroll_page_size
+        self.scroll_prefetch = scroll_prefetch
+
+    def client_options(self) -> dict:
+        """
+        Connection settings shared by the sync and the async client.
+        """
+        import httpx
+
+        options = dict(host=self.host, port=self.port, grpc_port=self.grpc_port,
+                       prefer_grpc=self.prefer_grpc, timeout=self.timeout)
+        if self.prefer_grpc:
+            options["grpc_options"] = {
+                "grpc.keepalive_time_ms": int(self.keepalive_seconds * 1000),
+                "grpc.keepalive_permit_without_calls": 1,
+                # 512-d 벡터 page 가 기본 4MB 제한을 넘지 않도록
+                "grpc.max_receive_message_length": 64 * 1024 * 1024,
+            }
+        # qdrant_client 는 localhost 에서 keepalive 를 끄기 때문에 pool 설정을 항상 넘긴다
+        options["limits"] = httpx.Limits(
+            max_connections=self.max_connections,
+            max_keepalive_connections=self.keepalive_connections,
+            keepalive_expiry=self.keepalive_seconds,
+        )
+        return options
+
+    @property
+    def async_client(self):
+        """
+        AsyncQdrantClient with the same settings, created on first use.
+        """
+        if self._async_client is None:
+            from qdrant_client import AsyncQdrantClient
+            self._async_client = AsyncQdrantClient(**self.client_options())
+        return self._async_client
+
+    def ensure_schema(self, dim=512, on_disk=False, quantization=None, hnsw_m=16, hnsw_ef_construct=100) -> List[str]:
+        """
+        Create the collection (cosine distance) and the payload indexes of PAYLOAD_INDEXES if they are missing.
+        An existing collection is not changed apart from missing payload indexes; its other differences are returned.
+
+        :param dim: Vector size.
+        :param on_disk: Serve the original vectors from disk (the quantized ones stay in RAM).
+        :param quantization: None / "scalar" / "binary".
+        :param hnsw_m: Edges per node of the HNSW graph.
+        :param hnsw_ef_construct: Neighbours considered while building the HNSW graph.
+        :return: Differences between the existing collection and these settings.
+        """
+        issues = []
+
+        created = False
+        if not self.client.collection_exists(self.collection_name):
+            try:
+                self.client.create_collection(
+                    collection_name=self.collection_name,
+                    vectors_config=VectorParams(size=dim, distance=Distance.COSINE, on_disk=on_disk),
+                    hnsw_config=HnswConfigDiff(m=hnsw_m, ef_construct=hnsw_ef_construct),
+                    quantization_config=quantization_config(quantization),
+                )
+                created = True
+                logger.info(f"Created collection '{self.collection_name}' (dim={dim}, on_disk={on_disk}, "
+                            f"quantization={quantization}, m={hnsw_m}, ef_construct={hnsw_ef_construct})")
+            except Exception:
+                # 다른 프로세스가 먼저 만든 경우 ("already exists") 기존 collection 으로 확인한다
+                if not self.client.collection_exists(self.collection_name):
+                    raise
+                logger.info(f"Collection '{self.collection_name}' was created by another process")
+
+        if created:
+            payload_schema = {}
+        else:
+            info = self.client.get_collection(self.collection_name)
+            payload_schema = info.payload_schema or {}
+            vectors = info.config.params.vectors
+            hnsw = info.config.hnsw_config
+
+            expected = {
+                "vector size": (vectors.size, dim),
+                "distance": (vectors.distance, Distance.COSINE),
+                "vectors on disk": (bool(vectors.on_disk), on_disk),
+                "quantization": (_quantization_name(info.config.quantization_config), quantization or None),
+                "hnsw m": (hnsw.m, hnsw_m),
+                "hnsw ef_construct": (hnsw.ef_construct, hnsw_ef_construct),
+            }
+            for name, (actual, wanted) in expected.items():
+                if actual != wanted:
+                    issues.append(f"{name} is {actual}, configured {wanted}")
+
+        for field, schema in PAYLOAD_INDEXES.items():
+            index = payload_schema.get(field)
+            if index is None:
+                self.client.create_payload_index(self.collection_name, field_name=field, field_schema=schema)
+                logger.info(f"Created payload index '{field}' ({schema})")
+            elif index.data_type != schema:
+                issues.append(f"payload index '{field}' is {index.data_type}, expected {schema}")
+
+        for issue in issues:
+            logger.warning(f"Collection '{self.collection_name}' out of spec: {issue}")
+        return issues
 
     def save_data(self, face_data: BaseModel):
         """
@@ -65,61 +229,109 @@ class QdrantDatabase(DatabaseInterface):
             points=[
                 PointStruct(
                     id=face_data.id,
-                    vector=face_data.embedding,
+                    vector=face_data.embedding.tolist(),
                     payload=metadata
                 )
             ]
         )
 
-    def save_data_batch(self, data_list: List[BaseModel]):
+    def _point_batches(self, data_list: List[BaseModel]) -> Iterator[List[PointStruct]]:
         """
-        Save multiple face data records into Qdrant in one batch.
-
-        :param data_list: A list of FaceEmbeddings objects.
+        PointStructs of the records in chunks of upsert_batch_size, all with the same created_at.
         """
-        points = []
         current_time = datetime.now(timezone.utc).timestamp()
 
-        for data in data_list:
-            metadata = create_metadata(data, created_at=current_time)
+        for start in range(0, len(data_list), self.upsert_batch_size):
+            chunk = data_list[start:start + self.upsert_batch_size]
+            # 한 번의 tolist 로 chunk 전체를 변환한다
+            vectors = np.stack([data.embedding for data in chunk]).tolist()
 
-            points.append(
+            yield [
                 PointStruct(
                     id=data.id,
-                    vector=data.embedding,
-                    payload=metadata
+                    vector=vector,
+                    payload=create_metadata(data, created_at=current_time)
                 )
-            )
+                for data, vector in zip(chunk, vectors)
+            ]
 
-        if points:
-            self.client.upsert(
-                collection_name=self.collection_name,
-                points=points
-            )
-            
-    def get_data(self, filters: Dict=None, with_vectors=False) -> List[BaseModel]:
+    def save_data_batch(self, data_list: List[BaseModel]):
+        """
+        Save multiple face data records into Qdrant.
+        The records are sent in chunks of upsert_batch_size, up to upsert_parallel requests at a time.
+
+        :param data_list: A list of FaceEmbeddings objects.
+        """
+        if not data_list:
+            return
+
+        def upsert(points):
+            self.client.upsert(collection_name=self.collection_name, points=points)
+
+        if self.upsert_parallel == 1 or len(data_list) <= self.upsert_batch_size:
+            for points in self._point_batches(data_list):
+                upsert(points)
+            return
+
+        # 진행 중인 요청이 upsert_parallel 개를 넘지 않도록, 하나가 끝나야 다음 chunk 를 만든다
+        with ThreadPoolExecutor(max_workers=self.upsert_parallel) as executor:
+            pending = set()
+            for points in self._point_batches(data_list):
+                if len(pending) >= self.upsert_parallel:
+                    done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        future.result()  # 요청의 예외를 호출자에게 전달한다
+                pending.add(executor.submit(upsert, points))
+            for future in pending:
+                future.result()
+
+    async def save_data_batch_async(self, data_list: List[BaseModel]):
+        """
+        save_data_batch on the async client, for callers running in an event loop.
+        """
+        batches = self._point_batches(data_list)
+
+        # upsert_parallel 개의 worker 가 chunk 를 하나씩 만들어 보낸다 (미리 모두 만들지 않음)
+        async def worker():
+            for points in batches:
+                await self.async_client.upsert(collection_name=self.collection_name, points=points)
+
+        await asyncio.gather(*(worker() for _ in range(self.upsert_parallel)))
+
+
+    def get_data(self, filters: Dict=None, with_vectors=False, limit=None) -> List[BaseModel]:
         """
         Retrieve data from Qdrant based on filters.
 
-        :param file_name: Filter by file name.
-        :param photo_id: Filter by photo ID.
+        :param filters: Filter by payload values (e.g. photo_id, photo_title). Empty values are ignored.
         :param with_vectors: Whether to include vector data.
+        :param limit: The maximum number of records (None: all).
         :return: A list of FaceEmbeddings objects.
         """
+        data_list = []
+        for data in self.iter_data(filters, with_vectors=with_vectors, page_size=limit and min(limit, self.scroll_page_size)):
+            if limit is not None and len(data_list) >= limit:
+                break
+            data_list.append(data)
+
+        return data_list
+
+    def iter_data(self, filters: Dict=None, with_vectors=False, page_size=None) -> Iterator[BaseModel]:
+        """
+        Iterate over all records matching the filters.
+
+        :param filters: Filter by payload values. Empty values are ignored.
+        :param with_vectors: Whether to include vector data.
+        :param page_size: Points per scroll request (default: scroll_page_size).
+        :return: Generator of FaceEmbeddings objects.
+        """
         filters = [
-            {"key": key, "match": {"value": value}} for key, value in filters.items() if value
+            {"key": key, "match": {"value": value}} for key, value in (filters or {}).items() if value
         ]
 
         query_filter = {"must": filters} if filters else None
 
-        results = self.client.scroll(
-            collection_name=self.collection_name,
-            scroll_filter=query_filter,
-            limit=100,
-            with_vectors=with_vectors  # 파라미터로 벡터 정보를 포함할지 여부 지정
-        )
-
-        return [get_result(point) for point in results[0]]
+        return self._scroll(query_filter, with_vectors=with_vectors, page_size=page_size)
 
     def get_data_by_id(self, id, with_vectors=False) -> BaseModel:
         """
@@ -137,34 +349,83 @@ class QdrantDatabase(DatabaseInterface):
 
     def get_data_after_date(self, date_ts: float, with_vectors=False) -> List[BaseModel]:
         """
-        Retrieve data created after a specific timestamp.
+        Retrieve all data created after a specific timestamp.
 
         :param date_ts: The timestamp to filter data.
         :param with_vectors: Whether to include vector data.
-        :return: A list of BaseModel objects.
+        :return: A list of BaseModel objects, oldest first.
         """
-        # 숫자형 필드 "created_at"를 대상으로 Range 필터 적용
-        query_filter = Filter(
-            must=[
-                FieldCondition(
-                    key="created_at",
-                    range=Range(gt=date_ts)
-                )
-            ]
-        )
-
-        results = self.client.scroll(
-            collection_name=self.collection_name,
-            scroll_filter=query_filter,
-            limit=500,
-            with_vectors=with_vectors  # 파라미터로 벡터 정보를 포함할지 여부 지정
-        )
-
-        data_list = [get_result(point) for point in results[0]]
+        data_list = list(self.iter_data_after_date(date_ts, with_vectors=with_vectors))
         data_list.sort(key=lambda x: x.created_at)
 
         return data_list
 
+    def iter_data_after_date(self, date_ts: float, with_vectors=False, page_size=None) -> Iterator[BaseModel]:
+        """
+        Iterate over all data created after a specific timestamp (in point id order).
+
+        :param date_ts: The timestamp to filter data.
+        :param with_vectors: Whether to include vector data.
+        :param page_size: Points per scroll request (default: scroll_page_size).
+        :return: Generator of FaceEmbeddings objects.
+        """
+        return self._scroll(_created_after(date_ts), with_vectors=with_vectors, page_size=page_size)
+
+    def iter_vector_pages_after_date(self, date_ts: float, fields=("created_at",), page_size=None) -> Iterator[Tuple[np.ndarray, Dict[str, np.ndarray]]]:
+        """
+        Iterate over the data created after a specific timestamp as numpy pages.
+
+        :param date_ts: The timestamp to filter data.
+        :param fields: Payload fields returned as columns ("id" returns the point IDs).
+        :param page_size: Points per scroll request (default: scroll_page_size).
+        :return: Generator of (vectors (n, dim) float32, {field: (n,) array}) per scroll page.
+        """
+        for points in self._scroll_pages(_created_after(date_ts), with_vectors=True, page_size=page_size):
+            if not points:
+                continue
+            vectors = np.array([point.vector for point in points], dtype=np.float32)
+            columns = {
+                field: np.array([str(point.id) for point in points], dtype=object) if field == "id"
+                else payload_column([point.payload.get(field) for point in points])
+                for field in fields
+            }
+            yield vectors, columns
+
+    def _scroll(self, scroll_filter, with_vectors=False, page_size=None) -> Iterator[BaseModel]:
+        for points in self._scroll_pages(scroll_filter, with_vectors=with_vectors, page_size=page_size):
+            yield from get_results(points)
+
+    def _scroll_pages(self, scroll_filter, with_vectors=False, page_size=None) -> Iterator[list]:
+        """
+        Follow next_page_offset until the last page.
+        With scroll_prefetch the next page is requested while the current one is consumed.
+        """
+        page_size = page_size or self.scroll_page_size
+
+        def fetch(offset):
+            return self.client.scroll(
+                collection_name=self.collection_name,
+                scroll_filter=scroll_filter,
+                limit=page_size,
+                offset=offset,
+                with_vectors=with_vectors  # 파라미터로 벡터 정보를 포함할지 여부 지정
+            )
+
+        if not self.scroll_prefetch:
+            offset = None
+            while True:
+                points, offset = fetch(offset)
+                yield points
+                if offset is None:
+                    return
+
+        with ThreadPoolExecutor(max_workers=1, thread_name_prefix="qdrant-scroll") as executor:
+            future = executor.submit(fetch, None)
+            while future is not None:
+                points, offset = future.result()
+                future = executor.submit(fetch, offset) if offset is not None else None
+                yield points
+
     def _get_point_by_id(self, id, with_vectors=False):
         # Retrieve the vector by its ID
         point = self.client.retrieve(
@@ -200,50 +461,35 @@ class QdrantDatabase(DatabaseInterface):
             limit=top_n
         )
 
-        return [get_result(point) for point in search_result]
+        return get_results(search_result)
 
     # Function to search vectors by minimum score threshold
-    def search_vectors_by_min_score(self, id, min_score, include_self=False, batch_size=50) -> List[BaseModel]:
+    def search_vectors_by_min_score(self, id, min_score, include_self=False, limit=1000) -> List[BaseModel]:
         """
         Search for vectors with a minimum score threshold.
+        The threshold is applied by Qdrant, so the whole range comes back in one search.
 
         :param id: The ID of the vector to search for.
         :param min_score: The minimum score threshold.
-        :param batch_size: The number of results to fetch per batch.
-        :return: A list of FaceEmbeddings objects.
+        :param include_self: Whether to include the vector itself.
+        :param limit: The maximum number of results.
+        :return: A list of FaceEmbeddings objects, highest score first.
         """
         point = self._get_point_by_id(id, with_vectors=True)
 
         if not point:
             return []
-        
-        query_vector = point.vector
-
-        offset = 0
-        fetched_all = False
 
-        data_list = []
-        while not fetched_all:
-            search_result = self.client.search(
-                collection_name=self.collection_name,
-                query_vector=query_vector,
-                limit=batch_size,
-                offset=offset
-            )
-
-            if not search_result:
-                break
-
-            for point in search_result:
-
-                if point.id == id and not include_self:
-                    continue
-
-                if point.score < min_score:
-                    fetched_all = True
-                    break
-                data_list.append(get_result(point))
+        search_result = self.client.search(
+            collection_name=self.collection_name,
+            query_vector=point.vector,
+            score_threshold=min_score,
+            limit=limit + (0 if include_self else 1)
+        )
 
-            offset += batch_size
+        data_list = get_results([
+            point for point in search_result
+            if include_self or point.id != id
+        ])
 
-        return data_list
\ No newline at end of file
+        return data_list[:limit]
\ No newline at end of file
@@ -0,0 +1,208 @@
+import sys
+import time
+import logging
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+from concurrent.futures.process import BrokenProcessPool
+from typing import Callable, Iterable, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+class BatchReport:
+    """
+    Aggregated progress and throughput of a batch run.
+    """
+    def __init__(self, total: int):
+        self.total = total
+        self.processed = 0
+        self.succeeded = 0
+        self.skipped = 0
+        self.failed = 0
+        # worker pool 을 다시 만든 횟수
+        self.restarts = 0
+        self.started_at = time.perf_counter()
+
+    def add(self, result=None, error: Optional[BaseException] = None):
+        self.processed += 1
+        if error is not None:
+            self.failed += 1
+        elif result:
+            self.succeeded += 1
+        else:
+            self.skipped += 1
+
+    @property
+    def elapsed(self) -> float:
+        return time.perf_counter() - self.started_at
+
+    @property
+    def throughput(self) -> float:
+        elapsed = self.elapsed
+        return self.processed / elapsed if elapsed > 0 else 0.0
+
+    def progress_line(self) -> str:
+        percent = (self.processed / self.total) * 100 if self.total else 100.0
+        rate = self.throughput
+        eta = (self.total - self.processed) / rate if rate > 0 else 0.0
+        return (
+            f"\r{self.processed}/{self.total} Progress: {percent:.2f}% "
+            f"| {rate:.2f} img/s | failed: {self.failed} | ETA: {eta:.0f}s"
+        )
+
+    def summary(self) -> str:
+        return (
+            f"Processed {self.processed} images in {self.elapsed:.1f}s "
+            f"({self.throughput:.2f} img/s) - "
+            f"registered: {self.succeeded}, skipped: {self.skipped}, failed: {self.failed}"
+            + (f", worker pool restarts: {self.restarts}" if self.restarts else "")
+        )
+
+def run_batch(
+        tasks: Iterable,
+        worker_fn: Callable,
+        total: int,
+        workers: int = 1,
+        queue_size: int = 0,
+        initializer: Optional[Callable] = None,
+        initargs: Tuple = (),
+        chunk_size: int = 0,
+        max_pool_restarts: int = 3,
+        ) -> BatchReport:
+    """
+    Run `worker_fn(task)` for every task on a pool of worker processes.
+
+    Each worker process runs `initializer(*initargs)` once, so heavy state
+    (AI models, DB/storage clients) is loaded once per worker and reused for
+    every task it receives. At most `queue_size` tasks are in flight at a time,
+    which keeps memory bounded no matter how many tasks are produced.
+
+    :param tasks: Iterable of picklable task arguments.
+    :param worker_fn: Module level function executed in the workers.
+    :param total: Number of tasks (used for the progress report).
+    :param workers: Number of worker processes. 0 runs everything in the current process.
+    :param queue_size: Maximum number of in-flight tasks. Defaults to 2 x workers.
+    :param initializer: Optional function run once in every worker process.
+    :param initargs: Arguments for the initializer.
+    :param chunk_size: If > 0, tasks are grouped into lists of this size and `worker_fn`
+                       receives a list of tasks and must return a list of results.
+    :param max_pool_restarts: When a worker dies (OOM, native crash) its in-flight tasks are counted
+                              as failed and the pool is recreated, at most this many times.
+                              After that the remaining tasks are counted as failed.
+    :return: The final BatchReport.
+    """
+    report = BatchReport(total)
+
+    if chunk_size > 0:
+        tasks = _chunked(tasks, chunk_size)
+
+    if workers <= 0:
+        if initializer:
+            initializer(*initargs)
+        for task in tasks:
+            try:
+                _add_results(report, task, worker_fn(task), chunk_size)
+            except Exception as e:
+                logger.error(f"Task failed: {task} : {e}")
+                _add_results(report, task, None, chunk_size, error=e)
+            _print_progress(report)
+        return report
+
+    queue_size = max(queue_size or workers * 2, workers)
+
+    def new_executor():
+        # spawn: workers must not inherit onnxruntime / torch thread pools from the parent
+        return ProcessPoolExecutor(
+            max_workers=workers,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=initializer,
+            initargs=initargs
+        )
+
+    executor = new_executor()
+    restarts = 0
+    pending = {}
+    task_iter = iter(tasks)
+    exhausted = False
+
+    try:
+        while pending or not exhausted:
+            broken = None
+
+            # 큐에 여유가 있는 만큼만 작업을 채운다
+            while not exhausted and len(pending) < queue_size:
+                try:
+                    task = next(task_iter)
+                except StopIteration:
+                    exhausted = True
+                    break
+                try:
+                    pending[executor.submit(worker_fn, task)] = task
+                except BrokenProcessPool as e:
+                    _add_results(report, task, None, chunk_size, error=e)
+                    broken = e
+                    break
+
+            if broken is None:
+                if not pending:
+                    break
+
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    task = pending.pop(future)
+                    error = future.exception()
+                    if error is not None:
+                        logger.error(f"Task failed: {task} : {error}")
+                        _add_results(report, task, None, chunk_size, error=error)
+                        if isinstance(error, BrokenProcessPool):
+                            broken = error
+                    else:
+                        _add_results(report, task, future.result(), chunk_size)
+                    _print_progress(report)
+
+            if broken is not None:
+                # 죽은 worker 가 있으면 pool 의 나머지 작업도 모두 실패한다
+                for task in pending.values():
+                    _add_results(report, task, None, chunk_size, error=broken)
+                pending.clear()
+                executor.shutdown(wait=False, cancel_futures=True)
+
+                if restarts >= max_pool_restarts:
+                    logger.error(f"Worker pool broke {restarts + 1} times, the remaining tasks are not processed : {broken}")
+                    for task in task_iter:
+                        _add_results(report, task, None, chunk_size, error=broken)
+                    _print_progress(report)
+                    break
+
+                restarts += 1
+                report.restarts = restarts
+                logger.warning(f"A worker process died, restarting the pool ({restarts}/{max_pool_restarts}) : {broken}")
+                executor = new_executor()
+                _print_progress(report)
+    finally:
+        executor.shutdown(wait=True)
+
+    return report
+
+def _chunked(tasks: Iterable, chunk_size: int):
+    chunk = []
+    for task in tasks:
+        chunk.append(task)
+        if len(chunk) >= chunk_size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+def _add_results(report: BatchReport, task, result, chunk_size: int, error: Optional[BaseException] = None):
+    if chunk_size <= 0:
+        report.add(result=result, error=error)
+        return
+
+    # 청크 단위 작업: 청크 안의 작업 수만큼 집계한다
+    results = result if error is None else [None] * len(task)
+    for item in results:
+        report.add(result=item, error=error)
+
+def _print_progress(report: BatchReport):
+    sys.stdout.write(report.progress_line())
+    sys.stdout.flush()
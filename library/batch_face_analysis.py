@@ -0,0 +1,234 @@
+import logging
+import cv2
+import numpy as np
+from typing import List, Tuple
+from insightface.app.common import Face
+from insightface.model_zoo.retinaface import distance2bbox, distance2kps
+from insightface.utils import face_align
+
+logger = logging.getLogger(__name__)
+
+def has_dynamic_batch(model) -> bool:
+    """
+    True if the first input dimension of the ONNX model is symbolic, i.e. it accepts N > 1.
+    """
+    return not isinstance(model.input_shape[0], int)
+
+class BatchFaceAnalysis:
+    """
+    Batched inference path on top of an insightface FaceAnalysis.
+
+    FaceAnalysis.get() runs every ONNX session with batch size 1 (one image,
+    then one face at a time). This class letterboxes N images into a single
+    detector batch and runs recognition and genderage on all aligned face
+    crops of those images as one tensor. Other modules (landmarks) keep the
+    per-face path. The returned Face objects are the same as FaceAnalysis.get().
+    """
+    def __init__(self, face_analysis, max_batch_size=64):
+        """
+        :param face_analysis: A prepared insightface FaceAnalysis.
+        :param max_batch_size: Maximum number of images / face crops per ONNX run.
+        """
+        self.face_analysis = face_analysis
+        self.max_batch_size = max_batch_size
+        self.det_model = face_analysis.det_model
+        self.det_batchable = has_dynamic_batch(self.det_model)
+
+    def get(self, imgs: List[np.ndarray]) -> List[List[Face]]:
+        """
+        Detect and analyze faces on several images at once.
+
+        :param imgs: List of BGR images.
+        :return: List of face lists, one per input image (same order).
+        """
+        faces_per_image = []
+        for img, (bboxes, kpss) in zip(imgs, self.detect(imgs)):
+            faces = []
+            for i in range(bboxes.shape[0]):
+                kps = kpss[i] if kpss is not None else None
+                faces.append(Face(bbox=bboxes[i, 0:4], kps=kps, det_score=bboxes[i, 4]))
+            faces_per_image.append(faces)
+
+        pairs = [(img, face) for img, faces in zip(imgs, faces_per_image) for face in faces]
+        if not pairs:
+            return faces_per_image
+
+        for taskname, model in self.face_analysis.models.items():
+            if taskname == 'detection':
+                continue
+            elif taskname == 'recognition' and has_dynamic_batch(model):
+                self._get_embeddings(model, pairs)
+            elif taskname == 'genderage' and has_dynamic_batch(model):
+                self._get_genderage(model, pairs)
+            else:
+                for img, face in pairs:
+                    model.get(img, face)
+
+        return faces_per_image
+
+    def detect(self, imgs: List[np.ndarray]) -> List[Tuple[np.ndarray, np.ndarray]]:
+        """
+        Run the detector on several images.
+
+        :param imgs: List of BGR images.
+        :return: List of (bboxes with scores, keypoints) tuples like RetinaFace.detect().
+        """
+        if not self.det_batchable or len(imgs) < 2:
+            return [self.det_model.detect(img, max_num=0, metric='default') for img in imgs]
+
+        results = []
+        for start in range(0, len(imgs), self.max_batch_size):
+            chunk = imgs[start:start + self.max_batch_size]
+            try:
+                results.extend(self._detect_batch(chunk))
+            except Exception as e:
+                # 모델이 batch 입력을 받지 못하면 이후로는 이미지 단위로 처리한다
+                logger.warning(f"Batched detection is not supported by the detection model, falling back: {e}")
+                self.det_batchable = False
+                results.extend(self.det_model.detect(img, max_num=0, metric='default') for img in chunk)
+        return results
+
+    def _detect_batch(self, imgs):
+        det_model = self.det_model
+        input_size = det_model.input_size
+
+        det_imgs = []
+        det_scales = []
+        for img in imgs:
+            det_img, det_scale = letterbox(img, input_size)
+            det_imgs.append(det_img)
+            det_scales.append(det_scale)
+
+        blob = cv2.dnn.blobFromImages(
+            det_imgs, 1.0 / det_model.input_std, input_size,
+            (det_model.input_mean, det_model.input_mean, det_model.input_mean), swapRB=True
+        )
+        net_outs = det_model.session.run(det_model.output_names, {det_model.input_name: blob})
+
+        results = []
+        for b, det_scale in enumerate(det_scales):
+            outs = [select_batch_item(out, b, len(imgs)) for out in net_outs]
+            results.append(self._postprocess(outs, blob.shape[2], blob.shape[3], det_scale))
+        return results
+
+    def _postprocess(self, net_outs, input_height, input_width, det_scale):
+        """
+        Same decoding as RetinaFace.forward() + detect() for one item of a batch.
+        """
+        det_model = self.det_model
+        fmc = det_model.fmc
+        threshold = det_model.det_thresh
+
+        scores_list = []
+        bboxes_list = []
+        kpss_list = []
+        for idx, stride in enumerate(det_model._feat_stride_fpn):
+            scores = net_outs[idx]
+            bbox_preds = net_outs[idx + fmc] * stride
+            if det_model.use_kps:
+                kps_preds = net_outs[idx + fmc * 2] * stride
+
+            height = input_height // stride
+            width = input_width // stride
+            key = (height, width, stride)
+            if key in det_model.center_cache:
+                anchor_centers = det_model.center_cache[key]
+            else:
+                anchor_centers = np.stack(np.mgrid[:height, :width][::-1], axis=-1).astype(np.float32)
+                anchor_centers = (anchor_centers * stride).reshape((-1, 2))
+                if det_model._num_anchors > 1:
+                    anchor_centers = np.stack([anchor_centers] * det_model._num_anchors, axis=1).reshape((-1, 2))
+                if len(det_model.center_cache) < 100:
+                    det_model.center_cache[key] = anchor_centers
+
+            pos_inds = np.where(scores >= threshold)[0]
+            bboxes = distance2bbox(anchor_centers, bbox_preds)
+            scores_list.append(scores[pos_inds])
+            bboxes_list.append(bboxes[pos_inds])
+            if det_model.use_kps:
+                kpss = distance2kps(anchor_centers, kps_preds)
+                kpss = kpss.reshape((kpss.shape[0], -1, 2))
+                kpss_list.append(kpss[pos_inds])
+
+        scores = np.vstack(scores_list)
+        order = scores.ravel().argsort()[::-1]
+        bboxes = np.vstack(bboxes_list) / det_scale
+        pre_det = np.hstack((bboxes, scores)).astype(np.float32, copy=False)
+        pre_det = pre_det[order, :]
+        keep = det_model.nms(pre_det)
+        det = pre_det[keep, :]
+
+        kpss = None
+        if det_model.use_kps:
+            kpss = np.vstack(kpss_list) / det_scale
+            kpss = kpss[order, :, :][keep, :, :]
+
+        return det, kpss
+
+    def _get_embeddings(self, model, pairs):
+        crops = [
+            face_align.norm_crop(img, landmark=face.kps, image_size=model.input_size[0])
+            for img, face in pairs
+        ]
+        embeddings = self._run_chunked(model.get_feat, crops)
+        for (_, face), embedding in zip(pairs, embeddings):
+            face.embedding = embedding.flatten()
+
+    def _get_genderage(self, model, pairs):
+        crops = []
+        for img, face in pairs:
+            bbox = face.bbox
+            w, h = (bbox[2] - bbox[0]), (bbox[3] - bbox[1])
+            center = (bbox[2] + bbox[0]) / 2, (bbox[3] + bbox[1]) / 2
+            scale = model.input_size[0] / (max(w, h) * 1.5)
+            aimg, _ = face_align.transform(img, center, model.input_size[0], scale, 0)
+            crops.append(aimg)
+
+        def run(chunk):
+            blob = cv2.dnn.blobFromImages(
+                chunk, 1.0 / model.input_std, model.input_size,
+                (model.input_mean, model.input_mean, model.input_mean), swapRB=True
+            )
+            return model.session.run(model.output_names, {model.input_name: blob})[0]
+
+        preds = self._run_chunked(run, crops)
+        for (_, face), pred in zip(pairs, preds):
+            face['gender'] = np.argmax(pred[:2])
+            face['age'] = int(np.round(pred[2] * 100))
+
+    def _run_chunked(self, fn, crops):
+        outputs = [
+            fn(crops[start:start + self.max_batch_size])
+            for start in range(0, len(crops), self.max_batch_size)
+        ]
+        return np.concatenate(outputs, axis=0)
+
+def letterbox(img: np.ndarray, input_size: Tuple[int, int]) -> Tuple[np.ndarray, float]:
+    """
+    Resize the image into the detector input keeping the aspect ratio
+    (zero padded at the right/bottom), exactly like RetinaFace.detect().
+
+    :return: (letterboxed image, scale factor)
+    """
+    im_ratio = float(img.shape[0]) / img.shape[1]
+    model_ratio = float(input_size[1]) / input_size[0]
+    if im_ratio > model_ratio:
+        new_height = input_size[1]
+        new_width = int(new_height / im_ratio)
+    else:
+        new_width = input_size[0]
+        new_height = int(new_width * im_ratio)
+    det_scale = float(new_height) / img.shape[0]
+
+    det_img = np.zeros((input_size[1], input_size[0], 3), dtype=np.uint8)
+    det_img[:new_height, :new_width, :] = cv2.resize(img, (new_width, new_height))
+    return det_img, det_scale
+
+def select_batch_item(output: np.ndarray, index: int, batch_size: int) -> np.ndarray:
+    """
+    Take one item out of a detector output.
+    Outputs are either (N, K, C) or flattened batch-major to (N*K, C).
+    """
+    if output.ndim == 3:
+        return output[index]
+    return output.reshape(batch_size, -1, output.shape[-1])[index]
@@ -0,0 +1,126 @@
+import os
+import hashlib
+import logging
+import tempfile
+import numpy as np
+from typing import Dict, List, Optional, Tuple
+from insightface.app.common import Face
+
+logger = logging.getLogger(__name__)
+
+class FaceAnalysisCache:
+    """
+    Local on-disk cache of decoded images and their analyzed Face objects.
+
+    One .npz file per object, keyed by a hash of the namespace, bucket and
+    object name. The object ETag is stored in the file and a different
+    ETag invalidates the entry, so a changed object is downloaded and
+    analyzed again while unchanged ones never leave the disk.
+    """
+    def __init__(self, cache_dir: str, namespace: str = "buffalo_l"):
+        """
+        :param cache_dir: Directory for the cache files (created if missing).
+        :param namespace: Model profile name. Results of different models never mix.
+        """
+        self.cache_dir = cache_dir
+        self.namespace = namespace
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def _path(self, bucket: str, file_name: str) -> str:
+        key = hashlib.sha1(f"{self.namespace}/{bucket}/{file_name}".encode("utf-8")).hexdigest()
+        return os.path.join(self.cache_dir, f"{key}.npz")
+
+    def load(self, bucket: str, file_name: str, etag: str) -> Optional[Tuple[np.ndarray, List[Face]]]:
+        """
+        :return: (image, faces) or None if the entry is missing or its ETag differs.
+        """
+        path = self._path(bucket, file_name)
+        if not os.path.exists(path):
+            return None
+
+        try:
+            with np.load(path, allow_pickle=False) as data:
+                if str(data["etag"]) != etag:
+                    return None
+
+                image = data["image"]
+                keys = [str(k) for k in data["face_keys"]]
+                columns = {k: data[f"face__{k}"] for k in keys}
+                faces = [
+                    Face({k: columns[k][i] for k in keys})
+                    for i in range(int(data["num_faces"]))
+                ]
+        except Exception as e:
+            logger.warning(f"Ignoring broken cache entry {path} : {e}")
+            return None
+
+        return image, faces
+
+    def save(self, bucket: str, file_name: str, etag: str, image: np.ndarray, faces: List[Face]):
+        # 모든 얼굴에 값이 있는 속성만 저장한다 (bbox, kps, det_score, embedding, gender, age ...)
+        keys = [
+            k for k in (faces[0].keys() if faces else [])
+            if all(f.get(k) is not None for f in faces)
+        ]
+
+        arrays = {
+            "etag": np.asarray(etag),
+            "image": image,
+            "num_faces": np.asarray(len(faces)),
+            "face_keys": np.asarray(keys, dtype=str),
+        }
+        for k in keys:
+            arrays[f"face__{k}"] = np.stack([np.asarray(f[k]) for f in faces])
+
+        path = self._path(bucket, file_name)
+        fd, tmp_path = tempfile.mkstemp(dir=self.cache_dir, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                np.savez(f, **arrays)
+            os.replace(tmp_path, path)
+        except Exception:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+def load_analyzed_images(storage, bucket: str, prefixes: List[str], detector,
+                         cache: Optional[FaceAnalysisCache] = None) -> Dict[str, List[Tuple[np.ndarray, List[Face]]]]:
+    """
+    Load the images of a bucket grouped by prefix together with their detected faces.
+    Only objects missing from the cache (or with a new ETag) are downloaded and analyzed.
+
+    :param storage: StorageInterface.
+    :param bucket: Bucket name.
+    :param prefixes: File name prefixes, e.g. ["m_", "f_"].
+    :param detector: FaceAnalysis used for cache misses.
+    :param cache: Optional FaceAnalysisCache.
+    :return: dict[prefix, list[(image, faces)]]
+    """
+    result = {}
+    hits = 0
+
+    for i, prefix in enumerate(prefixes):
+        etags = {
+            file_name: etag
+            for file_name, etag in storage.list_file_etags(bucket, prefix=prefix).items()
+            if not any(file_name.startswith(p) for p in prefixes[:i])
+        }
+
+        entries = {}
+        for file_name, etag in etags.items():
+            entries[file_name] = cache.load(bucket, file_name, etag) if cache else None
+        hits += sum(1 for entry in entries.values() if entry is not None)
+
+        # 캐시에 없는 이미지만 한꺼번에 내려받아 분석한다
+        misses = [file_name for file_name, entry in entries.items() if entry is None]
+        for file_name, image in zip(misses, storage.load_images(bucket, misses)):
+            faces = detector.get(image)
+            if cache:
+                cache.save(bucket, file_name, etags[file_name], image, faces)
+            entries[file_name] = (image, faces)
+
+        result[prefix] = list(entries.values())
+
+    total = sum(len(v) for v in result.values())
+    logger.info(f"Loaded {total} analyzed images from '{bucket}' ({hits} from cache).")
+    return result
@@ -0,0 +1,83 @@
+import cv2
+import numpy as np
+from insightface.app.common import Face
+from insightface.utils import face_align
+
+class SwapTemplate:
+    """
+    Template side of INSwapper.get() precomputed once per base image.
+
+    The aligned crop, its input blob, the inverse affine and the blurred
+    paste-back mask only depend on the base image and its face, so they are
+    computed here once. swap() then only projects the source embedding,
+    runs the ONNX session and pastes the result back inside the mask's
+    bounding box. The output is the same as face_swapper.get(image, face, source_face).
+    """
+    def __init__(self, swapper, image: np.ndarray, face: Face):
+        """
+        :param swapper: insightface INSwapper model.
+        :param image: Base (template) image.
+        :param face: Face of the base image to be replaced.
+        """
+        self.swapper = swapper
+        self.image = image
+        self.face = face
+
+        aimg, M = face_align.norm_crop2(image, face.kps, swapper.input_size[0])
+        self.blob = cv2.dnn.blobFromImage(
+            aimg, 1.0 / swapper.input_std, swapper.input_size,
+            (swapper.input_mean, swapper.input_mean, swapper.input_mean), swapRB=True
+        )
+        IM = cv2.invertAffineTransform(M)
+
+        # paste-back mask (INSwapper.get 와 동일한 계산)
+        height, width = image.shape[:2]
+        img_white = np.full((aimg.shape[0], aimg.shape[1]), 255, dtype=np.float32)
+        img_mask = cv2.warpAffine(img_white, IM, (width, height), borderValue=0.0)
+        img_mask[img_mask > 20] = 255
+        mask_h_inds, mask_w_inds = np.where(img_mask == 255)
+        mask_h = np.max(mask_h_inds) - np.min(mask_h_inds)
+        mask_w = np.max(mask_w_inds) - np.min(mask_w_inds)
+        mask_size = int(np.sqrt(mask_h * mask_w))
+        k = max(mask_size // 10, 10)
+        img_mask = cv2.erode(img_mask, np.ones((k, k), np.uint8), iterations=1)
+        k = max(mask_size // 20, 5)
+        img_mask = cv2.GaussianBlur(img_mask, (2 * k + 1, 2 * k + 1), 0)
+        img_mask /= 255
+
+        # 마스크가 0 인 영역은 원본 그대로이므로 마스크의 bounding box 안에서만 합성한다
+        ys, xs = np.nonzero(img_mask)
+        self.x0, self.y0 = int(xs.min()), int(ys.min())
+        self.x1, self.y1 = int(xs.max()) + 1, int(ys.max()) + 1
+
+        self.IM = IM.copy()
+        self.IM[:, 2] -= (self.x0, self.y0)
+        self.mask = img_mask[self.y0:self.y1, self.x0:self.x1, np.newaxis]
+        self.background = (1 - self.mask) * image[self.y0:self.y1, self.x0:self.x1].astype(np.float32)
+
+    def swap(self, source_face: Face) -> np.ndarray:
+        """
+        Put source_face into the template image.
+
+        :param source_face: Face with an embedding.
+        :return: New image (the template image is not modified).
+        """
+        swapper = self.swapper
+
+        latent = source_face.normed_embedding.reshape((1, -1))
+        latent = np.dot(latent, swapper.emap)
+        latent /= np.linalg.norm(latent)
+
+        pred = swapper.session.run(
+            swapper.output_names,
+            {swapper.input_names[0]: self.blob, swapper.input_names[1]: latent}
+        )[0]
+        img_fake = pred.transpose((0, 2, 3, 1))[0]
+        bgr_fake = np.clip(255 * img_fake, 0, 255).astype(np.uint8)[:, :, ::-1]
+
+        bgr_fake = cv2.warpAffine(bgr_fake, self.IM, (self.x1 - self.x0, self.y1 - self.y0), borderValue=0.0)
+        merged = self.mask * bgr_fake + self.background
+
+        result = self.image.copy()
+        result[self.y0:self.y1, self.x0:self.x1] = merged.astype(np.uint8)
+        return result
@@ -3,8 +3,8 @@ import numpy as np
 import numpy.typing as npt
 from typing import Union, Optional, List, Tuple
 import cv2
-from io import BytesIO
 from functools import wraps
+from library.image_codec import BufferReader, DEFAULT_CODEC
 
 def update_mean_vector(
         mean_vector: Optional[Union[float, List[float], npt.NDArray[np.float32]]], 
@@ -86,40 +86,70 @@ def to_np_image(func):
     """
     Decorator that takes a function returning an S3/MinIO get_object response (or bytes),
     reads and decodes it, and returns a numpy array suitable for OpenCV processing.
+    The image is decoded with the `codec` of the wrapped method's object (default: DEFAULT_CODEC).
     """
     @wraps(func)
     def wrapper(*args, **kwargs):
+        codec = getattr(args[0], "codec", None) if args else None
         # Call the original function, which should return an object with .read() or raw bytes
         data = func(*args, **kwargs)
 
-        # If data is an S3/MinIO response object, read from it:
-        # Adjust this logic if your client returns raw bytes directly (e.g., data is already bytes).
-        image_data = BytesIO(data.read())
+        if isinstance(data, (bytes, bytearray, memoryview)):
+            buffer = np.frombuffer(data, np.uint8)
+        else:
+            # S3/MinIO response: stream the body straight into a numpy buffer
+            try:
+                buffer = read_response_into_array(data)
+            finally:
+                data.close()
+                if hasattr(data, "release_conn"):
+                    data.release_conn()
 
-        # Decode buffer as an image using OpenCV
-        np_array = cv2.imdecode(np.frombuffer(image_data.getbuffer(), np.uint8), cv2.IMREAD_COLOR)
-        return np_array
+        # Decode buffer as an image
+        return (codec or DEFAULT_CODEC).decode(buffer)
 
     return wrapper
 
+def read_response_into_array(response) -> np.ndarray:
+    """
+    Read an HTTP response body into a preallocated uint8 array
+    (sized by Content-Length) without intermediate bytes objects.
+    """
+    headers = getattr(response, "headers", None) or {}
+    length = int(headers.get("Content-Length") or 0)
+
+    if not length or not hasattr(response, "readinto"):
+        return np.frombuffer(response.read(), np.uint8)
+
+    buffer = np.empty(length, dtype=np.uint8)
+    view = memoryview(buffer)
+    read = 0
+    while read < length:
+        n = response.readinto(view[read:])
+        if not n:
+            break
+        read += n
+
+    return buffer[:read]
+
 def to_image_bytes(func):
     """
     Decorator that:
     1) Expects an argument named 'image' (an OpenCV np.ndarray).
-    2) Encodes it as .jpg bytes.
-    3) Injects 'image_bytes' and 'length' arguments into the wrapped function.
+    2) Encodes it as .jpg with the `codec` of the wrapped method's object (default: DEFAULT_CODEC).
+    3) Injects 'image_bytes' (a file object over the encoded buffer, no BytesIO copy)
+       and 'length' arguments into the wrapped function.
     """
     @wraps(func)
     def wrapper(*args, **kwargs):
         # If an 'image' argument is found, transform it
         if 'image' in kwargs and kwargs['image'] is not None:
             np_image = kwargs.pop('image')  # remove 'image' from kwargs
-            success, buffer = cv2.imencode('.jpg', np_image)
-            if not success:
-                raise ValueError("Failed to encode image as JPG.")
+            codec = getattr(args[0], "codec", None) if args else None
+            buffer = (codec or DEFAULT_CODEC).encode(np_image)
 
-            image_bytes = BytesIO(buffer)
-            length = image_bytes.getbuffer().nbytes
+            image_bytes = BufferReader(buffer)
+            length = len(image_bytes)
             
             # Inject the new arguments
             kwargs['image_bytes'] = image_bytes
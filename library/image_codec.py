@@ -0,0 +1,142 @@
+import time
+import logging
+import threading
+import cv2
+import numpy as np
+from typing import Optional, Union
+
+logger = logging.getLogger(__name__)
+
+BytesLike = Union[bytes, bytearray, memoryview, np.ndarray]
+
+class BufferReader:
+    """
+    Read-only file object over an encoded buffer, for clients that read() the upload body.
+
+    read() returns slices of the buffer as bytes (one copy, which clients such as
+    MinIO require), and the original bytes object itself when the whole buffer is read
+    at once, instead of copying it into a BytesIO first.
+    """
+    def __init__(self, data: BytesLike):
+        self._data = data
+        self._view = memoryview(data).cast("B")
+        self._pos = 0
+
+    def __len__(self):
+        return self._view.nbytes
+
+    def read(self, size: int = -1) -> bytes:
+        remaining = self._view.nbytes - self._pos
+        if size is None or size < 0 or size > remaining:
+            size = remaining
+        if self._pos == 0 and size == self._view.nbytes and isinstance(self._data, bytes):
+            self._pos = size
+            return self._data
+        chunk = self._view[self._pos:self._pos + size].tobytes()
+        self._pos += size
+        return chunk
+
+    def seek(self, offset: int, whence: int = 0) -> int:
+        base = {0: 0, 1: self._pos, 2: self._view.nbytes}[whence]
+        self._pos = min(max(base + offset, 0), self._view.nbytes)
+        return self._pos
+
+    def tell(self) -> int:
+        return self._pos
+
+    def getbuffer(self) -> memoryview:
+        return self._view
+
+class ImageCodec:
+    """
+    JPEG encoder/decoder used by the storage layer.
+
+    Encodes with OpenCV (quality, optimize and progressive flags) or, when
+    `use_turbojpeg` is set and PyTurboJPEG is installed, with libjpeg-turbo
+    directly. Bytes and time of every call are logged at DEBUG level and
+    summed in stats().
+    """
+    def __init__(self, quality: int = 95, optimize: bool = False, progressive: bool = False,
+                 use_turbojpeg: bool = False):
+        """
+        :param quality: JPEG quality (0-100). OpenCV's default is 95.
+        :param optimize: Optimize the Huffman tables (a few % smaller, slower encode).
+        :param progressive: Write progressive JPEG.
+        :param use_turbojpeg: Use PyTurboJPEG (libjpeg-turbo) if it is installed.
+        """
+        self.quality = quality
+        self.optimize = optimize
+        self.progressive = progressive
+        self._turbo = None
+        if use_turbojpeg:
+            try:
+                from turbojpeg import TurboJPEG
+                self._turbo = TurboJPEG()
+            except (ImportError, RuntimeError, OSError) as e:
+                logger.warning(f"PyTurboJPEG not available, using OpenCV : {e}")
+
+        self._lock = threading.Lock()
+        self._stats = {
+            "encode_calls": 0, "encode_bytes": 0, "encode_seconds": 0.0,
+            "decode_calls": 0, "decode_bytes": 0, "decode_seconds": 0.0,
+        }
+
+    @property
+    def backend(self) -> str:
+        return "turbojpeg" if self._turbo is not None else "opencv"
+
+    def _record(self, op: str, nbytes: int, seconds: float):
+        with self._lock:
+            self._stats[f"{op}_calls"] += 1
+            self._stats[f"{op}_bytes"] += nbytes
+            self._stats[f"{op}_seconds"] += seconds
+        logger.debug(f"{op} {nbytes} bytes in {seconds * 1000:.2f}ms ({self.backend})")
+
+    def encode(self, image: np.ndarray) -> BytesLike:
+        """
+        :return: JPEG bytes of a BGR image (bytes from turbojpeg, the uint8 array from OpenCV).
+        """
+        started_at = time.perf_counter()
+        if self._turbo is not None:
+            from turbojpeg import TJFLAG_PROGRESSIVE
+            buffer = self._turbo.encode(image, quality=self.quality,
+                                        flags=TJFLAG_PROGRESSIVE if self.progressive else 0)
+        else:
+            params = [
+                cv2.IMWRITE_JPEG_QUALITY, self.quality,
+                cv2.IMWRITE_JPEG_OPTIMIZE, int(self.optimize),
+                cv2.IMWRITE_JPEG_PROGRESSIVE, int(self.progressive),
+            ]
+            success, buffer = cv2.imencode(".jpg", image, params)
+            if not success:
+                raise ValueError("Failed to encode image as JPG.")
+        self._record("encode", memoryview(buffer).nbytes, time.perf_counter() - started_at)
+        return buffer
+
+    def decode(self, buffer: BytesLike) -> Optional[np.ndarray]:
+        """
+        :return: BGR image, None if the buffer cannot be decoded.
+        """
+        started_at = time.perf_counter()
+        array = buffer if isinstance(buffer, np.ndarray) else np.frombuffer(buffer, np.uint8)
+        image = None
+        if self._turbo is not None and array[:2].tobytes() == b"\xff\xd8":
+            try:
+                image = self._turbo.decode(array)
+            except (OSError, ValueError):
+                image = None
+        if image is None:
+            image = cv2.imdecode(array, cv2.IMREAD_COLOR)
+        self._record("decode", array.nbytes, time.perf_counter() - started_at)
+        return image
+
+    def stats(self) -> dict:
+        with self._lock:
+            stats = dict(self._stats)
+        for op in ("encode", "decode"):
+            calls = stats[f"{op}_calls"]
+            stats[f"{op}_avg_ms"] = stats[f"{op}_seconds"] / calls * 1000 if calls else 0.0
+        return {"backend": self.backend, "quality": self.quality, **stats}
+
+# Codec of storages that do not set their own
+DEFAULT_CODEC = ImageCodec()
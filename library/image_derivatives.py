@@ -0,0 +1,65 @@
+import os
+import cv2
+import numpy as np
+from typing import Dict, List, Optional, Tuple
+
+# format : (extension, content type, OpenCV quality flag)
+DERIVATIVE_FORMATS = {
+    "webp": (".webp", "image/webp", cv2.IMWRITE_WEBP_QUALITY),
+    "jpg": (".jpg", "image/jpeg", cv2.IMWRITE_JPEG_QUALITY),
+}
+
+def parse_derivative_sizes(spec: str) -> Dict[str, int]:
+    """
+    "thumb:160,medium:480" -> {"thumb": 160, "medium": 480} (name : longest side in pixels)
+    """
+    sizes = {}
+    for item in (spec or "").split(","):
+        if not item.strip():
+            continue
+        name, _, size = item.partition(":")
+        if not size.strip().isdigit():
+            raise ValueError(f"Invalid image derivative '{item}'. Expected name:pixels, e.g. thumb:160")
+        sizes[name.strip()] = int(size)
+    return sizes
+
+def derivative_name(file_name: str, name: str, fmt: str = "webp") -> str:
+    """
+    Object key of a derivative, e.g. ("abc.jpg", "thumb") -> "thumb/abc.webp".
+    """
+    stem = os.path.splitext(file_name)[0]
+    return f"{name}/{stem}{DERIVATIVE_FORMATS[fmt][0]}"
+
+def encode_derivatives(file_name: str, image: np.ndarray, sizes: Dict[str, int], fmt: str = "webp",
+                       quality: int = 80) -> List[Tuple[str, bytes, str]]:
+    """
+    Downscaled copies of an image. Every size is resized from the previous (larger) one,
+    so the full image is resampled once. Images smaller than a size are kept as they are.
+
+    :return: list of (object key, encoded bytes, content type).
+    """
+    if not sizes:
+        return []
+    ext, content_type, quality_flag = DERIVATIVE_FORMATS[fmt]
+
+    derivatives = []
+    current = image
+    for name, size in sorted(sizes.items(), key=lambda item: -item[1]):
+        height, width = current.shape[:2]
+        scale = size / max(height, width)
+        if scale < 1.0:
+            current = cv2.resize(current, (max(int(width * scale), 1), max(int(height * scale), 1)),
+                                 interpolation=cv2.INTER_AREA)
+        success, buffer = cv2.imencode(ext, current, [quality_flag, quality])
+        if not success:
+            raise ValueError(f"Failed to encode image as {fmt}.")
+        derivatives.append((derivative_name(file_name, name, fmt), buffer.tobytes(), content_type))
+
+    return derivatives
+
+def pick_derivative(sizes: Dict[str, int], display_pixels: int) -> Optional[str]:
+    """
+    :return: Name of the smallest derivative at least `display_pixels` large, None if only the original is.
+    """
+    adequate = [(size, name) for name, size in sizes.items() if size >= display_pixels]
+    return min(adequate)[1] if adequate else None
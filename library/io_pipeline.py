@@ -0,0 +1,123 @@
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor, Future, CancelledError, wait
+from typing import Callable, List, Optional
+
+logger = logging.getLogger(__name__)
+
+class IOPipeline:
+    """
+    Thread pool for the I/O stages (JPEG encode + object upload, DB upsert).
+
+    Inference keeps running on the caller's thread while uploads happen here.
+    At most `max_pending` jobs are queued or running; `submit()` blocks when
+    the pipeline is full, which applies backpressure to the inference stage.
+    """
+    def __init__(self, max_workers=8, max_pending=32):
+        """
+        :param max_workers: Number of I/O threads.
+        :param max_pending: Maximum number of queued + running jobs.
+        """
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="io-pipeline")
+        self.slots = threading.BoundedSemaphore(max(max_pending, max_workers))
+
+    def submit(self, fn: Callable, *args, **kwargs) -> Future:
+        self.slots.acquire()
+        try:
+            future = self.executor.submit(fn, *args, **kwargs)
+        except Exception:
+            self.slots.release()
+            raise
+        future.add_done_callback(self._on_done)
+        return future
+
+    def submit_after(self, dependencies: List[Future], fn: Callable, *args, **kwargs) -> Future:
+        """
+        Run `fn` once every dependency succeeded. If one of them failed, `fn` is not
+        called and the returned future carries that error.
+
+        No thread waits for the dependencies: the done callback of the last one hands
+        the job to the pool. Its slot is taken here, so the caller still blocks when
+        the pipeline is full.
+        """
+        self.slots.acquire()
+        future = Future()
+        future.set_running_or_notify_cancel()
+        future.add_done_callback(lambda _: self.slots.release())
+        remaining = [len(dependencies)]
+        lock = threading.Lock()
+
+        def run():
+            try:
+                future.set_result(fn(*args, **kwargs))
+            except BaseException as e:
+                logger.error(f"I/O pipeline job failed: {e}")
+                future.set_exception(e)
+
+        def start():
+            error = next((e for e in map(_failure, dependencies) if e is not None), None)
+            if error is None:
+                try:
+                    self.executor.submit(run)
+                    return
+                except RuntimeError as e:
+                    # shutdown 이후에는 실행하지 않는다
+                    error = e
+            future.set_exception(error)
+
+        def on_dependency_done(_):
+            with lock:
+                remaining[0] -= 1
+                last = remaining[0] == 0
+            if last:
+                start()
+
+        if not dependencies:
+            start()
+        for dependency in dependencies:
+            dependency.add_done_callback(on_dependency_done)
+        return future
+
+    def _on_done(self, future: Future):
+        self.slots.release()
+        error = future.exception()
+        if error is not None:
+            logger.error(f"I/O pipeline job failed: {error}")
+
+    def shutdown(self, wait=True):
+        self.executor.shutdown(wait=wait)
+
+def _failure(future: Future) -> Optional[BaseException]:
+    return CancelledError() if future.cancelled() else future.exception()
+
+class PipelineHandle:
+    """
+    Completion handle for the I/O jobs of one request
+    (e.g. the face image uploads, the annotated original and the DB write).
+    """
+    def __init__(self, result=None):
+        self.result = result
+        self.futures: List[Future] = []
+
+    def add(self, future: Future):
+        self.futures.append(future)
+        return future
+
+    def done(self) -> bool:
+        return all(f.done() for f in self.futures)
+
+    def wait(self, timeout: Optional[float] = None):
+        """
+        Wait until every job is finished.
+
+        :return: The handle result.
+        :raises: The first error raised by any job.
+        """
+        done, not_done = wait(self.futures, timeout=timeout)
+        if not_done:
+            raise TimeoutError(f"{len(not_done)} I/O jobs did not finish in {timeout}s.")
+        for future in self.futures:
+            error = future.exception()
+            if error is not None:
+                raise error
+        return self.result
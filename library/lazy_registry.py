@@ -0,0 +1,109 @@
+import logging
+import threading
+import time
+from typing import Callable, Dict, Iterable, Optional, Union
+
+logger = logging.getLogger(__name__)
+
+class LazyObject:
+    """
+    Proxy that builds the wrapped object on first use.
+
+    Attribute access, calls, len(), iteration and indexing are forwarded to
+    the real object, so a LazyObject can be imported and used wherever the
+    object itself was used before. Loading happens once, guarded by a lock.
+    """
+    def __init__(self, name: str, loader: Callable):
+        self._loaded = False
+        self._obj = None
+        self._name = name
+        self._loader = loader
+        self._lock = threading.Lock()
+        self.load_seconds: Optional[float] = None
+
+    @property
+    def loaded(self) -> bool:
+        return self._loaded
+
+    def get_object(self):
+        if not self._loaded:
+            with self._lock:
+                if not self._loaded:
+                    started_at = time.perf_counter()
+                    self._obj = self._loader()
+                    self.load_seconds = time.perf_counter() - started_at
+                    self._loaded = True
+                    logger.info(f"Loaded '{self._name}' in {self.load_seconds:.2f}s")
+        return self._obj
+
+    def __getattr__(self, item):
+        return getattr(self.get_object(), item)
+
+    def __call__(self, *args, **kwargs):
+        return self.get_object()(*args, **kwargs)
+
+    def __len__(self):
+        return len(self.get_object())
+
+    def __iter__(self):
+        return iter(self.get_object())
+
+    def __getitem__(self, item):
+        return self.get_object()[item]
+
+    def __bool__(self):
+        return bool(self.get_object())
+
+    def __repr__(self):
+        state = "loaded" if self._loaded else "not loaded"
+        return f"<LazyObject '{self._name}' ({state})>"
+
+class ModelRegistry:
+    """
+    Registry of lazily loaded models and other heavy objects.
+    """
+    def __init__(self):
+        self.entries: Dict[str, LazyObject] = {}
+
+    def register(self, name: str, loader: Callable) -> LazyObject:
+        """
+        Register a loader and return the proxy that loads it on first use.
+        """
+        entry = LazyObject(name, loader)
+        self.entries[name] = entry
+        return entry
+
+    def warm_up(self, names: Union[str, Iterable[str]] = "all", background: bool = False):
+        """
+        Load registered objects ahead of their first use.
+
+        :param names: "all", a comma separated string or an iterable of registered names.
+        :param background: Load in a daemon thread instead of blocking the caller.
+        """
+        if isinstance(names, str):
+            names = self.entries.keys() if names.strip().lower() == "all" \
+                else [n.strip() for n in names.split(",") if n.strip()]
+
+        entries = []
+        for name in names:
+            if name not in self.entries:
+                logger.warning(f"Unknown model '{name}' in warm-up list. Registered: {list(self.entries)}")
+                continue
+            entries.append(self.entries[name])
+
+        def load_all():
+            started_at = time.perf_counter()
+            for entry in entries:
+                entry.get_object()
+            logger.info(f"Warm-up of {len(entries)} models finished in {time.perf_counter() - started_at:.2f}s")
+
+        if background:
+            threading.Thread(target=load_all, name="model-warm-up", daemon=True).start()
+        else:
+            load_all()
+
+    def timings(self) -> Dict[str, Optional[float]]:
+        """
+        Load time in seconds per registered name (None if not loaded yet).
+        """
+        return {name: entry.load_seconds for name, entry in self.entries.items()}
@@ -0,0 +1,117 @@
+import numpy as np
+from typing import Dict, Optional
+
+# payload fields kept for every entry
+ENTRY_FIELDS = ("photo_id", "face_index", "photo_title", "file_name")
+
+def unit(vector) -> Optional[np.ndarray]:
+    """
+    :return: L2-normalized float32 copy of the vector, None for a missing or zero vector.
+    """
+    if vector is None:
+        return None
+    vector = np.asarray(vector, dtype=np.float32)
+    norm = float(np.linalg.norm(vector))
+    return vector / norm if norm > 0 else None
+
+class Leaderboard:
+    """
+    Top-K points closest (cosine similarity) to one average face.
+
+    Scores are not all computed against the same mean: points are scored
+    when they arrive, and `drift` is the sum of the distances the normalized
+    mean moved since the last full re-score. For unit vectors
+    |x.a - x.b| <= ||a - b||, so every stored score is off by at most `drift`.
+    """
+    def __init__(self, size: int = 20, drift: float = 0.0):
+        self.size = size
+        self.drift = drift
+        self.ids = np.empty(0, dtype=object)
+        self.scores = np.empty(0, dtype=np.float32)
+        self.details = {field: np.empty(0, dtype=object) for field in ENTRY_FIELDS}
+
+    def offer(self, ids: np.ndarray, scores: np.ndarray, columns: Dict[str, np.ndarray]):
+        """
+        Merge scored points into the board. A point already on the board is replaced.
+
+        :param ids: (n,) point IDs.
+        :param scores: (n,) cosine similarity to the mean.
+        :param columns: (n,) payload column of every ENTRY_FIELDS field (missing fields are None).
+        """
+        if not len(ids):
+            return
+
+        # 같은 ID 가 여러 번 오면 마지막 것만 남긴다
+        ids = np.asarray(ids, dtype=object)
+        _, last = np.unique(ids[::-1], return_index=True)
+        if len(last) < len(ids):
+            latest = np.sort(len(ids) - 1 - last)
+            ids, scores = ids[latest], np.asarray(scores)[latest]
+            columns = {field: None if values is None else np.asarray(values, dtype=object)[latest]
+                       for field, values in columns.items()}
+
+        keep = ~np.isin(self.ids, ids)
+        all_ids = np.concatenate((self.ids[keep], ids))
+        all_scores = np.concatenate((self.scores[keep], np.asarray(scores, dtype=np.float32)))
+
+        if len(all_scores) > self.size:
+            top = np.argpartition(-all_scores, self.size - 1)[:self.size]
+        else:
+            top = np.arange(len(all_scores))
+        top = top[np.argsort(-all_scores[top], kind="stable")]
+
+        self.ids, self.scores = all_ids[top], all_scores[top]
+        for field in ENTRY_FIELDS:
+            new = columns.get(field)
+            new = np.full(len(ids), None, dtype=object) if new is None else np.asarray(new, dtype=object)
+            self.details[field] = np.concatenate((self.details[field][keep], new))[top]
+
+    def move_mean(self, old_mean, new_mean, max_drift: float) -> bool:
+        """
+        Account for the average face moving from old_mean to new_mean.
+
+        :param old_mean: Mean the scores were computed against (None: the board is new, no drift).
+        :param max_drift: Largest score error allowed (LEADERBOARD_RESCORE_DRIFT).
+        :return: False if the stored scores could then be off by more than max_drift,
+                 i.e. the board has to be re-scored from every point. The drift is unchanged then.
+        """
+        old, new = unit(old_mean), unit(new_mean)
+        drift = float(np.linalg.norm(new - old)) if old is not None and new is not None else 0.0
+        if self.drift + drift > max_drift:
+            return False
+        self.drift += drift
+        return True
+
+    def to_payload(self) -> dict:
+        entries = []
+        for i, id in enumerate(self.ids):
+            entry = {"id": id, "score": float(self.scores[i])}
+            for field in ENTRY_FIELDS:
+                value = self.details[field][i]
+                if isinstance(value, float) and value != value:
+                    value = None
+                elif isinstance(value, np.generic):
+                    value = value.item()
+                # face_index 는 payload column 에서 float 로 읽힌다
+                if field == "face_index" and value is not None:
+                    value = int(value)
+                entry[field] = value
+            entries.append(entry)
+        return {"drift": self.drift, "entries": entries}
+
+    @classmethod
+    def from_payload(cls, payload: Optional[dict], size: int = 20) -> Optional["Leaderboard"]:
+        """
+        :return: The board stored in a point payload, None if there is none.
+        """
+        if not payload or "entries" not in payload:
+            return None
+
+        board = cls(size=size, drift=float(payload.get("drift") or 0.0))
+        entries = payload["entries"][:size]
+        board.ids = np.array([e["id"] for e in entries], dtype=object)
+        board.scores = np.array([e["score"] for e in entries], dtype=np.float32)
+        board.details = {
+            field: np.array([e.get(field) for e in entries], dtype=object) for field in ENTRY_FIELDS
+        }
+        return board
@@ -0,0 +1,181 @@
+import os
+import ast
+import logging
+import tempfile
+import numpy as np
+from typing import Dict, Hashable, Iterable, List, Optional
+
+logger = logging.getLogger(__name__)
+
+class MeanAggregator:
+    """
+    Running float64 sums and counts of embeddings (and ages) per group key.
+
+    Pages of vectors are folded in as they arrive, so the mean of any group
+    can be read at any time without keeping the individual vectors. The
+    state and the cursor of the last folded point are saved as a checkpoint,
+    which keeps the sums exact across runs instead of re-deriving them from
+    a stored (normalized) mean.
+    """
+    def __init__(self, dim: int = 512):
+        self.dim = dim
+        self.sums: Dict[Hashable, np.ndarray] = {}
+        self.counts: Dict[Hashable, int] = {}
+        self.age_sums: Dict[Hashable, float] = {}
+        self.age_counts: Dict[Hashable, int] = {}
+        self.cursor: Optional[float] = None
+        # groupings (e.g. photo_title) whose history is complete in the sums
+        self.groupings: List[str] = []
+
+    def _group(self, key):
+        if key not in self.sums:
+            self.sums[key] = np.zeros(self.dim, dtype=np.float64)
+            self.counts[key] = 0
+            self.age_sums[key] = 0.0
+            self.age_counts[key] = 0
+
+    def seed(self, key, mean_vector, count: int, mean_age: Optional[float] = None):
+        """
+        Start a group from a known mean (e.g. the stored average face) instead of from zero.
+        """
+        self._group(key)
+        if mean_vector is None or not count:
+            return
+        self.sums[key] = np.asarray(mean_vector, dtype=np.float64) * count
+        self.counts[key] = int(count)
+        if mean_age is not None:
+            self.age_sums[key] = float(mean_age) * count
+            self.age_counts[key] = int(count)
+
+    def fold(self, vectors: np.ndarray, keys: Iterable, ages: Optional[np.ndarray] = None,
+             rows: Optional[np.ndarray] = None):
+        """
+        Add one page of vectors. All groups are summed in one segment sum
+        (rows sorted by group, then np.add.reduceat).
+
+        :param vectors: (n, dim) vectors.
+        :param keys: Group key of every entry. NaN / None keys are skipped.
+        :param ages: Optional (n,) ages, NaN for unknown.
+        :param rows: Optional row of `vectors` for every key. A row may appear several
+                     times, e.g. once per grouping it belongs to (default: key i -> row i).
+        """
+        # np.asarray 는 tuple key 의 list 를 2차원 배열로 만든다
+        keys = np.asarray(keys, dtype=object) if isinstance(keys, np.ndarray) else np.fromiter(keys, dtype=object)
+        rows = np.arange(len(keys)) if rows is None else np.asarray(rows)
+        valid = np.array([k is not None and k == k for k in keys], dtype=bool)
+        if not valid.any():
+            return
+        keys, rows = keys[valid], rows[valid]
+
+        groups, inverse = np.unique(keys, return_inverse=True)
+        order = np.argsort(inverse, kind="stable")
+        counts = np.bincount(inverse)
+        starts = np.concatenate(([0], np.cumsum(counts)[:-1]))
+        sorted_rows = rows[order]
+
+        sums = np.add.reduceat(np.asarray(vectors, dtype=np.float64)[sorted_rows], starts, axis=0)
+        if ages is not None:
+            group_ages = np.asarray(ages, dtype=np.float64)[sorted_rows]
+            known = ~np.isnan(group_ages)
+            age_sums = np.add.reduceat(np.where(known, group_ages, 0.0), starts)
+            age_counts = np.add.reduceat(known.astype(np.int64), starts)
+
+        for i, key in enumerate(groups):
+            if isinstance(key, float) and key.is_integer():
+                key = int(key)
+            self._group(key)
+            self.sums[key] += sums[i]
+            self.counts[key] += int(counts[i])
+            if ages is not None:
+                self.age_sums[key] += float(age_sums[i])
+                self.age_counts[key] += int(age_counts[i])
+
+    def merge(self, other: "MeanAggregator"):
+        """
+        Add the sums of another aggregator (e.g. the points of one run) to this one.
+        """
+        for key in other.sums:
+            self._group(key)
+            self.sums[key] += other.sums[key]
+            self.counts[key] += other.counts[key]
+            self.age_sums[key] += other.age_sums[key]
+            self.age_counts[key] += other.age_counts[key]
+        if other.cursor is not None:
+            self.cursor = other.cursor if self.cursor is None else max(self.cursor, other.cursor)
+
+    def discard(self, keys: Iterable):
+        """
+        Drop the sums of groups, e.g. before they are summed again from scratch.
+        """
+        for key in list(keys):
+            for values in (self.sums, self.counts, self.age_sums, self.age_counts):
+                values.pop(key, None)
+
+    def count(self, key) -> int:
+        return self.counts.get(key, 0)
+
+    def mean(self, key) -> Optional[np.ndarray]:
+        """
+        :return: float32 mean vector of the group or None if it is empty.
+        """
+        if not self.counts.get(key):
+            return None
+        return (self.sums[key] / self.counts[key]).astype(np.float32)
+
+    def mean_age(self, key) -> Optional[float]:
+        if not self.age_counts.get(key):
+            return None
+        return self.age_sums[key] / self.age_counts[key]
+
+    def save(self, path: str):
+        """
+        Write the state to an .npz checkpoint (atomically).
+        """
+        keys = list(self.sums)
+        arrays = {
+            "keys": np.asarray([repr(k) for k in keys], dtype=str),
+            "sums": np.stack([self.sums[k] for k in keys]) if keys else np.zeros((0, self.dim)),
+            "counts": np.asarray([self.counts[k] for k in keys], dtype=np.int64),
+            "age_sums": np.asarray([self.age_sums[k] for k in keys], dtype=np.float64),
+            "age_counts": np.asarray([self.age_counts[k] for k in keys], dtype=np.int64),
+            "cursor": np.asarray(np.nan if self.cursor is None else self.cursor),
+            "groupings": np.asarray(self.groupings, dtype=str),
+        }
+
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                np.savez(f, **arrays)
+            os.replace(tmp_path, path)
+        except Exception:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+    @classmethod
+    def load(cls, path: str) -> Optional["MeanAggregator"]:
+        """
+        :return: The aggregator saved at path, or None if there is no (readable) checkpoint.
+        """
+        if not os.path.exists(path):
+            return None
+
+        try:
+            with np.load(path, allow_pickle=False) as data:
+                aggregator = cls(dim=data["sums"].shape[1])
+                for i, key in enumerate(data["keys"]):
+                    key = ast.literal_eval(str(key))
+                    aggregator.sums[key] = data["sums"][i].astype(np.float64)
+                    aggregator.counts[key] = int(data["counts"][i])
+                    aggregator.age_sums[key] = float(data["age_sums"][i])
+                    aggregator.age_counts[key] = int(data["age_counts"][i])
+                cursor = float(data["cursor"])
+                aggregator.cursor = None if np.isnan(cursor) else cursor
+                aggregator.groupings = [str(g) for g in data["groupings"]] if "groupings" in data else []
+        except Exception as e:
+            logger.warning(f"Ignoring broken checkpoint {path} : {e}")
+            return None
+
+        return aggregator
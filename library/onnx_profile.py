@@ -0,0 +1,139 @@
+import os
+import glob
+import logging
+import onnxruntime
+from typing import Iterable, Optional, Tuple
+from insightface.app import FaceAnalysis
+from insightface.model_zoo.model_zoo import ModelRouter
+
+logger = logging.getLogger(__name__)
+
+PROFILES = ("fp32", "int8", "fp16")
+
+_GRAPH_OPTIMIZATION_LEVELS = {
+    "disable": onnxruntime.GraphOptimizationLevel.ORT_DISABLE_ALL,
+    "basic": onnxruntime.GraphOptimizationLevel.ORT_ENABLE_BASIC,
+    "extended": onnxruntime.GraphOptimizationLevel.ORT_ENABLE_EXTENDED,
+    "all": onnxruntime.GraphOptimizationLevel.ORT_ENABLE_ALL,
+}
+
+_EXECUTION_MODES = {
+    "sequential": onnxruntime.ExecutionMode.ORT_SEQUENTIAL,
+    "parallel": onnxruntime.ExecutionMode.ORT_PARALLEL,
+}
+
+class InferenceProfile:
+    """
+    ONNX Runtime settings and model variant shared by every insightface model.
+
+    insightface creates its sessions with the default SessionOptions, so the
+    models are loaded here through its ModelRouter with our own options.
+    The `int8`/`fp16` profiles load the quantized copies built by
+    quantize_models.py (buffalo_l_int8, inswapper_128_int8.onnx, ...).
+    """
+    def __init__(self, name: str = "fp32", intra_op_threads: int = 0, inter_op_threads: int = 0,
+                 graph_optimization: str = "all", execution_mode: str = "sequential",
+                 enable_mem_arena: bool = True, allow_spinning: bool = True,
+                 providers: Iterable[str] = ("CPUExecutionProvider",)):
+        """
+        :param name: Model variant, one of PROFILES.
+        :param intra_op_threads: Threads used inside one operator (0: ORT default, all cores).
+        :param inter_op_threads: Threads used across operators in parallel execution mode (0: ORT default).
+        :param graph_optimization: disable / basic / extended / all.
+        :param execution_mode: sequential / parallel.
+        :param enable_mem_arena: Use the CPU memory arena.
+        :param allow_spinning: Let idle intra-op threads spin. Disable when several workers share the cores.
+        :param providers: ONNX Runtime execution providers.
+        """
+        if name not in PROFILES:
+            raise ValueError(f"Unknown inference profile '{name}'. Available: {PROFILES}")
+        if graph_optimization not in _GRAPH_OPTIMIZATION_LEVELS:
+            raise ValueError(f"Unknown graph optimization '{graph_optimization}'. Available: {list(_GRAPH_OPTIMIZATION_LEVELS)}")
+        if execution_mode not in _EXECUTION_MODES:
+            raise ValueError(f"Unknown execution mode '{execution_mode}'. Available: {list(_EXECUTION_MODES)}")
+
+        self.name = name
+        self.intra_op_threads = intra_op_threads
+        self.inter_op_threads = inter_op_threads
+        self.graph_optimization = graph_optimization
+        self.execution_mode = execution_mode
+        self.enable_mem_arena = enable_mem_arena
+        self.allow_spinning = allow_spinning
+        self.providers = list(providers)
+
+    def pack_name(self, base_name: str = "buffalo_l") -> str:
+        """
+        :return: Model pack directory name of this profile, e.g. buffalo_l_int8.
+        """
+        return base_name if self.name == "fp32" else f"{base_name}_{self.name}"
+
+    def model_path(self, path: str) -> str:
+        """
+        :return: Path of this profile's variant of a single model file, e.g. inswapper_128_int8.onnx.
+        """
+        if self.name == "fp32":
+            return path
+        root, ext = os.path.splitext(path)
+        return f"{root}_{self.name}{ext}"
+
+    def session_options(self) -> onnxruntime.SessionOptions:
+        options = onnxruntime.SessionOptions()
+        options.intra_op_num_threads = self.intra_op_threads
+        options.inter_op_num_threads = self.inter_op_threads
+        options.graph_optimization_level = _GRAPH_OPTIMIZATION_LEVELS[self.graph_optimization]
+        options.execution_mode = _EXECUTION_MODES[self.execution_mode]
+        options.enable_cpu_mem_arena = self.enable_mem_arena
+        options.add_session_config_entry("session.intra_op.allow_spinning", "1" if self.allow_spinning else "0")
+        return options
+
+    def load_model(self, onnx_file: str):
+        """
+        Load one insightface model (detection, recognition, genderage, inswapper ...) with this profile.
+        """
+        model = ModelRouter(onnx_file).get_model(sess_options=self.session_options(), providers=self.providers)
+        if model is None:
+            raise ValueError(f"Model not recognized: {onnx_file}")
+        return model
+
+    def load_face_analysis(self, root: str, base_name: str = "buffalo_l",
+                           det_size: Tuple[int, int] = (640, 640), det_thresh: float = 0.5):
+        """
+        FaceAnalysis(name=pack_name, root=root).prepare(...) with this profile's sessions.
+        """
+        detector = ProfiledFaceAnalysis(self, name=self.pack_name(base_name), root=root)
+        # ctx_id < 0 makes every model call session.set_providers() which builds the session again.
+        # The sessions already use self.providers, so a non-negative ctx_id only sets det_size/det_thresh.
+        detector.prepare(ctx_id=0, det_thresh=det_thresh, det_size=det_size)
+        return detector
+
+    def __repr__(self):
+        return (f"<InferenceProfile '{self.name}' intra={self.intra_op_threads} inter={self.inter_op_threads} "
+                f"opt={self.graph_optimization} mode={self.execution_mode} arena={self.enable_mem_arena} "
+                f"spinning={self.allow_spinning} providers={self.providers}>")
+
+class ProfiledFaceAnalysis(FaceAnalysis):
+    """
+    FaceAnalysis whose models are loaded with an InferenceProfile.
+    """
+    def __init__(self, profile: InferenceProfile, name: str = "buffalo_l", root: str = "~/.insightface",
+                 allowed_modules: Optional[Iterable[str]] = None):
+        onnxruntime.set_default_logger_severity(3)
+        self.profile = profile
+        self.models = {}
+        self.model_dir = os.path.join(os.path.expanduser(root), "models", name)
+        onnx_files = sorted(glob.glob(os.path.join(self.model_dir, "*.onnx")))
+        if not onnx_files:
+            raise FileNotFoundError(f"No onnx models in {self.model_dir}. Run quantize_models.py build for non-fp32 profiles.")
+
+        for onnx_file in onnx_files:
+            model = profile.load_model(onnx_file)
+            if allowed_modules is not None and model.taskname not in allowed_modules:
+                continue
+            if model.taskname in self.models:
+                logger.warning(f"Duplicated model task type '{model.taskname}', ignore: {onnx_file}")
+                continue
+            self.models[model.taskname] = model
+
+        assert "detection" in self.models
+        self.det_model = self.models["detection"]
+        logger.info(f"Loaded '{name}' models {list(self.models)} with {profile}")
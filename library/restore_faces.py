@@ -1,25 +1,35 @@
+import copy
+import logging
+import queue
+import threading
+import time
+from contextlib import contextmanager
 import cv2
+import numpy as np
 import torch
 from torchvision.transforms.functional import normalize
 from codeformer.basicsr.utils import img2tensor, tensor2img
 from codeformer.facelib.utils.face_restoration_helper import FaceRestoreHelper
 from codeformer.basicsr.utils.registry import ARCH_REGISTRY
-from library.gadget import singleton
 
-@singleton
+logger = logging.getLogger(__name__)
+
 class FaceRestorer:
     """
     얼굴 복원을 위한 클래스
     한 번 초기화하고 여러 이미지에 재사용 가능
+    FaceRestoreHelper 의 상태를 사용하므로 한 번에 한 스레드에서만 사용해야 한다 (FaceRestorerPool 참고)
     """
-    def __init__(self, model_path, use_gpu=False):
+    def __init__(self, model_path, use_gpu=False, batch_size=4):
         """
         FaceRestorer 클래스 초기화
         
         :param model_path: CodeFormer 모델 파일 경로
         :param use_gpu: GPU 사용 여부 (기본값: False)
+        :param batch_size: 한 번에 CodeFormer 로 복원할 최대 얼굴 수 (기본값: 4)
         """
         self.model_path = model_path
+        self.batch_size = max(batch_size, 1)
         self.device = 'cuda' if use_gpu and torch.cuda.is_available() else 'cpu'
         self.use_gpu = use_gpu
         
@@ -49,62 +59,223 @@ class FaceRestorer:
         
         print(f"FaceRestorer initialized using device: {self.device}")
     
-    def restore(self, input_image, w=0.5, only_center_face=False):
+    def restore(self, input_image, w=0.5, only_center_face=False, landmarks=None):
         """
         입력 이미지의 얼굴을 복원
         
         :param input_image: ndarray 타입의 입력 이미지
         :param w: 복원 강도 가중치 (0~1, 기본값: 0.5)
         :param only_center_face: 중앙 얼굴만 처리할지 여부
+        :param landmarks: 이미 알고 있는 얼굴들의 5-point landmark (insightface Face.kps 목록).
+                          주어지면 retinaface 검출을 생략
         :return: ndarray 타입의 복원된 이미지
         """
-        # 이미지 크기 저장
-        h, w_img, _ = input_image.shape
-        
-        # Face Helper 초기화
-        self.face_helper.clean_all()
-        self.face_helper.read_image(input_image)
-        self.face_helper.get_face_landmarks_5(
+        return self.restore_batch(
+            [input_image], 
+            w=w, 
             only_center_face=only_center_face, 
-            resize=512, 
-            eye_dist_threshold=5
-        )
-        self.face_helper.align_warp_face()
-        
-        # 얼굴 복원
-        for idx, cropped_face in enumerate(self.face_helper.cropped_faces):
-            cropped_face_t = img2tensor(cropped_face / 255., bgr2rgb=True, float32=True).to(self.device)
-            normalize(cropped_face_t, (0.5, 0.5, 0.5), (0.5, 0.5, 0.5), inplace=True)
-            cropped_face_t = cropped_face_t.unsqueeze(0).to(self.device)
-            
+            landmarks=[landmarks] if landmarks is not None else None
+        )[0]
+
+    def restore_batch(self, input_images, w=0.5, only_center_face=False, landmarks=None):
+        """
+        여러 이미지의 얼굴을 한 번에 복원
+        모든 이미지의 얼굴 crop 을 하나의 텐서로 묶어 CodeFormer 를 실행한다
+
+        :param input_images: ndarray 이미지 목록
+        :param w: 복원 강도 가중치 (0~1, 기본값: 0.5)
+        :param only_center_face: 중앙 얼굴만 처리할지 여부 (검출하는 경우에만 적용)
+        :param landmarks: 이미지별 5-point landmark 목록 (None 이면 해당 이미지는 검출)
+        :return: 복원된 이미지 목록 (입력 순서와 동일)
+        """
+        helper = self.face_helper
+
+        # 1) 이미지별 얼굴 정렬 및 crop
+        states = []
+        cropped_faces = []
+        for i, input_image in enumerate(input_images):
+            helper.clean_all()
+            helper.read_image(input_image)
+
+            image_landmarks = landmarks[i] if landmarks is not None else None
+            if image_landmarks is not None and len(image_landmarks) > 0:
+                # read_image 에서 작은 이미지는 확대되므로 landmark 도 같은 비율로 맞춘다
+                scale = helper.input_img.shape[0] / input_image.shape[0]
+                helper.all_landmarks_5 = [
+                    np.asarray(kps, dtype=np.float32).reshape(5, 2) * scale for kps in image_landmarks
+                ]
+            else:
+                helper.get_face_landmarks_5(
+                    only_center_face=only_center_face, 
+                    resize=512, 
+                    eye_dist_threshold=5
+                )
+            helper.align_warp_face()
+
+            states.append((helper.input_img, helper.is_gray, helper.affine_matrices, len(cropped_faces)))
+            cropped_faces.extend(helper.cropped_faces)
+
+        # 2) 모든 얼굴을 batch 로 복원
+        restored_faces = self._restore_faces(cropped_faces, w)
+
+        # 3) 이미지별로 복원된 얼굴 붙이기
+        results = []
+        for input_image, (input_img, is_gray, affine_matrices, offset) in zip(input_images, states):
+            h, w_img, _ = input_image.shape
+
+            helper.clean_all()
+            helper.input_img = input_img
+            helper.is_gray = is_gray
+            helper.affine_matrices = affine_matrices
+            for restored_face in restored_faces[offset:offset + len(affine_matrices)]:
+                helper.add_restored_face(restored_face)
+
+            helper.get_inverse_affine(None)
+            restored_img = helper.paste_faces_to_input_image()
+
+            # 최종 이미지 크기 조정 (원본 크기로)
+            results.append(cv2.resize(restored_img, (w_img, h)))
+
+        return results
+
+    def _restore_faces(self, cropped_faces, w):
+        restored_faces = []
+        for start in range(0, len(cropped_faces), self.batch_size):
+            batch = cropped_faces[start:start + self.batch_size]
+
+            tensors = []
+            for cropped_face in batch:
+                cropped_face_t = img2tensor(cropped_face / 255., bgr2rgb=True, float32=True)
+                normalize(cropped_face_t, (0.5, 0.5, 0.5), (0.5, 0.5, 0.5), inplace=True)
+                tensors.append(cropped_face_t)
+            batch_t = torch.stack(tensors).to(self.device)
+
             try:
                 with torch.no_grad():
-                    output = self.model(cropped_face_t, w=w, adain=True)[0]
-                    restored_face = tensor2img(output, rgb2bgr=True, min_max=(-1, 1))
+                    output = self.model(batch_t, w=w, adain=True)[0]
+                    for face_t in output:
+                        restored_face = tensor2img(face_t, rgb2bgr=True, min_max=(-1, 1))
+                        restored_faces.append(restored_face.astype('uint8'))
                 del output
                 if self.use_gpu:
                     torch.cuda.empty_cache()
             except RuntimeError as error:
                 print(f'Error: {error}')
-                print('If you encounter CUDA out of memory, try to set --tile with a smaller number.')
-            else:
-                restored_face = restored_face.astype('uint8')
-                self.face_helper.add_restored_face(restored_face)
-        
-        # 결과 생성
-        self.face_helper.get_inverse_affine(None)
-        restored_img = self.face_helper.paste_faces_to_input_image()
-        
-        # 최종 이미지 크기 조정 (원본 크기로)
-        restored_img = cv2.resize(restored_img, (w_img, h))
-        
-        return restored_img
+                print('If you encounter CUDA out of memory, try to set a smaller batch_size.')
+                # 복원에 실패한 얼굴은 원본 crop 을 그대로 사용
+                restored_faces.extend(batch[len(restored_faces) - start:])
+
+        return restored_faces
     
+    def clone(self):
+        """
+        CodeFormer 모델과 helper 의 검출/parsing 모델은 공유하고
+        helper 의 이미지별 상태만 따로 가지는 FaceRestorer 를 만든다
+
+        :return: FaceRestorer
+        """
+        restorer = copy.copy(self)
+        restorer.face_helper = copy.copy(self.face_helper)
+        restorer.face_helper.clean_all()
+        return restorer
+
     def __del__(self):
         """소멸자: 리소스 정리"""
         if self.use_gpu:
             torch.cuda.empty_cache()
 
+class FaceRestorerPool:
+    """
+    동시 요청을 위한 FaceRestorer pool
+    모델은 한 번만 로드하고 worker 마다 별도의 FaceRestoreHelper 를 가진다.
+    restore()/restore_batch() 는 idle worker 를 checkout 해서 실행하고,
+    모든 worker 가 사용 중이면 반납될 때까지 기다린다.
+    """
+    def __init__(self, model_path, size=1, use_gpu=False, batch_size=4, torch_threads=0):
+        """
+        :param model_path: CodeFormer 모델 파일 경로
+        :param size: worker 수 (동시에 복원할 수 있는 요청 수)
+        :param use_gpu: GPU 사용 여부 (기본값: False)
+        :param batch_size: 한 번에 CodeFormer 로 복원할 최대 얼굴 수
+        :param torch_threads: torch intra-op thread 수 (0 이면 torch 기본값)
+        """
+        if torch_threads > 0:
+            torch.set_num_threads(torch_threads)
+
+        first = FaceRestorer(model_path=model_path, use_gpu=use_gpu, batch_size=batch_size)
+        self.size = max(size, 1)
+        self.workers = queue.Queue()
+        self.workers.put(first)
+        for _ in range(self.size - 1):
+            self.workers.put(first.clone())
+
+        self._lock = threading.Lock()
+        self._waiting = 0
+        self._checkouts = 0
+        self._total_wait = 0.0
+        self._max_wait = 0.0
+
+        logger.info(f"FaceRestorerPool initialized with {self.size} workers, torch threads: {torch.get_num_threads()}")
+
+    @contextmanager
+    def checkout(self, timeout=None):
+        """
+        idle worker 를 빌려 온다
+
+        :param timeout: 기다릴 최대 시간(초). None 이면 무한 대기
+        :return: FaceRestorer
+        :raises TimeoutError: timeout 안에 worker 를 얻지 못한 경우
+        """
+        with self._lock:
+            self._waiting += 1
+        started_at = time.perf_counter()
+        try:
+            restorer = self.workers.get(timeout=timeout)
+        except queue.Empty:
+            raise TimeoutError(f"No idle face restorer within {timeout}s.")
+        finally:
+            waited = time.perf_counter() - started_at
+            with self._lock:
+                self._waiting -= 1
+
+        with self._lock:
+            self._checkouts += 1
+            self._total_wait += waited
+            self._max_wait = max(self._max_wait, waited)
+
+        try:
+            yield restorer
+        finally:
+            self.workers.put(restorer)
+
+    def restore(self, *args, **kwargs):
+        """
+        FaceRestorer.restore 참고
+        """
+        with self.checkout() as restorer:
+            return restorer.restore(*args, **kwargs)
+
+    def restore_batch(self, *args, **kwargs):
+        """
+        FaceRestorer.restore_batch 참고
+        """
+        with self.checkout() as restorer:
+            return restorer.restore_batch(*args, **kwargs)
+
+    def metrics(self):
+        """
+        :return: dict (size, idle, waiting, checkouts, avg_wait_seconds, max_wait_seconds)
+        """
+        with self._lock:
+            return {
+                "size": self.size,
+                "idle": self.workers.qsize(),
+                "waiting": self._waiting,
+                "checkouts": self._checkouts,
+                "avg_wait_seconds": self._total_wait / self._checkouts if self._checkouts else 0.0,
+                "max_wait_seconds": self._max_wait,
+            }
+
 # 사용 예시
 if __name__ == "__main__":
     # 모델 한 번만 로드
@@ -0,0 +1,173 @@
+import os
+import glob
+import time
+import argparse
+import numpy as np
+import cv2
+import onnx
+from config import BUFFALO_L_PATH, INSWAPPER_PATH
+from library.onnx_profile import InferenceProfile, PROFILES
+
+# Image file extensions used by compare
+IMAGE_EXTENSIONS = ('*.jpg', '*.png', '*.webp')
+
+def quantize_model(src_path, dst_path, profile):
+    """
+    Write the int8 / fp16 variant of one onnx model.
+
+    int8 : dynamic quantization of the weights (activations stay float, no calibration data needed)
+    fp16 : float16 weights and activations, float32 inputs/outputs
+    """
+    if profile == "int8":
+        from onnxruntime.quantization import quantize_dynamic, QuantType
+        # ConvInteger of the CPU provider only supports uint8 weights
+        quantize_dynamic(src_path, dst_path, weight_type=QuantType.QUInt8)
+    elif profile == "fp16":
+        try:
+            from onnxconverter_common import float16
+        except ImportError:
+            raise SystemExit("fp16 profile requires 'onnxconverter-common' (pip install onnxconverter-common)")
+        model = float16.convert_float_to_float16(onnx.load(src_path), keep_io_types=True)
+        onnx.save(model, dst_path)
+    else:
+        raise ValueError(f"Nothing to build for profile '{profile}'")
+
+def keep_emap(src_path, dst_path):
+    """
+    INSwapper reads its embedding map from the last initializer of the onnx graph.
+    Quantization may drop (unused) or convert it, so the original float32 one is appended again.
+    """
+    emap = onnx.load(src_path).graph.initializer[-1]
+    model = onnx.load(dst_path)
+    graph = model.graph
+
+    last = graph.initializer[-1] if graph.initializer else None
+    if last is not None and last.name == emap.name and last.data_type == emap.data_type:
+        return
+
+    used = any(emap.name in node.input for node in graph.node)
+    if used:
+        # the graph uses a converted copy under the same name, keep it and add ours under a new name
+        emap.name = f"{emap.name}_emap"
+    else:
+        for initializer in [i for i in graph.initializer if i.name == emap.name]:
+            graph.initializer.remove(initializer)
+    graph.initializer.append(emap)
+    onnx.save(model, dst_path)
+
+def build(profile):
+    target = InferenceProfile(name=profile)
+
+    src_dir = os.path.join(BUFFALO_L_PATH, "models", "buffalo_l")
+    dst_dir = os.path.join(BUFFALO_L_PATH, "models", target.pack_name())
+    os.makedirs(dst_dir, exist_ok=True)
+
+    for src_path in sorted(glob.glob(os.path.join(src_dir, "*.onnx"))):
+        dst_path = os.path.join(dst_dir, os.path.basename(src_path))
+        print(f"{src_path} -> {dst_path}")
+        quantize_model(src_path, dst_path, profile)
+
+    dst_path = target.model_path(INSWAPPER_PATH)
+    print(f"{INSWAPPER_PATH} -> {dst_path}")
+    quantize_model(INSWAPPER_PATH, dst_path, profile)
+    keep_emap(INSWAPPER_PATH, dst_path)
+
+def match_faces(ref_faces, faces, min_iou=0.5):
+    """
+    :return: list of (ref_face, face) pairs matched by bbox IoU.
+    """
+    pairs = []
+    for ref in ref_faces:
+        best, best_iou = None, min_iou
+        for face in faces:
+            x0, y0 = np.maximum(ref.bbox[:2], face.bbox[:2])
+            x1, y1 = np.minimum(ref.bbox[2:], face.bbox[2:])
+            inter = max(x1 - x0, 0) * max(y1 - y0, 0)
+            union = np.prod(ref.bbox[2:] - ref.bbox[:2]) + np.prod(face.bbox[2:] - face.bbox[:2]) - inter
+            iou = inter / union if union > 0 else 0
+            if iou >= best_iou:
+                best, best_iou = face, iou
+        if best is not None:
+            pairs.append((ref, best))
+    return pairs
+
+def compare(profile, image_dir):
+    """
+    Run the fp32 models and the profile's models on the same images and
+    report the accuracy delta (embedding cosine similarity, detections,
+    gender/age, swapped pixels) and the time per image.
+    """
+    image_files = []
+    for ext in IMAGE_EXTENSIONS:
+        image_files.extend(glob.glob(os.path.join(image_dir, ext)))
+    images = [img for img in (cv2.imread(f) for f in sorted(image_files)) if img is not None]
+    if not images:
+        raise SystemExit(f"No images in {image_dir}")
+
+    ref_profile, test_profile = InferenceProfile(name="fp32"), InferenceProfile(name=profile)
+    ref_detector = ref_profile.load_face_analysis(BUFFALO_L_PATH)
+    test_detector = test_profile.load_face_analysis(BUFFALO_L_PATH)
+    ref_swapper = ref_profile.load_model(INSWAPPER_PATH)
+    test_swapper = test_profile.load_model(test_profile.model_path(INSWAPPER_PATH))
+
+    def timed(fn, *args):
+        started_at = time.perf_counter()
+        result = fn(*args)
+        return result, time.perf_counter() - started_at
+
+    cosines, age_diffs, gender_same, pixel_diffs = [], [], [], []
+    ref_seconds = test_seconds = 0.0
+    ref_count = test_count = 0
+    source_face = None
+
+    for img in images:
+        ref_faces, t = timed(ref_detector.get, img)
+        ref_seconds += t
+        test_faces, t = timed(test_detector.get, img)
+        test_seconds += t
+        ref_count += len(ref_faces)
+        test_count += len(test_faces)
+
+        for ref, face in match_faces(ref_faces, test_faces):
+            cosines.append(float(np.dot(ref.normed_embedding, face.normed_embedding)))
+            age_diffs.append(abs(int(ref.age) - int(face.age)))
+            gender_same.append(int(ref.gender) == int(face.gender))
+
+        if not ref_faces:
+            continue
+        if source_face is None:
+            source_face = ref_faces[0]
+            continue
+        ref_img = ref_swapper.get(img, ref_faces[0], source_face)
+        test_img = test_swapper.get(img, ref_faces[0], source_face)
+        pixel_diffs.append(float(np.mean(np.abs(ref_img.astype(np.float32) - test_img.astype(np.float32)))))
+
+    print(f"\nProfile '{profile}' vs 'fp32' on {len(images)} images")
+    print(f"  detected faces     : {test_count} / {ref_count} (matched {len(cosines)})")
+    if cosines:
+        cosines = np.asarray(cosines)
+        print(f"  embedding cosine   : mean {cosines.mean():.4f}, p5 {np.percentile(cosines, 5):.4f}, min {cosines.min():.4f}")
+        print(f"  age abs diff       : mean {np.mean(age_diffs):.2f}, max {np.max(age_diffs)}")
+        print(f"  gender agreement   : {np.mean(gender_same) * 100:.1f}%")
+    if pixel_diffs:
+        print(f"  swap pixel abs diff: mean {np.mean(pixel_diffs):.2f} (0-255)")
+    print(f"  analysis time/image: fp32 {ref_seconds / len(images) * 1000:.1f}ms, "
+          f"{profile} {test_seconds / len(images) * 1000:.1f}ms")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build and check quantized variants of buffalo_l and inswapper.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    build_parser = subparsers.add_parser("build", help="Write the quantized models next to the fp32 ones.")
+    build_parser.add_argument("--profile", choices=[p for p in PROFILES if p != "fp32"], default="int8")
+
+    compare_parser = subparsers.add_parser("compare", help="Report the accuracy delta against fp32 on a folder of images.")
+    compare_parser.add_argument("--profile", choices=[p for p in PROFILES if p != "fp32"], default="int8")
+    compare_parser.add_argument("--images", required=True, help="Folder with test images.")
+
+    args = parser.parse_args()
+
+    if args.command == "build":
+        build(args.profile)
+    else:
+        compare(args.profile, args.images)
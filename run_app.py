@@ -1,13 +1,33 @@
+import os
 from fastapi import FastAPI
 from fastapi.staticfiles import StaticFiles
+from starlette.exceptions import HTTPException
 import gradio as gr
 from app.routes import router as app_router
 from app.gradio_app import demo  # Gradio 앱 UI
+from app import ensure_db_schema
+from config import OBJECT_STORAGE, LOCAL_STORAGE_PATH, LOCAL_STORAGE_URL_PREFIX, LOCAL_STORAGE_PUBLIC_BUCKETS
+
+class BucketFiles(StaticFiles):
+    """
+    Static files of one LOCAL storage bucket, without hidden files (e.g. .tmp-* files being written).
+    """
+    async def get_response(self, path, scope):
+        if any(part.startswith(".") for part in path.replace("\\", "/").split("/")):
+            raise HTTPException(status_code=404)
+        return await super().get_response(path, scope)
+
+ensure_db_schema()
 
 app = FastAPI()
 
-# static 폴더를 정적으로 서빙
-# app.mount("/static", StaticFiles(directory="static"), name="static")
+# LOCAL 스토리지의 공개 버킷만 정적으로 서빙 (presigned URL 대신, 템플릿 등 다른 버킷은 제외)
+if OBJECT_STORAGE == "LOCAL" and LOCAL_STORAGE_URL_PREFIX.startswith("/"):
+    for bucket in LOCAL_STORAGE_PUBLIC_BUCKETS:
+        bucket_dir = os.path.join(LOCAL_STORAGE_PATH, bucket)
+        os.makedirs(bucket_dir, exist_ok=True)
+        app.mount(f"{LOCAL_STORAGE_URL_PREFIX.rstrip('/')}/{bucket}", BucketFiles(directory=bucket_dir),
+                  name=f"static-{bucket}")
 
 # 라우터 등록
 app.include_router(app_router) 
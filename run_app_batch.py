@@ -1,46 +1,102 @@
 import os
 import glob
-import sys
 import argparse
-from app.face_process import process_image
+from config import VECTOR_DB, BATCH_WORKERS, BATCH_QUEUE_SIZE, BATCH_SIZE, BATCH_THREADS_PER_WORKER
+from library.batch_engine import run_batch
 
 # Image file extensions to process
 IMAGE_EXTENSIONS = ('*.jpg', '*.png', '*.webp')
 
-def process_images(target_dir):
-    # Find all image file paths
-    image_files = []
-    for ext in IMAGE_EXTENSIONS:
-        image_files.extend(glob.glob(os.path.join(target_dir, ext)))
+def init_worker(threads_per_worker=0):
+    """
+    Runs once in every worker process.
+    Limits the per-process thread pools and loads the models
+    (buffalo_l / inswapper / CodeFormer) before the first image arrives.
+    """
+    if threads_per_worker > 0:
+        os.environ["OMP_NUM_THREADS"] = str(threads_per_worker)
+        import torch
+        torch.set_num_threads(threads_per_worker)
+        # ONNX Runtime sessions of this worker use the same number of threads
+        import config
+        config.ORT_INTRA_OP_THREADS = threads_per_worker
 
-    total_files = len(image_files)
-    print(f"Total images to process: {total_files}")
+    from config import IS_FACE_RESTORATION_ENABLED
+    from app import registry
+
+    models = ["face_detector", "batch_face_detector", "face_swapper", "base_faces"]
+    if IS_FACE_RESTORATION_ENABLED:
+        models.append("face_restorer")
+    registry.warm_up(models)
+
+def process_chunk(tasks):
+    # 모델은 init_worker 에서 이미 로드되어 있다
+    from app.face_process import process_image, process_images
+
+    if len(tasks) == 1:
+        return [process_image(*tasks[0])]
+
+    return process_images(tasks)
 
-    processed_count = 0
+def make_tasks(target_dir, image_files):
+    folder_name = os.path.basename(os.path.normpath(target_dir))
 
     for image_path in image_files:
-        folder_name = os.path.basename(os.path.normpath(target_dir))
         file_name_with_ext = os.path.basename(image_path)
         file_name, _ = os.path.splitext(file_name_with_ext)
 
         photo_title = f"{folder_name}__{file_name_with_ext}"
         photo_id = file_name
 
-        # Call the provided function
-        process_image(image_path, photo_title, photo_id)
+        yield (image_path, photo_title, photo_id)
 
-        processed_count += 1
-        sys.stdout.write(f"\r{processed_count}/{total_files} Progress: {(processed_count / total_files) * 100:.2f}%")
-        sys.stdout.flush()
+def process_images(target_dir, workers=BATCH_WORKERS, queue_size=BATCH_QUEUE_SIZE, batch_size=BATCH_SIZE, threads_per_worker=BATCH_THREADS_PER_WORKER):
+    # Find all image file paths
+    image_files = []
+    for ext in IMAGE_EXTENSIONS:
+        image_files.extend(glob.glob(os.path.join(target_dir, ext)))
 
-    print("\nAll images have been processed successfully.")  # Completion message
+    total_files = len(image_files)
+    print(f"Total images to process: {total_files} (workers: {workers})")
+
+    report = run_batch(
+        make_tasks(target_dir, image_files),
+        process_chunk,
+        total=total_files,
+        workers=workers,
+        queue_size=queue_size,
+        initializer=init_worker,
+        initargs=(threads_per_worker,),
+        chunk_size=max(batch_size, 1)
+    )
+
+    print(f"\n{report.summary()}")
+    print("All images have been processed.")  # Completion message
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="Batch image processor")
     parser.add_argument("directory", help="Directory path containing images to process")
+    parser.add_argument("--workers", type=int, default=BATCH_WORKERS,
+                        help="Number of worker processes (0: run in the current process)")
+    parser.add_argument("--queue-size", type=int, default=BATCH_QUEUE_SIZE,
+                        help="Maximum number of image batches in flight (default: 2 x workers)")
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE,
+                        help="Number of images analyzed together in one inference batch")
+    parser.add_argument("--threads-per-worker", type=int, default=BATCH_THREADS_PER_WORKER,
+                        help="CPU threads each worker may use for inference (0: library default)")
     args = parser.parse_args()
 
+    # NUMPY 저장소는 한 프로세스만 열 수 있다
+    if VECTOR_DB == "NUMPY" and args.workers > 1:
+        parser.error("VECTOR_DB=NUMPY can only be opened by one process. Use --workers 0 or 1, or VECTOR_DB=QDRANT.")
+
     if os.path.isdir(args.directory):
-        process_images(args.directory)
+        process_images(
+            args.directory,
+            workers=args.workers,
+            queue_size=args.queue_size,
+            batch_size=args.batch_size,
+            threads_per_worker=args.threads_per_worker
+        )
     else:
         print("Invalid directory path.")
@@ -1,9 +1,10 @@
 from apscheduler.schedulers.background import BackgroundScheduler
 import time
 import logging
-from app import storage, face_detector
+from app import storage, face_detector, face_cache, ensure_db_schema
 from app.jobs import update_mean_faces
 from config import SCHEDULER_INTERVAL_MINUTES
+from library.face_cache import load_analyzed_images
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -11,14 +12,13 @@ logger = logging.getLogger(__name__)
 if __name__ == '__main__':
 
     print("Starting scheduler...")
+    ensure_db_schema()
 
-    images = storage.load_base_images_list("base-images", ["mean_face"])
+    images = load_analyzed_images(storage, "base-images", ["mean_face"], face_detector, cache=face_cache.get_object())
     logger.info(f"Loaded {len(images['mean_face'])} mean face images.")
     
     mean_face_imgs = []
-    for f in images["mean_face"]:
-
-        faces = face_detector.get(f)
+    for f, faces in images["mean_face"]:
 
         if not faces:
             logger.info("No faces detected in the image. Please upload a valid image with faces.")
@@ -8,9 +8,44 @@ def storage_client(object_storage: str, **kwargs) -> StorageInterface:
                     endpoint=kwargs.get('endpoint'),
                     access_key=kwargs.get('access_key'),
                     secret_key=kwargs.get('secret_key'),
-                    secure=kwargs.get('secure', False)
+                    secure=kwargs.get('secure', False),
+                    max_connections=kwargs.get('max_connections', 10),
+                    fetch_workers=kwargs.get('fetch_workers', 8),
+                    region=kwargs.get('region'),
+                    url_expiry_seconds=kwargs.get('url_expiry_seconds', 86400),
+                    url_cache_size=kwargs.get('url_cache_size', 10000),
+                    url_min_remaining_seconds=kwargs.get('url_min_remaining_seconds', 3600),
+                    derivatives=kwargs.get('derivatives'),
+                    derivative_format=kwargs.get('derivative_format', 'webp'),
+                    derivative_quality=kwargs.get('derivative_quality', 80),
+                    codec=kwargs.get('codec')
                 )  # Initialize the database interface
+    elif object_storage == "LOCAL":
+        from storage.local import LocalStorage
+        storage = LocalStorage(
+                    root=kwargs.get('root', '.data/objects'),
+                    url_prefix=kwargs.get('url_prefix', '/static'),
+                    fetch_workers=kwargs.get('fetch_workers', 8),
+                    fsync=kwargs.get('fsync', False),
+                    derivatives=kwargs.get('derivatives'),
+                    derivative_format=kwargs.get('derivative_format', 'webp'),
+                    derivative_quality=kwargs.get('derivative_quality', 80),
+                    codec=kwargs.get('codec')
+                )
     else:
         raise ValueError("Invalid Storage value.")
 
+    # 메모리/디스크 읽기 캐시 (LOCAL 은 이미 로컬 디스크이므로 디스크 캐시를 두지 않는다)
+    cache_dir = kwargs.get('cache_dir') if object_storage != "LOCAL" else None
+    if kwargs.get('cache_memory_bytes', 0) > 0 or cache_dir:
+        from storage.cached import CachedStorage
+        storage = CachedStorage(
+                    storage,
+                    memory_bytes=kwargs.get('cache_memory_bytes', 0),
+                    cache_dir=cache_dir,
+                    disk_bytes=kwargs.get('cache_disk_bytes', 1024 * 1024 * 1024),
+                    revalidate_seconds=kwargs.get('cache_revalidate_seconds', 60),
+                    fetch_workers=kwargs.get('fetch_workers', 8)
+                )
+
     return storage
@@ -0,0 +1,342 @@
+import os
+import re
+import time
+import hashlib
+import tempfile
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional, Tuple
+import numpy as np
+from storage.storage_interface import StorageInterface
+from library.image_codec import DEFAULT_CODEC
+from library.image_derivatives import derivative_name
+
+class CachedStorage(StorageInterface):
+    """
+    Read-through cache in front of another storage.
+
+    load_image looks in two tiers before going to the storage:
+    1. memory : decoded images, LRU within `memory_bytes`.
+    2. disk   : encoded files under `cache_dir`, keyed by bucket/file name/ETag,
+                so they survive restarts and are never served for a changed object.
+
+    An entry is trusted for `revalidate_seconds` after its ETag was last checked.
+    After that one ETag request (no download) renews it, or the object is loaded again.
+    Uploads and deletes through this object invalidate the affected entries at once.
+    Every other method is passed through.
+    """
+    def __init__(
+            self,
+            storage: StorageInterface,
+            memory_bytes=256 * 1024 * 1024,
+            cache_dir=None,
+            disk_bytes=1024 * 1024 * 1024,
+            revalidate_seconds=60,
+            fetch_workers=8
+        ):
+        """
+        :param storage: Storage that is read on a miss.
+        :param memory_bytes: Budget of the decoded images kept in memory (0: no memory tier).
+        :param cache_dir: Directory of the encoded files (None or empty: no disk tier).
+        :param disk_bytes: Budget of cache_dir. The least recently used files are removed beyond it.
+        :param revalidate_seconds: How long a cached image is served without checking its ETag.
+        :param fetch_workers: Images loaded at the same time by load_images.
+        """
+        self.storage = storage
+        self.memory_bytes = memory_bytes
+        self.cache_dir = os.path.abspath(cache_dir) if cache_dir else None
+        self.disk_bytes = disk_bytes
+        self.revalidate_seconds = revalidate_seconds
+        self.fetch_workers = fetch_workers
+
+        # (bucket, file_name) -> (image, etag, checked_at)
+        self._images: "OrderedDict[Tuple[str, str], Tuple[np.ndarray, str, float]]" = OrderedDict()
+        self._image_bytes = 0
+        self._lock = threading.Lock()
+        self._disk_lock = threading.Lock()
+        self._disk_used = self._disk_usage() if self.cache_dir else 0
+
+        self._stats = {
+            "memory_hits": 0, "disk_hits": 0, "misses": 0, "revalidations": 0, "evictions": 0,
+            "memory_seconds": 0.0, "disk_seconds": 0.0, "miss_seconds": 0.0,
+        }
+
+    def __getattr__(self, name):
+        # codec, url_cache 등 감싼 스토리지의 속성은 그대로 노출한다
+        if name == "storage":
+            raise AttributeError(name)
+        return getattr(self.storage, name)
+
+    @property
+    def codec(self):
+        return getattr(self.storage, "codec", None) or DEFAULT_CODEC
+
+    # ---- memory tier ----
+
+    def _memory_get(self, key):
+        with self._lock:
+            entry = self._images.get(key)
+            if entry is not None:
+                self._images.move_to_end(key)
+            return entry
+
+    def _memory_put(self, key, image, etag, checked_at):
+        if image.nbytes > self.memory_bytes:
+            return
+        with self._lock:
+            previous = self._images.pop(key, None)
+            if previous is not None:
+                self._image_bytes -= previous[0].nbytes
+            self._images[key] = (image, etag, checked_at)
+            self._image_bytes += image.nbytes
+            while self._image_bytes > self.memory_bytes:
+                _, (evicted, _, _) = self._images.popitem(last=False)
+                self._image_bytes -= evicted.nbytes
+                self._stats["evictions"] += 1
+
+    def _memory_discard(self, bucket, file_names=None):
+        with self._lock:
+            keys = [key for key in self._images if key[0] == bucket and (file_names is None or key[1] in file_names)]
+            for key in keys:
+                self._image_bytes -= self._images.pop(key)[0].nbytes
+
+    # ---- disk tier ----
+
+    def _disk_stem(self, bucket, file_name):
+        digest = hashlib.sha1(f"{bucket}/{file_name}".encode("utf-8")).hexdigest()
+        return os.path.join(self.cache_dir, digest[:2]), digest
+
+    def _disk_find(self, bucket, file_name) -> Optional[Tuple[str, str]]:
+        """
+        :return: (path, etag) of the cached file of an object, None if there is none.
+        """
+        directory, digest = self._disk_stem(bucket, file_name)
+        try:
+            with os.scandir(directory) as it:
+                for entry in it:
+                    if entry.name.startswith(f"{digest}.") and entry.is_file():
+                        return entry.path, entry.name[len(digest) + 1:]
+        except FileNotFoundError:
+            pass
+        return None
+
+    def _disk_put(self, bucket, file_name, data, etag):
+        if len(data) > self.disk_bytes:
+            return
+        directory, digest = self._disk_stem(bucket, file_name)
+        os.makedirs(directory, exist_ok=True)
+        # ETag 에 파일명으로 쓸 수 없는 문자가 있으면 바꾼다
+        path = os.path.join(directory, f"{digest}.{re.sub(r'[^0-9A-Za-z_-]', '_', etag)}")
+
+        fd, temp_path = tempfile.mkstemp(dir=directory, prefix=".tmp-")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.replace(temp_path, path)
+        except BaseException:
+            os.unlink(temp_path)
+            raise
+
+        # 같은 객체의 이전 ETag 파일은 지운다
+        removed = self._disk_remove(bucket, file_name, keep=path)
+        with self._disk_lock:
+            self._disk_used += len(data) - removed
+            over_budget = self._disk_used > self.disk_bytes
+        if over_budget:
+            self._disk_prune()
+
+    def _disk_remove(self, bucket, file_name, keep=None) -> int:
+        directory, digest = self._disk_stem(bucket, file_name)
+        removed = 0
+        try:
+            with os.scandir(directory) as it:
+                paths = [(entry.path, entry.stat().st_size) for entry in it
+                         if entry.name.startswith(f"{digest}.") and entry.path != keep]
+        except FileNotFoundError:
+            return 0
+        for path, size in paths:
+            try:
+                os.unlink(path)
+                removed += size
+            except FileNotFoundError:
+                pass
+        return removed
+
+    def _disk_files(self):
+        for directory in os.scandir(self.cache_dir):
+            if directory.is_dir():
+                with os.scandir(directory.path) as it:
+                    for entry in it:
+                        if entry.is_file() and not entry.name.startswith(".tmp-"):
+                            yield entry
+
+    def _disk_usage(self) -> int:
+        os.makedirs(self.cache_dir, exist_ok=True)
+        return sum(entry.stat().st_size for entry in self._disk_files())
+
+    def _disk_prune(self):
+        """
+        Remove the least recently validated files (oldest mtime) down to 90% of the budget.
+        """
+        with self._disk_lock:
+            files = sorted(
+                ((entry.stat().st_mtime, entry.stat().st_size, entry.path) for entry in self._disk_files()),
+                reverse=True
+            )
+            used = sum(size for _, size, _ in files)
+            while files and used > self.disk_bytes * 0.9:
+                _, size, path = files.pop()
+                try:
+                    os.unlink(path)
+                except FileNotFoundError:
+                    pass
+                used -= size
+            self._disk_used = used
+
+    # ---- StorageInterface ----
+
+    def _record(self, tier, started_at):
+        with self._lock:
+            self._stats[f"{tier}_hits" if tier != "miss" else "misses"] += 1
+            self._stats[f"{tier}_seconds"] += time.perf_counter() - started_at
+
+    def load_image(self, bucket, file_name):
+        """
+        :return: A copy of the cached image (callers may draw on it), None if the object cannot be decoded.
+        """
+        started_at = time.perf_counter()
+        key = (bucket, file_name)
+        now = time.time()
+        etag = None
+
+        entry = self._memory_get(key) if self.memory_bytes > 0 else None
+        if entry is not None:
+            image, cached_etag, checked_at = entry
+            if now - checked_at >= self.revalidate_seconds:
+                etag = self._revalidate(bucket, file_name)
+            if etag is None or etag == cached_etag:
+                if etag is not None:
+                    self._memory_put(key, image, cached_etag, now)
+                self._record("memory", started_at)
+                return image.copy()
+
+        if self.cache_dir:
+            found = self._disk_find(bucket, file_name)
+            if found is not None:
+                path, cached_etag = found
+                checked_at = os.stat(path).st_mtime
+                if etag is None and now - checked_at >= self.revalidate_seconds:
+                    etag = self._revalidate(bucket, file_name)
+                if etag is None or etag == cached_etag:
+                    if etag is not None:
+                        os.utime(path)
+                        checked_at = now
+                    image = self.codec.decode(np.fromfile(path, dtype=np.uint8))
+                    if image is not None:
+                        self._memory_put(key, image, cached_etag, checked_at)
+                        self._record("disk", started_at)
+                        return image.copy()
+
+        if self.cache_dir:
+            data, etag = self.storage.load_file(bucket, file_name)
+            image = self.codec.decode(data)
+            if image is not None:
+                self._disk_put(bucket, file_name, data, etag)
+        else:
+            # 디스크 계층이 없으면 스토리지 자신의 load_image (LOCAL 은 mmap) 로 디코딩한다.
+            # ETag 를 먼저 읽으므로 그 사이에 바뀐 객체는 다음 재검증에서 다시 읽힌다
+            etag = etag or self.storage.get_file_etag(bucket, file_name)
+            image = self.storage.load_image(bucket, file_name)
+        if image is not None:
+            if self.memory_bytes > 0:
+                self._memory_put(key, image, etag, now)
+            image = image.copy()
+        self._record("miss", started_at)
+        return image
+
+    def _revalidate(self, bucket, file_name):
+        with self._lock:
+            self._stats["revalidations"] += 1
+        return self.storage.get_file_etag(bucket, file_name)
+
+    def load_images(self, bucket, file_names):
+        """
+        Load several images concurrently through the cache.
+
+        :return: list of images in the same order as file_names.
+        """
+        if len(file_names) <= 1:
+            return [self.load_image(bucket, file_name) for file_name in file_names]
+
+        with ThreadPoolExecutor(max_workers=min(self.fetch_workers, len(file_names))) as executor:
+            return list(executor.map(lambda file_name: self.load_image(bucket, file_name), file_names))
+
+    def load_file(self, bucket, file_name):
+        return self.storage.load_file(bucket, file_name)
+
+    def get_file_etag(self, bucket, file_name):
+        return self.storage.get_file_etag(bucket, file_name)
+
+    def upload_image(self, bucket, file_name, image):
+        self.storage.upload_image(bucket, file_name, image)
+
+        # 덮어쓴 원본과 파생 이미지의 캐시를 무효화한다
+        derivatives = getattr(self.storage, "derivatives", None) or {}
+        fmt = getattr(self.storage, "derivative_format", "webp")
+        names = [file_name] + [derivative_name(file_name, name, fmt) for name in derivatives]
+        self._memory_discard(bucket, set(names))
+        if self.cache_dir:
+            removed = sum(self._disk_remove(bucket, name) for name in names)
+            with self._disk_lock:
+                self._disk_used -= removed
+
+    def get_file_url(self, bucket, file_name):
+        return self.storage.get_file_url(bucket, file_name)
+
+    def get_file_urls(self, bucket, file_names):
+        return self.storage.get_file_urls(bucket, file_names)
+
+    def list_files_in_bucket(self, bucket, recursive=True, prefix=None):
+        return self.storage.list_files_in_bucket(bucket, recursive=recursive, prefix=prefix)
+
+    def list_file_etags(self, bucket, recursive=True, prefix=None):
+        return self.storage.list_file_etags(bucket, recursive=recursive, prefix=prefix)
+
+    def load_base_images_list(self, bucket, prefixes):
+        """
+        주어진 prefix 리스트에 따라 이미지를 분류하여 캐시를 거쳐 로드합니다.
+        """
+        result = {}
+
+        for i, prefix in enumerate(prefixes):
+            files = [
+                file for file in self.list_files_in_bucket(bucket, prefix=prefix)
+                if not any(file.startswith(p) for p in prefixes[:i])  # 하나의 prefix에만 해당된다고 가정
+            ]
+            result[prefix] = self.load_images(bucket, files)
+
+        return result
+
+    def delete_all_objects_batch(self, bucket, recursive=True):
+        file_names = self.list_files_in_bucket(bucket, recursive=recursive) if self.cache_dir else []
+        self.storage.delete_all_objects_batch(bucket, recursive=recursive)
+
+        self._memory_discard(bucket)
+        if self.cache_dir:
+            removed = sum(self._disk_remove(bucket, name) for name in file_names)
+            with self._disk_lock:
+                self._disk_used -= removed
+
+    def stats(self) -> dict:
+        with self._lock:
+            stats = dict(self._stats)
+            stats["memory_images"] = len(self._images)
+            stats["memory_bytes"] = self._image_bytes
+        stats["disk_bytes"] = self._disk_used
+
+        loads = stats["memory_hits"] + stats["disk_hits"] + stats["misses"]
+        stats["hit_rate"] = (stats["memory_hits"] + stats["disk_hits"]) / loads if loads else 0.0
+        for tier, count in (("memory", "memory_hits"), ("disk", "disk_hits"), ("miss", "misses")):
+            stats[f"{tier}_avg_ms"] = stats[f"{tier}_seconds"] / stats[count] * 1000 if stats[count] else 0.0
+        return stats
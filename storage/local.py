@@ -0,0 +1,226 @@
+import os
+import mmap
+import logging
+import tempfile
+from urllib.parse import quote
+from concurrent.futures import ThreadPoolExecutor
+from storage.storage_interface import StorageInterface
+from library.gadget import to_image_bytes
+from library.image_codec import ImageCodec, DEFAULT_CODEC
+from library.image_derivatives import encode_derivatives
+
+def _etag(stat: os.stat_result) -> str:
+    return f"{stat.st_mtime_ns:x}-{stat.st_size:x}"
+
+# Local filesystem implementation of the storage interface
+class LocalStorage(StorageInterface):
+    """
+    Buckets are directories under `root` and objects are files in them
+    (`thumb/abc.webp` -> `<root>/<bucket>/thumb/abc.webp`).
+
+    Files are written to a temporary file and renamed into place, so readers
+    never see a partial image. URLs point at the static file route that
+    serves `root` (see run_app.py) instead of being presigned.
+    """
+    def __init__(
+            self,
+            root=".data/objects",
+            url_prefix="/static",
+            fetch_workers=8,
+            fsync=False,
+            derivatives=None,
+            derivative_format="webp",
+            derivative_quality=80,
+            codec: ImageCodec = None
+        ):
+        """
+        :param root: Directory holding one sub directory per bucket (created if missing).
+        :param url_prefix: URL under which `root` is served, e.g. /static or https://cdn.example.com/images.
+        :param fetch_workers: Images decoded at the same time by load_images.
+        :param fsync: Flush every file to disk before it is renamed into place (durable across power loss, slower).
+        :param derivatives: Downscaled copies written with every uploaded image, {name: longest side}.
+        :param derivative_format: webp / jpg.
+        :param derivative_quality: Encoding quality of the derivatives (0-100).
+        :param codec: JPEG encoder/decoder of upload_image / load_image (default: DEFAULT_CODEC).
+        """
+        self.root = os.path.abspath(root)
+        self.url_prefix = url_prefix.rstrip("/")
+        self.fetch_workers = fetch_workers
+        self.fsync = fsync
+        self.derivatives = derivatives or {}
+        self.derivative_format = derivative_format
+        self.derivative_quality = derivative_quality
+        self.codec = codec or DEFAULT_CODEC
+        os.makedirs(self.root, exist_ok=True)
+
+    def _path(self, bucket, file_name=""):
+        path = os.path.abspath(os.path.join(self.root, bucket, file_name))
+        # 버킷 밖의 경로 (../ 등) 는 허용하지 않는다
+        if os.path.commonpath([path, os.path.join(self.root, bucket)]) != os.path.join(self.root, bucket):
+            raise ValueError(f"Invalid object name '{file_name}' in bucket '{bucket}'.")
+        return path
+
+    def _write_atomic(self, bucket, file_name, data):
+        path = self._path(bucket, file_name)
+        directory = os.path.dirname(path)
+        os.makedirs(directory, exist_ok=True)
+
+        fd, temp_path = tempfile.mkstemp(dir=directory, prefix=".tmp-")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+                if self.fsync:
+                    f.flush()
+                    os.fsync(f.fileno())
+            os.replace(temp_path, path)
+        except BaseException:
+            os.unlink(temp_path)
+            raise
+
+    def upload_image(self, bucket, file_name, image):
+        """
+        Write the image as JPEG, and its derivatives (e.g. thumb/<name>.webp) from the same array.
+        A failed derivative is only logged: the original is stored and the UI falls back to it.
+        """
+        self._put_image(bucket, file_name, image=image)
+
+        if not self.derivatives:
+            return
+        try:
+            for key, data, _ in encode_derivatives(
+                    file_name, image, self.derivatives, self.derivative_format, self.derivative_quality):
+                self._write_atomic(bucket, key, data)
+        except Exception as e:
+            logging.warning(f"Failed to write the derivatives of {file_name} : {e}")
+
+    @to_image_bytes
+    def _put_image(self, bucket, file_name, image_bytes, length):
+        # 인코딩된 버퍼를 복사 없이 그대로 기록한다
+        self._write_atomic(bucket, file_name, image_bytes.getbuffer())
+
+    def get_file_url(self, bucket, file_name):
+        return self.get_file_urls(bucket, [file_name])[0]
+
+    def get_file_urls(self, bucket, file_names):
+        """
+        Static URLs of several files. They do not expire, so nothing is signed or cached.
+
+        :return: list of URLs in the same order as file_names.
+        """
+        base = f"{self.url_prefix}/{quote(bucket)}/"
+        return [base + quote(file_name) for file_name in file_names]
+
+    def load_image(self, bucket, file_name):
+        """
+        Decode the file straight from a read-only memory map of it (no read into a bytes object).
+
+        :return: BGR image, None if the file is empty or cannot be decoded.
+        """
+        with open(self._path(bucket, file_name), "rb") as f:
+            if os.fstat(f.fileno()).st_size == 0:
+                return None
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                view = memoryview(mm)
+                try:
+                    return self.codec.decode(view)
+                finally:
+                    # mmap 을 닫기 전에 버퍼 참조를 해제해야 한다
+                    view.release()
+
+    def load_file(self, bucket, file_name):
+        """
+        :return: (file contents, ETag) with the ETag of list_file_etags.
+        """
+        with open(self._path(bucket, file_name), "rb") as f:
+            return f.read(), _etag(os.fstat(f.fileno()))
+
+    def get_file_etag(self, bucket, file_name):
+        return _etag(os.stat(self._path(bucket, file_name)))
+
+    def load_images(self, bucket, file_names):
+        """
+        Decode several images concurrently.
+
+        :return: list of images in the same order as file_names.
+        """
+        if len(file_names) <= 1:
+            return [self.load_image(bucket, file_name) for file_name in file_names]
+
+        with ThreadPoolExecutor(max_workers=min(self.fetch_workers, len(file_names))) as executor:
+            return list(executor.map(lambda file_name: self.load_image(bucket, file_name), file_names))
+
+    def _scan(self, bucket, recursive=True, prefix=None):
+        """
+        :return: iterator of (object name, os.DirEntry) of the files in a bucket.
+        """
+        bucket_dir = self._path(bucket)
+        if not os.path.isdir(bucket_dir):
+            return
+
+        stack = [""]
+        while stack:
+            relative = stack.pop()
+            with os.scandir(os.path.join(bucket_dir, relative)) as it:
+                entries = sorted(it, key=lambda entry: entry.name)
+            sub_dirs = []
+            for entry in entries:
+                name = f"{relative}{entry.name}"
+                if entry.name.startswith(".tmp-"):
+                    continue
+                if entry.is_dir(follow_symlinks=False):
+                    # prefix 와 겹치지 않는 디렉터리는 내려가지 않는다
+                    if recursive and (not prefix or f"{name}/".startswith(prefix) or prefix.startswith(f"{name}/")):
+                        sub_dirs.append(f"{name}/")
+                elif not prefix or name.startswith(prefix):
+                    yield name, entry
+            stack.extend(reversed(sub_dirs))
+
+    def list_files_in_bucket(self, bucket, recursive=True, prefix=None):
+        return [name for name, _ in self._scan(bucket, recursive=recursive, prefix=prefix)]
+
+    def list_file_etags(self, bucket, recursive=True, prefix=None):
+        # ETag 대신 수정 시각과 크기로 내용 변경을 판단한다 (파일을 읽지 않음)
+        etags = {}
+        for name, entry in self._scan(bucket, recursive=recursive, prefix=prefix):
+            etags[name] = _etag(entry.stat())
+        return etags
+
+    def load_base_images_list(self, bucket, prefixes):
+        """
+        주어진 prefix 리스트에 따라 이미지를 분류하여 로드합니다.
+
+        Args:
+            prefixes (list[str]): 파일명 prefix 리스트 예: ["f_", "m_", "mean_f_", "mean_m_"]
+
+        Returns:
+            dict[str, list]: prefix별 이미지 리스트 딕셔너리
+        """
+        result = {}
+
+        for i, prefix in enumerate(prefixes):
+            files = [
+                file for file in self.list_files_in_bucket(bucket, prefix=prefix)
+                if not any(file.startswith(p) for p in prefixes[:i])  # 하나의 prefix에만 해당된다고 가정
+            ]
+            result[prefix] = self.load_images(bucket, files)
+
+        return result
+
+    def delete_all_objects_batch(self, bucket, recursive=True):
+        """
+        Deletes all files in the bucket directory (sub directories too when recursive).
+        """
+        names = self.list_files_in_bucket(bucket, recursive=recursive)
+
+        if not names:
+            logging.info("ℹ️ The bucket is already empty.")
+            return
+
+        logging.info(f"Deleting {len(names)} objects...")
+        for name in names:
+            try:
+                os.unlink(self._path(bucket, name))
+            except OSError as err:
+                logging.info(f"❌ Failed to delete: {name} ({err})")
+
+        logging.info("✅ All objects deleted successfully (batch mode).")
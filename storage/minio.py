@@ -1,9 +1,17 @@
+import os
+import time
 import logging
+import certifi
+import urllib3
+from concurrent.futures import ThreadPoolExecutor
 from minio import Minio
 from minio.error import S3Error
-from datetime import timedelta
+from datetime import datetime, timedelta, timezone
 from storage.storage_interface import StorageInterface
+from storage.url_cache import PresignedUrlCache
 from library.gadget import to_np_image, to_image_bytes
+from library.image_codec import BufferReader, ImageCodec, DEFAULT_CODEC
+from library.image_derivatives import encode_derivatives
 from minio.deleteobjects import DeleteObject
 
 # Qdrant implementation of the database interface
@@ -14,21 +22,84 @@ class MinIO(StorageInterface):
             endpoint=None,
             access_key=None,
             secret_key=None,
-            secure=False
+            secure=False,
+            max_connections=10,
+            fetch_workers=8,
+            region=None,
+            url_expiry_seconds=86400,
+            url_cache_size=10000,
+            url_min_remaining_seconds=3600,
+            derivatives=None,
+            derivative_format="webp",
+            derivative_quality=80,
+            codec: ImageCodec = None
         ):
+        """
+        :param region: Region of the buckets. Without it MinIO asks the server for it before the first signature.
+        :param url_expiry_seconds: Lifetime of the presigned URLs.
+        :param url_cache_size: Presigned URLs kept for reuse (0: sign every time).
+        :param url_min_remaining_seconds: A cached URL is reused only while it stays valid at least this long.
+        :param derivatives: Downscaled copies written with every uploaded image, {name: longest side}.
+        :param derivative_format: webp / jpg.
+        :param derivative_quality: Encoding quality of the derivatives (0-100).
+        :param codec: JPEG encoder/decoder of upload_image / load_image (default: DEFAULT_CODEC).
+        """
+        self.codec = codec or DEFAULT_CODEC
+        self.derivatives = derivatives or {}
+        self.derivative_format = derivative_format
+        self.derivative_quality = derivative_quality
+        self.fetch_workers = fetch_workers
+        self.url_expiry = timedelta(seconds=url_expiry_seconds)
+        self.url_cache = PresignedUrlCache(
+            max_size=url_cache_size,
+            min_remaining_seconds=min(url_min_remaining_seconds, url_expiry_seconds / 2)
+        )
+
+        # 동시 다운로드 수에 맞춰 커넥션 풀 크기를 정한다 (나머지는 MinIO 기본값과 동일)
+        timeout = timedelta(minutes=5).seconds
+        http_client = urllib3.PoolManager(
+            timeout=urllib3.Timeout(connect=timeout, read=timeout),
+            maxsize=max(max_connections, fetch_workers),
+            cert_reqs='CERT_REQUIRED',
+            ca_certs=os.environ.get('SSL_CERT_FILE') or certifi.where(),
+            retries=urllib3.Retry(
+                total=5,
+                backoff_factor=0.2,
+                status_forcelist=[500, 502, 503, 504]
+            )
+        )
+
         self.client = Minio(
             endpoint=endpoint,
             access_key=access_key,
             secret_key=secret_key,
-            secure=secure
+            secure=secure,
+            region=region or None,
+            http_client=http_client
         )
 
     # upload_to_s3
+    def upload_image(self, bucket, file_name, image):
+        """
+        Upload the image as JPEG, and its derivatives (e.g. thumb/<name>.webp) from the same array.
+        A failed derivative is only logged: the original is stored and the UI falls back to it.
+        """
+        self._put_image(bucket, file_name, image=image)
+
+        if not self.derivatives:
+            return
+        try:
+            for key, data, content_type in encode_derivatives(
+                    file_name, image, self.derivatives, self.derivative_format, self.derivative_quality):
+                self.client.put_object(bucket, key, BufferReader(data), length=len(data), content_type=content_type)
+        except Exception as e:
+            logging.warning(f"Failed to upload the derivatives of {file_name} : {e}")
+
     @to_image_bytes
-    def upload_image(self, bucket, file_name, image_bytes, length):
+    def _put_image(self, bucket, file_name, image_bytes, length):
         """
-        The real 'upload_image' logic expects the image as bytes, plus the length.
-        Thanks to the decorator, you can simply call upload_image(..., image=your_np_array)
+        The real upload logic expects the image as bytes, plus the length.
+        Thanks to the decorator, you can simply call _put_image(..., image=your_np_array)
         and get these two parameters auto-injected.
         """
         self.client.put_object(
@@ -41,25 +112,79 @@ class MinIO(StorageInterface):
 
     # get_presigned_url
     def get_file_url(self, bucket, file_name):
-        url = self.client.presigned_get_object(bucket, file_name, 
-                                        expires=timedelta(days=1))
-        return url
+        return self.get_file_urls(bucket, [file_name])[0]
+
+    def get_file_urls(self, bucket, file_names):
+        """
+        Presigned URLs of several objects. Cached URLs are reused; the others are
+        signed with one request date and cached.
+
+        :return: list of URLs in the same order as file_names.
+        """
+        urls = self.url_cache.get_many(bucket, file_names)
+        missing = [i for i, url in enumerate(urls) if url is None]
+        if not missing:
+            return urls
+
+        request_date = datetime.now(timezone.utc)
+        expires_at = time.time() + self.url_expiry.total_seconds()
+        for i in missing:
+            urls[i] = self.client.presigned_get_object(
+                bucket, file_names[i], expires=self.url_expiry, request_date=request_date
+            )
+            self.url_cache.put(bucket, file_names[i], urls[i], expires_at)
+        return urls
 
     # Load base images from MinIO(or S3)
     @to_np_image
     def load_image(self, bucket, file_name):
         return self.client.get_object(bucket, file_name)
 
-    def list_files_in_bucket(self, bucket, recursive=True):
+    def load_file(self, bucket, file_name):
+        """
+        :return: (encoded bytes, ETag) of the object, read in one GET.
+        """
+        response = self.client.get_object(bucket, file_name)
+        try:
+            return response.read(), response.headers.get("ETag", "").strip('"')
+        finally:
+            response.close()
+            response.release_conn()
+
+    def get_file_etag(self, bucket, file_name):
+        return self.client.stat_object(bucket, file_name).etag
+
+    def load_images(self, bucket, file_names):
+        """
+        Download and decode several images concurrently.
+
+        :return: list of images in the same order as file_names.
+        """
+        if len(file_names) <= 1:
+            return [self.load_image(bucket, file_name) for file_name in file_names]
+
+        with ThreadPoolExecutor(max_workers=min(self.fetch_workers, len(file_names))) as executor:
+            return list(executor.map(lambda file_name: self.load_image(bucket, file_name), file_names))
+
+    def list_files_in_bucket(self, bucket, recursive=True, prefix=None):
         # bucket 내 파일 목록 조회 (recursive=True 로 모든 객체 검색)
         try:
-            objects = self.client.list_objects(bucket, recursive=recursive)
+            objects = self.client.list_objects(bucket, prefix=prefix, recursive=recursive)
             file_list = [obj.object_name for obj in objects]
             return file_list
         except S3Error as err:
             logging.error(f"Error occurred: {err}")
             return []
 
+    def list_file_etags(self, bucket, recursive=True, prefix=None):
+        # 파일명과 ETag (내용 해시) 조회
+        try:
+            objects = self.client.list_objects(bucket, prefix=prefix, recursive=recursive)
+            return {obj.object_name: obj.etag for obj in objects}
+        except S3Error as err:
+            logging.error(f"Error occurred: {err}")
+            return {}
+
     def load_base_images_list(self, bucket, prefixes):
         """
         주어진 prefix 리스트에 따라 이미지를 분류하여 로드합니다.
@@ -70,16 +195,16 @@ class MinIO(StorageInterface):
         Returns:
             dict[str, list]: prefix별 이미지 리스트 딕셔너리
         """
-        files = self.list_files_in_bucket(bucket)
+        result = {}
 
-        result = {prefix: [] for prefix in prefixes}
+        for i, prefix in enumerate(prefixes):
+            # prefix 별로 서버에서 필터링하여 필요한 객체만 조회한다
+            files = [
+                file for file in self.list_files_in_bucket(bucket, prefix=prefix)
+                if not any(file.startswith(p) for p in prefixes[:i])  # 하나의 prefix에만 해당된다고 가정
+            ]
+            result[prefix] = self.load_images(bucket, files)
 
-        for file in files:
-            img = self.load_image(bucket, file)
-            for prefix in prefixes:
-                if file.startswith(prefix):
-                    result[prefix].append(img)
-                    break  # 하나의 prefix에만 해당된다고 가정
         return result
 
     def delete_all_objects_batch(self, bucket, recursive=True):
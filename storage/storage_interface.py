@@ -1,5 +1,5 @@
 from abc import ABC, abstractmethod
-from typing import List, Dict
+from typing import List, Dict, Tuple
 import numpy as np
 
 class StorageInterface(ABC):
@@ -18,6 +18,13 @@ class StorageInterface(ABC):
         """
         pass
 
+    @abstractmethod
+    def get_file_urls(self, bucket: str, file_names: List[str]) -> List[str]:
+        """
+        여러 S3 객체의 presigned URL 을 입력 순서대로 반환합니다. (캐시된 URL 재사용)
+        """
+        pass
+
     @abstractmethod
     def load_image(self, bucket: str, file_name: str) -> np.ndarray:
         """
@@ -26,12 +33,40 @@ class StorageInterface(ABC):
         pass
 
     @abstractmethod
-    def list_files_in_bucket(self, bucket: str, recursive: bool = True) -> List[str]:
+    def load_file(self, bucket: str, file_name: str) -> Tuple[bytes, str]:
+        """
+        S3 객체를 디코딩하지 않고 (내용 bytes, ETag) 로 반환합니다.
+        """
+        pass
+
+    @abstractmethod
+    def get_file_etag(self, bucket: str, file_name: str) -> str:
+        """
+        내용을 읽지 않고 S3 객체의 ETag 를 반환합니다.
+        """
+        pass
+
+    @abstractmethod
+    def load_images(self, bucket: str, file_names: List[str]) -> List[np.ndarray]:
+        """
+        여러 이미지 파일을 동시에 읽어 입력 순서대로 NumPy 배열 리스트로 반환합니다.
+        """
+        pass
+
+    @abstractmethod
+    def list_files_in_bucket(self, bucket: str, recursive: bool = True, prefix: str = None) -> List[str]:
         """
         버킷 내의 파일 목록을 문자열 리스트로 반환합니다.
         """
         pass
 
+    @abstractmethod
+    def list_file_etags(self, bucket: str, recursive: bool = True, prefix: str = None) -> Dict[str, str]:
+        """
+        버킷 내의 파일 이름과 ETag 를 딕셔너리로 반환합니다.
+        """
+        pass
+
     @abstractmethod
     def load_base_images_list(self, bucket: str, prefixes: List) -> Dict[str, List[np.ndarray]]:
         """
@@ -0,0 +1,60 @@
+import time
+import threading
+from collections import OrderedDict
+from typing import List, Optional, Tuple
+
+class PresignedUrlCache:
+    """
+    LRU cache of presigned URLs keyed by (bucket, object name).
+
+    A URL is handed out again as long as it stays valid for at least
+    `min_remaining_seconds`, so a page rendered from the cache never links
+    to an image that expires while it is being viewed.
+    """
+    def __init__(self, max_size: int = 10000, min_remaining_seconds: float = 3600):
+        """
+        :param max_size: Maximum number of URLs kept (0: no caching).
+        :param min_remaining_seconds: A cached URL expiring sooner than this is signed again.
+        """
+        self.max_size = max_size
+        self.min_remaining_seconds = min_remaining_seconds
+        self._urls: "OrderedDict[Tuple[str, str], Tuple[str, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get_many(self, bucket: str, file_names: List[str]) -> List[Optional[str]]:
+        """
+        :return: The cached URL of every file name, None where it is missing or close to expiry.
+        """
+        deadline = time.time() + self.min_remaining_seconds
+        urls = []
+        with self._lock:
+            for file_name in file_names:
+                key = (bucket, file_name)
+                entry = self._urls.get(key)
+                if entry is not None and entry[1] > deadline:
+                    self._urls.move_to_end(key)
+                    urls.append(entry[0])
+                    self.hits += 1
+                else:
+                    urls.append(None)
+                    self.misses += 1
+        return urls
+
+    def put(self, bucket: str, file_name: str, url: str, expires_at: float):
+        """
+        :param expires_at: Unix time at which the URL stops being valid.
+        """
+        if self.max_size <= 0:
+            return
+        key = (bucket, file_name)
+        with self._lock:
+            self._urls[key] = (url, expires_at)
+            self._urls.move_to_end(key)
+            while len(self._urls) > self.max_size:
+                self._urls.popitem(last=False)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"size": len(self._urls), "hits": self.hits, "misses": self.misses}
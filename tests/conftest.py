@@ -0,0 +1,5 @@
+import os
+import sys
+
+# 저장소 루트의 패키지 (database, library, storage ...) 를 import 할 수 있게 한다
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,131 @@
+import numpy as np
+import pytest
+from database.ann import IVFIndex, kmeans, nearest_centroids, recall_at_k
+
+DIM = 32
+
+def unit_rows(n, seed=0):
+    vectors = np.random.default_rng(seed).normal(size=(n, DIM)).astype(np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+def trained_index(vectors, nlist=8, pq_m=0, **params):
+    index = IVFIndex(dim=DIM, nlist=nlist, nprobe=nlist, pq_m=pq_m, **params)
+    index.train(vectors)
+    index.add(np.arange(len(vectors)), vectors)
+    return index
+
+def exact_top_k(vectors, query, k):
+    scores = vectors @ query
+    rows = np.argsort(-scores, kind="stable")[:k]
+    return rows, scores[rows]
+
+def test_kmeans_separates_clusters():
+    rng = np.random.default_rng(1)
+    centers = np.eye(DIM, dtype=np.float32)[:4]
+    x = np.repeat(centers, 50, axis=0) + rng.normal(scale=0.01, size=(200, DIM)).astype(np.float32)
+    centroids = kmeans(x, 4, spherical=True)
+    np.testing.assert_allclose(np.linalg.norm(centroids, axis=1), 1, rtol=1e-5)
+    assign = nearest_centroids(x, centroids, spherical=True)
+    # 같은 중심에서 나온 점은 같은 list 에, 다른 중심은 다른 list 에
+    groups = assign.reshape(4, 50)
+    assert (groups == groups[:, :1]).all() and len(set(groups[:, 0])) == 4
+
+def test_full_probe_matches_exact_search():
+    vectors = unit_rows(400)
+    index = trained_index(vectors)
+    assert index.trained and index.count == 400
+    for row in range(0, 400, 37):
+        rows, scores = index.search(vectors[row], 10, vectors)
+        expected_rows, expected_scores = exact_top_k(vectors, vectors[row], 10)
+        np.testing.assert_array_equal(rows, expected_rows)
+        np.testing.assert_allclose(scores, expected_scores, rtol=1e-5)
+    assert recall_at_k(index, vectors, k=10, num_queries=50) == 1.0
+
+def test_fewer_probes_only_scan_their_lists():
+    vectors = unit_rows(400)
+    index = trained_index(vectors)
+    rows, _ = index.search(vectors[0], 400, vectors, nprobe=1)
+    own_list = nearest_centroids(vectors[:1], index.centroids, spherical=True)[0]
+    assert set(rows.tolist()) == set(np.flatnonzero(index._assign[:400] == own_list).tolist())
+
+def test_range_search_with_full_probe():
+    vectors = unit_rows(300)
+    index = trained_index(vectors)
+    query = vectors[5]
+    scores = vectors @ query
+    min_score = float(np.sort(scores)[-20])
+    rows, found = index.range_search(query, min_score, vectors)
+    assert set(rows.tolist()) == set(np.flatnonzero(scores >= min_score).tolist())
+    assert (np.diff(found) <= 0).all() and rows[0] == 5
+
+def test_add_moves_a_reassigned_row():
+    vectors = unit_rows(200)
+    index = trained_index(vectors)
+    old_list = index._assign[7]
+    moved = vectors.copy()
+    moved[7] = -vectors[7]
+    index.add(np.array([7]), moved[7:8])
+    assert index._assign[7] != old_list and index.count == 200
+
+    # 이전 list 에 남은 항목은 검색 결과에 나오지 않는다
+    rows, _ = index.search(vectors[7], 200, moved)
+    assert np.count_nonzero(rows == 7) == 1
+    rows, _ = index.search(moved[7], 1, moved)
+    assert rows.tolist() == [7]
+
+def test_search_with_fewer_rows_than_k():
+    vectors = unit_rows(100)
+    index = trained_index(vectors[:40], nlist=4)
+    rows, scores = index.search(vectors[0], 50, vectors)
+    assert len(rows) == len(scores) == 40
+
+def test_pq_reranks_on_full_vectors():
+    vectors = unit_rows(600)
+    index = trained_index(vectors, pq_m=8, rerank=50)
+    assert index.codebooks.shape == (8, 256, DIM // 8)
+    # 후보가 충분히 많이 재채점되면 top-k 는 exact 와 같다
+    assert recall_at_k(index, vectors, k=5, num_queries=30) == 1.0
+    _, scores = index.search(vectors[3], 5, vectors)
+    np.testing.assert_allclose(scores, exact_top_k(vectors, vectors[3], 5)[1], rtol=1e-5)
+
+def test_pq_m_must_divide_dim():
+    with pytest.raises(ValueError):
+        IVFIndex(dim=DIM, pq_m=5)
+
+@pytest.mark.parametrize("pq_m", [0, 4])
+def test_save_load_round_trip(tmp_path, pq_m):
+    vectors = unit_rows(300)
+    index = trained_index(vectors, pq_m=pq_m)
+    index.nprobe = 3
+    path = str(tmp_path / "index.npz")
+    index.save(path, saved_at=1234.5)
+    assert index.saved_at == 1234.5
+    assert [p.name for p in tmp_path.iterdir()] == ["index.npz"]
+
+    loaded = IVFIndex.load(path)
+    assert (loaded.nlist, loaded.nprobe, loaded.pq_m, loaded.count, loaded.saved_at) == (8, 3, pq_m, 300, 1234.5)
+    np.testing.assert_array_equal(loaded.centroids, index.centroids)
+    np.testing.assert_array_equal(loaded._assign[:300], index._assign[:300])
+    if pq_m:
+        np.testing.assert_array_equal(loaded._codes[:300], index._codes[:300])
+    for list_id in range(8):
+        np.testing.assert_array_equal(np.sort(loaded._lists[list_id]), np.flatnonzero(index._assign[:300] == list_id))
+    for row in (0, 99, 250):
+        np.testing.assert_array_equal(loaded.search(vectors[row], 10, vectors)[0], index.search(vectors[row], 10, vectors)[0])
+
+    assert IVFIndex.load(path, nprobe=8).nprobe == 8
+
+def test_save_defaults_saved_at_to_now(tmp_path):
+    import time
+
+    index = trained_index(unit_rows(100), nlist=4)
+    before = time.time()
+    index.save(str(tmp_path / "index.npz"))
+    assert before <= index.saved_at <= time.time()
+    assert IVFIndex.load(str(tmp_path / "index.npz")).saved_at == index.saved_at
+
+def test_untrained_index_round_trip(tmp_path):
+    index = IVFIndex(dim=DIM, nlist=4)
+    index.save(str(tmp_path / "index.npz"))
+    loaded = IVFIndex.load(str(tmp_path / "index.npz"))
+    assert not loaded.trained and loaded.count == 0 and loaded.train_size == 4 * 39
@@ -0,0 +1,80 @@
+import os
+import logging
+import pytest
+from library.batch_engine import run_batch, BatchReport
+
+# worker 함수는 spawn 된 프로세스에서 이 모듈을 import 해서 찾는다
+
+def square(task):
+    if task < 0:
+        raise ValueError("negative task")
+    return task * task
+
+def skip_odd(tasks):
+    return [task % 2 == 0 for task in tasks]
+
+def crash_once(task):
+    """
+    Kill the worker process on the crashing task the first time it runs (marker file).
+    """
+    number, crash_at, marker = task
+    if number == crash_at and not os.path.exists(marker):
+        open(marker, "w").close()
+        os._exit(1)
+    return True
+
+def always_crash(task):
+    os._exit(1)
+
+def count_start(marker_dir):
+    # 프로세스마다 파일 하나 (pool 이 worker 를 띄운 횟수)
+    open(os.path.join(marker_dir, str(os.getpid())), "w").close()
+
+def test_in_process_run():
+    report = run_batch([1, 2, -1, 0], square, total=4, workers=0)
+    assert (report.processed, report.succeeded, report.skipped, report.failed) == (4, 2, 1, 1)
+    assert "failed: 1" in report.summary()
+
+def test_in_process_chunks():
+    report = run_batch(range(7), skip_odd, total=7, workers=0, chunk_size=3)
+    assert (report.processed, report.succeeded, report.skipped) == (7, 4, 3)
+
+def test_worker_pool():
+    report = run_batch(range(-2, 20), square, total=22, workers=2, queue_size=3)
+    assert (report.processed, report.succeeded, report.skipped, report.failed) == (22, 19, 1, 2)
+    assert report.restarts == 0
+
+def test_dead_worker_fails_its_in_flight_tasks_and_the_pool_restarts(tmp_path, caplog):
+    marker = str(tmp_path / "crashed")
+    starts = tmp_path / "starts"
+    starts.mkdir()
+    tasks = [(i, 5, marker) for i in range(30)]
+
+    with caplog.at_level(logging.WARNING, logger="library.batch_engine"):
+        report = run_batch(tasks, crash_once, total=30, workers=2, queue_size=4,
+                           initializer=count_start, initargs=(str(starts),), max_pool_restarts=3)
+
+    assert isinstance(report, BatchReport)
+    assert os.path.exists(marker)
+    assert report.processed == 30 and report.succeeded + report.failed == 30
+    # 죽은 worker 의 작업과 같은 pool 에 있던 작업만 실패한다 (최대 queue_size 개)
+    assert 1 <= report.failed <= 4
+    assert report.restarts == 1
+    assert sum("restarting the pool (1/3)" in r.getMessage() for r in caplog.records) == 1
+    # 다시 만든 pool 의 worker 도 initializer 를 실행한다
+    assert len(os.listdir(starts)) > 2
+    assert "worker pool restarts: 1" in report.summary()
+
+def test_restarts_are_bounded(caplog):
+    with caplog.at_level(logging.WARNING, logger="library.batch_engine"):
+        report = run_batch(range(12), always_crash, total=12, workers=2, queue_size=2, max_pool_restarts=2)
+
+    assert (report.processed, report.failed, report.succeeded) == (12, 12, 0)
+    assert report.restarts == 2
+    assert sum("restarting the pool" in r.getMessage() for r in caplog.records) == 2
+    assert any("broke 3 times" in r.getMessage() for r in caplog.records)
+
+def test_no_restart_counts_the_whole_chunk(tmp_path):
+    tasks = [(i, 0, str(tmp_path / "crashed")) for i in range(10)]
+    report = run_batch(tasks, always_crash, total=10, workers=1, chunk_size=4, max_pool_restarts=0)
+    assert (report.processed, report.failed, report.restarts) == (10, 10, 0)
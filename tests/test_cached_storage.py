@@ -0,0 +1,231 @@
+import os
+import numpy as np
+import pytest
+
+pytest.importorskip("insightface")  # library.gadget (to_image_bytes) of LocalStorage
+
+import storage.cached as cached
+from storage.cached import CachedStorage
+from storage.local import LocalStorage
+
+BUCKET = "images"
+
+def image(value, shape=(32, 32, 3)):
+    return np.full(shape, value, dtype=np.uint8)
+
+def close_to(loaded, value):
+    return loaded is not None and np.abs(loaded.astype(int) - value).max() <= 2
+
+class CountingStorage(LocalStorage):
+    """
+    LocalStorage that counts the calls the cache makes on a miss / revalidation.
+    """
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.calls = {"load_image": 0, "load_file": 0, "get_file_etag": 0}
+
+    def load_image(self, bucket, file_name):
+        self.calls["load_image"] += 1
+        return super().load_image(bucket, file_name)
+
+    def load_file(self, bucket, file_name):
+        self.calls["load_file"] += 1
+        return super().load_file(bucket, file_name)
+
+    def get_file_etag(self, bucket, file_name):
+        self.calls["get_file_etag"] += 1
+        return super().get_file_etag(bucket, file_name)
+
+@pytest.fixture
+def local(tmp_path):
+    return CountingStorage(root=str(tmp_path / "objects"))
+
+def cache_files(cache_dir):
+    return sorted(
+        name for _, _, names in os.walk(cache_dir) for name in names if not name.startswith(".tmp-")
+    )
+
+def replace_behind_the_cache(local, file_name, value):
+    """
+    Change an object without going through the cache (another process / node).
+    """
+    path = os.path.join(local.root, BUCKET, file_name)
+    stat = os.stat(path)
+    local.upload_image(BUCKET, file_name, image=image(value))
+    # 같은 크기로 같은 나노초에 쓰여도 ETag 가 바뀌게 한다
+    os.utime(path, ns=(stat.st_mtime_ns + 1_000_000, stat.st_mtime_ns + 1_000_000))
+
+def test_memory_hit_returns_copies(local):
+    local.upload_image(BUCKET, "a.jpg", image=image(100))
+    cache = CachedStorage(local, revalidate_seconds=3600)
+
+    first = cache.load_image(BUCKET, "a.jpg")
+    first[:] = 0
+    second = cache.load_image(BUCKET, "a.jpg")
+    assert close_to(second, 100)
+
+    stats = cache.stats()
+    assert (stats["misses"], stats["memory_hits"], stats["revalidations"]) == (1, 1, 0)
+    assert stats["memory_images"] == 1 and stats["memory_bytes"] == second.nbytes
+    assert stats["hit_rate"] == 0.5
+
+def test_miss_without_disk_tier_uses_the_storage_load_image(local):
+    local.upload_image(BUCKET, "a.jpg", image=image(100))
+    cache = CachedStorage(local, cache_dir=None, revalidate_seconds=3600)
+
+    assert close_to(cache.load_image(BUCKET, "a.jpg"), 100)
+    # mmap 으로 디코딩하는 LocalStorage.load_image 를 쓰고, 파일 내용을 bytes 로 읽지 않는다
+    assert local.calls == {"load_image": 1, "load_file": 0, "get_file_etag": 1}
+    assert cache._images[(BUCKET, "a.jpg")][1] == local.get_file_etag(BUCKET, "a.jpg")
+
+    assert close_to(cache.load_image(BUCKET, "a.jpg"), 100)
+    assert local.calls["load_image"] == 1
+
+def test_no_memory_tier(local):
+    local.upload_image(BUCKET, "a.jpg", image=image(100))
+    cache = CachedStorage(local, memory_bytes=0)
+    for _ in range(2):
+        assert close_to(cache.load_image(BUCKET, "a.jpg"), 100)
+    assert local.calls["load_image"] == 2 and cache.stats()["memory_images"] == 0
+
+def test_revalidation_after_revalidate_seconds(local, monkeypatch):
+    local.upload_image(BUCKET, "a.jpg", image=image(100))
+    cache = CachedStorage(local, revalidate_seconds=60)
+    now = [1000.0]
+    monkeypatch.setattr(cached.time, "time", lambda: now[0])
+
+    assert close_to(cache.load_image(BUCKET, "a.jpg"), 100)
+    etag_reads = local.calls["get_file_etag"]
+
+    # 재검증 전에는 바뀐 객체를 보지 못한다 (ETag 요청도 하지 않는다)
+    replace_behind_the_cache(local, "a.jpg", 200)
+    now[0] += 59
+    assert close_to(cache.load_image(BUCKET, "a.jpg"), 100)
+    assert local.calls["get_file_etag"] == etag_reads
+
+    # revalidate_seconds 가 지나면 ETag 를 확인하고 다시 읽는다
+    now[0] += 1
+    assert close_to(cache.load_image(BUCKET, "a.jpg"), 200)
+    assert cache.stats()["revalidations"] == 1
+    assert local.calls["load_image"] == 2
+
+def test_unchanged_etag_renews_the_entry(local, monkeypatch):
+    local.upload_image(BUCKET, "a.jpg", image=image(100))
+    cache = CachedStorage(local, revalidate_seconds=60)
+    now = [1000.0]
+    monkeypatch.setattr(cached.time, "time", lambda: now[0])
+
+    cache.load_image(BUCKET, "a.jpg")
+    now[0] += 61
+    assert close_to(cache.load_image(BUCKET, "a.jpg"), 100)
+    now[0] += 59
+    cache.load_image(BUCKET, "a.jpg")
+
+    stats = cache.stats()
+    # 한 번만 재검증하고 (다운로드 없이) 다시 60초 동안 믿는다
+    assert (stats["revalidations"], stats["memory_hits"], stats["misses"]) == (1, 2, 1)
+    assert local.calls["load_image"] == 1
+
+def test_memory_eviction_by_bytes(local):
+    size = image(0).nbytes
+    for i in range(4):
+        local.upload_image(BUCKET, f"{i}.jpg", image=image(50 * i))
+    cache = CachedStorage(local, memory_bytes=2 * size, revalidate_seconds=3600)
+
+    cache.load_image(BUCKET, "0.jpg")
+    cache.load_image(BUCKET, "1.jpg")
+    cache.load_image(BUCKET, "0.jpg")      # 0 이 가장 최근
+    cache.load_image(BUCKET, "2.jpg")      # 1 이 밀려난다
+
+    stats = cache.stats()
+    assert stats["memory_bytes"] == 2 * size and stats["memory_images"] == 2
+    assert stats["evictions"] == 1
+    assert set(cache._images) == {(BUCKET, "0.jpg"), (BUCKET, "2.jpg")}
+
+    # 예산보다 큰 이미지는 메모리에 두지 않는다
+    local.upload_image(BUCKET, "big.jpg", image=image(0, shape=(64, 64, 3)))
+    cache.load_image(BUCKET, "big.jpg")
+    assert set(cache._images) == {(BUCKET, "0.jpg"), (BUCKET, "2.jpg")}
+
+def test_disk_tier_survives_a_restart(local, tmp_path):
+    cache_dir = str(tmp_path / "cache")
+    local.upload_image(BUCKET, "a.jpg", image=image(100))
+
+    cache = CachedStorage(local, cache_dir=cache_dir, revalidate_seconds=3600)
+    assert close_to(cache.load_image(BUCKET, "a.jpg"), 100)
+    assert local.calls["load_file"] == 1 and len(cache_files(cache_dir)) == 1
+
+    restarted = CachedStorage(local, cache_dir=cache_dir, revalidate_seconds=3600)
+    assert restarted.stats()["disk_bytes"] == os.path.getsize(os.path.join(local.root, BUCKET, "a.jpg"))
+    assert close_to(restarted.load_image(BUCKET, "a.jpg"), 100)
+    assert restarted.stats()["disk_hits"] == 1 and local.calls["load_file"] == 1
+
+def test_disk_entry_of_a_changed_object_is_replaced(local, tmp_path):
+    cache_dir = str(tmp_path / "cache")
+    local.upload_image(BUCKET, "a.jpg", image=image(100))
+    CachedStorage(local, cache_dir=cache_dir).load_image(BUCKET, "a.jpg")
+    old_files = cache_files(cache_dir)
+
+    replace_behind_the_cache(local, "a.jpg", 200)
+    # revalidate_seconds=0 : 디스크 파일의 ETag 가 달라서 다시 받는다
+    cache = CachedStorage(local, cache_dir=cache_dir, revalidate_seconds=0)
+    assert close_to(cache.load_image(BUCKET, "a.jpg"), 200)
+    assert cache.stats()["misses"] == 1
+
+    new_files = cache_files(cache_dir)
+    assert len(new_files) == 1 and new_files != old_files
+    # 캐시 파일 이름은 <sha1>.<ETag>
+    assert new_files[0].endswith("." + local.get_file_etag(BUCKET, "a.jpg"))
+
+def test_disk_eviction_by_bytes(local, tmp_path):
+    cache_dir = str(tmp_path / "cache")
+    rng = np.random.default_rng(0)
+    for i in range(6):
+        # 노이즈 이미지는 JPEG 으로도 크다
+        local.upload_image(BUCKET, f"{i}.jpg", image=rng.integers(0, 255, size=(64, 64, 3), dtype=np.uint8))
+    sizes = [os.path.getsize(os.path.join(local.root, BUCKET, f"{i}.jpg")) for i in range(6)]
+    budget = int(max(sizes) * 3.5)
+
+    cache = CachedStorage(local, cache_dir=cache_dir, disk_bytes=budget, memory_bytes=0)
+    for i in range(6):
+        cache.load_image(BUCKET, f"{i}.jpg")
+        assert cache.stats()["disk_bytes"] <= budget
+
+    on_disk = sum(os.path.getsize(os.path.join(d, n)) for d, _, names in os.walk(cache_dir) for n in names)
+    assert on_disk == cache.stats()["disk_bytes"] <= budget
+    assert 1 <= len(cache_files(cache_dir)) < 6
+
+def test_upload_invalidates_memory_disk_and_derivatives(tmp_path):
+    local = CountingStorage(root=str(tmp_path / "objects"), derivatives={"thumb": 8}, derivative_format="jpg")
+    cache_dir = str(tmp_path / "cache")
+    cache = CachedStorage(local, cache_dir=cache_dir, revalidate_seconds=3600)
+
+    cache.upload_image(BUCKET, "a.jpg", image=image(100))
+    assert close_to(cache.load_image(BUCKET, "a.jpg"), 100)
+    assert close_to(cache.load_image(BUCKET, "thumb/a.jpg"), 100)
+    assert len(cache_files(cache_dir)) == 2
+
+    cache.upload_image(BUCKET, "a.jpg", image=image(200))
+    assert cache_files(cache_dir) == [] and cache.stats()["disk_bytes"] == 0
+    assert cache._images == {}
+    assert close_to(cache.load_image(BUCKET, "a.jpg"), 200)
+    assert close_to(cache.load_image(BUCKET, "thumb/a.jpg"), 200)
+
+def test_delete_invalidates(local, tmp_path):
+    cache_dir = str(tmp_path / "cache")
+    cache = CachedStorage(local, cache_dir=cache_dir, revalidate_seconds=3600)
+    cache.upload_image(BUCKET, "a.jpg", image=image(100))
+    cache.load_image(BUCKET, "a.jpg")
+
+    cache.delete_all_objects_batch(BUCKET)
+    assert cache._images == {} and cache_files(cache_dir) == []
+    with pytest.raises(FileNotFoundError):
+        cache.load_image(BUCKET, "a.jpg")
+
+def test_passes_other_calls_through(local):
+    cache = CachedStorage(local)
+    cache.upload_image(BUCKET, "f_1.jpg", image=image(10))
+    assert cache.get_file_url(BUCKET, "f_1.jpg") == local.get_file_url(BUCKET, "f_1.jpg")
+    assert cache.list_file_etags(BUCKET) == local.list_file_etags(BUCKET)
+    assert cache.codec is local.codec and cache.root == local.root
+    assert [len(v) for v in cache.load_base_images_list(BUCKET, ["f_", "m_"]).values()] == [1, 0]
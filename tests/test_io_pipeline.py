@@ -0,0 +1,106 @@
+import threading
+import pytest
+from library.io_pipeline import IOPipeline, PipelineHandle
+
+TIMEOUT = 5
+
+class UploadError(Exception):
+    pass
+
+@pytest.fixture
+def pipeline():
+    pipeline = IOPipeline(max_workers=2, max_pending=4)
+    yield pipeline
+    pipeline.shutdown()
+
+def test_db_write_runs_after_the_uploads(pipeline):
+    events = []
+    lock = threading.Lock()
+
+    def upload(name, gate=None):
+        if gate is not None:
+            assert gate.wait(TIMEOUT)
+        with lock:
+            events.append(name)
+
+    gate = threading.Event()
+    handle = PipelineHandle(result="original.jpg")
+    uploads = [handle.add(pipeline.submit(upload, "face.jpg", gate)), handle.add(pipeline.submit(upload, "original.jpg"))]
+    handle.add(pipeline.submit_after(uploads, lambda rows: events.append(rows) or len(rows), ["row"]))
+
+    assert not handle.done()
+    gate.set()
+    assert handle.wait(TIMEOUT) == "original.jpg"
+    assert events[-1] == ["row"] and set(events[:2]) == {"face.jpg", "original.jpg"}
+    assert handle.futures[-1].result() == 1
+
+def test_failed_upload_skips_the_db_write(pipeline):
+    writes = []
+
+    def failing_upload():
+        raise UploadError("bucket is gone")
+
+    handle = PipelineHandle(result="original.jpg")
+    uploads = [handle.add(pipeline.submit(lambda: None)), handle.add(pipeline.submit(failing_upload))]
+    db_write = handle.add(pipeline.submit_after(uploads, writes.append, ["row"]))
+
+    with pytest.raises(UploadError, match="bucket is gone"):
+        handle.wait(TIMEOUT)
+    assert handle.done()
+    assert isinstance(db_write.exception(), UploadError)
+    assert writes == []
+
+def test_no_worker_waits_for_the_dependencies(pipeline):
+    gate = threading.Event()
+    slow_upload = pipeline.submit(gate.wait, 30)
+    try:
+        db_write = pipeline.submit_after([slow_upload], lambda: "written")
+
+        # 두 번째 worker 가 db_write 를 기다리느라 묶여 있으면 이 작업은 시작되지 않는다
+        other = pipeline.submit(lambda: "other")
+        assert other.result(timeout=TIMEOUT) == "other"
+        assert not db_write.done()
+    finally:
+        gate.set()
+    assert db_write.result(timeout=TIMEOUT) == "written"
+
+def test_slots_are_released(pipeline):
+    def fail():
+        raise UploadError()
+
+    def run():
+        # max_pending (4) 보다 많이 제출해도 slot 이 모두 돌아오면 막히지 않는다
+        for _ in range(20):
+            pipeline.submit_after([pipeline.submit(fail)], lambda: None).exception(timeout=TIMEOUT)
+            pipeline.submit_after([pipeline.submit(lambda: None)], lambda: None).result(timeout=TIMEOUT)
+            pipeline.submit_after([], lambda: None).result(timeout=TIMEOUT)
+
+    thread = threading.Thread(target=run, daemon=True)
+    thread.start()
+    thread.join(TIMEOUT)
+    assert not thread.is_alive()
+
+def test_error_of_the_dependent_job(pipeline):
+    def write():
+        raise ValueError("upsert failed")
+
+    handle = PipelineHandle()
+    uploads = [handle.add(pipeline.submit(lambda: None))]
+    handle.add(pipeline.submit_after(uploads, write))
+    with pytest.raises(ValueError, match="upsert failed"):
+        handle.wait(TIMEOUT)
+
+def test_submit_after_shutdown():
+    pipeline = IOPipeline(max_workers=1)
+    pipeline.shutdown()
+    with pytest.raises(RuntimeError):
+        pipeline.submit_after([], lambda: None).result(timeout=TIMEOUT)
+
+def test_wait_timeout(pipeline):
+    gate = threading.Event()
+    handle = PipelineHandle()
+    handle.add(pipeline.submit(gate.wait, TIMEOUT))
+    with pytest.raises(TimeoutError):
+        handle.wait(0.05)
+    gate.set()
+    handle.wait(TIMEOUT)
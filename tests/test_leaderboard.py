@@ -0,0 +1,144 @@
+import json
+import numpy as np
+import pytest
+from library.leaderboard import Leaderboard, ENTRY_FIELDS, unit
+
+def columns_of(ids, **overrides):
+    columns = {
+        "photo_id": np.array([f"photo-{i}" for i in ids], dtype=object),
+        "face_index": np.array([float(i % 3) for i in ids]),
+        "photo_title": np.array([f"title {i}" for i in ids], dtype=object),
+        "file_name": np.array([f"{i}.jpg" for i in ids], dtype=object),
+    }
+    columns.update(overrides)
+    return columns
+
+def offer(board, ids, scores, **overrides):
+    board.offer(np.array([f"id-{i}" for i in ids], dtype=object), np.asarray(scores, dtype=np.float32),
+                columns_of(ids, **overrides))
+
+def test_keeps_the_top_k_in_order():
+    rng = np.random.default_rng(0)
+    scores = rng.uniform(-1, 1, size=100).astype(np.float32)
+    board = Leaderboard(size=10)
+    for start in range(0, 100, 17):
+        offer(board, range(start, min(start + 17, 100)), scores[start:start + 17])
+
+    expected = np.argsort(-scores, kind="stable")[:10]
+    assert board.ids.tolist() == [f"id-{i}" for i in expected]
+    np.testing.assert_array_equal(board.scores, scores[expected])
+    # 항목의 payload 가 ID 와 함께 움직인다
+    assert board.details["photo_id"].tolist() == [f"photo-{i}" for i in expected]
+    assert board.details["file_name"].tolist() == [f"{i}.jpg" for i in expected]
+
+def test_fewer_points_than_size():
+    board = Leaderboard(size=5)
+    offer(board, [1, 2], [0.1, 0.9])
+    offer(board, [], [])
+    assert board.ids.tolist() == ["id-2", "id-1"]
+
+def test_offered_again_replaces_the_entry():
+    board = Leaderboard(size=3)
+    offer(board, [1, 2, 3, 4], [0.9, 0.8, 0.7, 0.6])
+    # id-4 는 이미 밀려났고, 점수가 내려간 id-1 은 한 번만 남는다
+    offer(board, [1], [0.5], photo_title=np.array(["renamed"], dtype=object))
+    assert board.ids.tolist() == ["id-2", "id-3", "id-1"]
+
+    offer(board, [1], [0.95], photo_title=np.array(["renamed"], dtype=object))
+    assert board.ids.tolist() == ["id-1", "id-2", "id-3"]
+    assert board.details["photo_title"][0] == "renamed"
+    np.testing.assert_allclose(board.scores, [0.95, 0.8, 0.7])
+
+def test_duplicate_ids_in_one_offer_keep_the_last():
+    board = Leaderboard(size=5)
+    offer(board, [1, 2, 1, 3], [0.9, 0.5, 0.2, 0.4],
+          photo_title=np.array(["first", "b", "last", "c"], dtype=object))
+    assert board.ids.tolist() == ["id-2", "id-3", "id-1"]
+    np.testing.assert_allclose(board.scores, [0.5, 0.4, 0.2])
+    assert board.details["photo_title"].tolist() == ["b", "c", "last"]
+
+def test_missing_columns_are_none():
+    board = Leaderboard(size=2)
+    board.offer(np.array(["a"], dtype=object), np.array([0.3]), {"photo_id": np.array(["p"], dtype=object)})
+    assert board.details["photo_title"].tolist() == [None]
+    assert board.to_payload()["entries"][0]["photo_title"] is None
+
+def test_payload_round_trip():
+    board = Leaderboard(size=4, drift=0.0125)
+    offer(board, [1, 2, 3], [0.9, 0.8, 0.7],
+          face_index=np.array([2.0, np.nan, 0.0]), photo_title=np.array([np.nan, "b", "c"], dtype=object))
+
+    # payload 는 JSON 으로 저장된다 (numpy 값이 남으면 안 된다)
+    payload = json.loads(json.dumps(board.to_payload()))
+    assert payload["drift"] == 0.0125
+    assert payload["entries"][0] == {
+        "id": "id-1", "score": pytest.approx(0.9), "photo_id": "photo-1", "face_index": 2,
+        "photo_title": None, "file_name": "1.jpg",
+    }
+    assert payload["entries"][1]["face_index"] is None
+    assert type(payload["entries"][2]["face_index"]) is int
+
+    loaded = Leaderboard.from_payload(payload, size=4)
+    assert (loaded.size, loaded.drift) == (4, 0.0125)
+    assert loaded.ids.tolist() == board.ids.tolist()
+    np.testing.assert_array_equal(loaded.scores, board.scores)
+    assert loaded.to_payload() == payload
+
+    # 불러온 board 에 이어서 offer 할 수 있다
+    offer(loaded, [4, 2], [0.85, 0.1])
+    assert loaded.ids.tolist() == ["id-1", "id-4", "id-3", "id-2"]
+
+def test_from_payload_truncates_and_handles_missing():
+    board = Leaderboard(size=5)
+    offer(board, range(5), [0.5, 0.4, 0.3, 0.2, 0.1])
+    loaded = Leaderboard.from_payload(board.to_payload(), size=2)
+    assert loaded.ids.tolist() == ["id-0", "id-1"]
+    assert set(loaded.details) == set(ENTRY_FIELDS)
+
+    assert Leaderboard.from_payload(None) is None
+    assert Leaderboard.from_payload({}) is None
+    assert Leaderboard.from_payload({"drift": 0.1}) is None
+    assert Leaderboard.from_payload({"entries": []}).drift == 0.0
+
+def test_unit():
+    np.testing.assert_allclose(unit([3.0, 4.0]), [0.6, 0.8])
+    assert unit(None) is None and unit(np.zeros(3)) is None
+
+def test_rescore_once_the_drift_bound_is_passed():
+    rng = np.random.default_rng(2)
+    mean = unit(rng.normal(size=64))
+    board = Leaderboard()
+    assert board.move_mean(None, mean, max_drift=0.02)
+    assert board.drift == 0.0
+
+    steps = 0
+    while True:
+        moved = unit(mean + rng.normal(scale=0.002, size=64))
+        step = float(np.linalg.norm(moved - mean))
+        before = board.drift
+        if not board.move_mean(mean, moved, max_drift=0.02):
+            # 경계를 넘는 이동은 거부되고 drift 는 그대로 남는다
+            assert before + step > 0.02
+            assert board.drift == before
+            break
+        assert board.drift == pytest.approx(before + step)
+        assert board.drift <= 0.02
+        mean = moved
+        steps += 1
+    assert steps > 0
+
+def test_drift_bounds_the_score_error():
+    rng = np.random.default_rng(3)
+    points = np.stack([unit(v) for v in rng.normal(size=(200, 32))])
+    start = unit(rng.normal(size=32))
+    board = Leaderboard(size=200)
+    board.offer(np.arange(200).astype(str).astype(object), points @ start, {})
+
+    mean = start
+    for _ in range(5):
+        moved = unit(mean + rng.normal(scale=0.01, size=32))
+        assert board.move_mean(mean, moved, max_drift=1.0)
+        mean = moved
+    # 저장된 점수는 현재 평균에 대한 점수와 drift 이상 차이 나지 않는다
+    rows = board.ids.astype(int)
+    assert np.abs(board.scores - points[rows] @ mean).max() <= board.drift + 1e-6
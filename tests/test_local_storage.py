@@ -0,0 +1,130 @@
+import os
+import numpy as np
+import pytest
+
+pytest.importorskip("insightface")  # library.gadget (to_image_bytes)
+
+from storage.local import LocalStorage
+
+BUCKET = "images"
+
+def image(value, shape=(32, 48, 3)):
+    return np.full(shape, value, dtype=np.uint8)
+
+@pytest.fixture
+def storage(tmp_path):
+    return LocalStorage(root=str(tmp_path / "objects"), url_prefix="/static/")
+
+def files_under(path):
+    return sorted(
+        os.path.relpath(os.path.join(directory, name), path)
+        for directory, _, names in os.walk(path) for name in names
+    )
+
+def test_upload_and_load(storage):
+    storage.upload_image(BUCKET, "a.jpg", image=image(120))
+    loaded = storage.load_image(BUCKET, "a.jpg")
+    assert loaded.shape == (32, 48, 3)
+    assert np.abs(loaded.astype(int) - 120).max() <= 2
+    assert storage.load_images(BUCKET, ["a.jpg", "a.jpg"])[1].shape == (32, 48, 3)
+
+    data, etag = storage.load_file(BUCKET, "a.jpg")
+    assert data[:2] == b"\xff\xd8"
+    assert etag == storage.get_file_etag(BUCKET, "a.jpg") == storage.list_file_etags(BUCKET)["a.jpg"]
+
+def test_empty_or_broken_file_decodes_to_none(storage):
+    bucket_dir = os.path.join(storage.root, BUCKET)
+    os.makedirs(bucket_dir)
+    open(os.path.join(bucket_dir, "empty.jpg"), "wb").close()
+    with open(os.path.join(bucket_dir, "broken.jpg"), "wb") as f:
+        f.write(b"not a jpeg")
+    assert storage.load_image(BUCKET, "empty.jpg") is None
+    assert storage.load_image(BUCKET, "broken.jpg") is None
+    with pytest.raises(FileNotFoundError):
+        storage.load_image(BUCKET, "missing.jpg")
+
+def test_etag_is_mtime_and_size(storage):
+    storage.upload_image(BUCKET, "a.jpg", image=image(10))
+    path = os.path.join(storage.root, BUCKET, "a.jpg")
+    os.utime(path, ns=(1_000_000_000, 1_000_000_000))
+    assert storage.get_file_etag(BUCKET, "a.jpg") == f"{1_000_000_000:x}-{os.path.getsize(path):x}"
+
+    # 크기가 같아도 수정 시각이 바뀌면 ETag 가 바뀐다
+    before = storage.get_file_etag(BUCKET, "a.jpg")
+    os.utime(path, ns=(2_000_000_000, 2_000_000_000))
+    assert storage.get_file_etag(BUCKET, "a.jpg") != before
+
+def test_writes_are_atomic(storage, monkeypatch):
+    storage.upload_image(BUCKET, "a.jpg", image=image(10))
+    original = storage.load_file(BUCKET, "a.jpg")[0]
+    bucket_dir = os.path.join(storage.root, BUCKET)
+    assert files_under(bucket_dir) == ["a.jpg"]
+
+    # rename 전에 실패하면 원래 파일은 그대로이고 임시 파일도 남지 않는다
+    def fail(src, dst):
+        assert os.path.basename(src).startswith(".tmp-") and os.path.getsize(src) > 0
+        raise OSError("disk full")
+
+    monkeypatch.setattr(os, "replace", fail)
+    with pytest.raises(OSError, match="disk full"):
+        storage.upload_image(BUCKET, "a.jpg", image=image(200))
+    monkeypatch.undo()
+
+    assert storage.load_file(BUCKET, "a.jpg")[0] == original
+    assert files_under(bucket_dir) == ["a.jpg"]
+
+def test_temporary_files_are_not_listed(storage):
+    storage.upload_image(BUCKET, "a.jpg", image=image(10))
+    with open(os.path.join(storage.root, BUCKET, ".tmp-abc"), "wb") as f:
+        f.write(b"partial")
+    assert storage.list_files_in_bucket(BUCKET) == ["a.jpg"]
+    assert list(storage.list_file_etags(BUCKET)) == ["a.jpg"]
+
+@pytest.mark.parametrize("bucket, file_name", [
+    (BUCKET, "../other/a.jpg"),
+    (BUCKET, "thumb/../../other/a.jpg"),
+    (BUCKET, "/etc/passwd"),
+    ("..", "a.jpg"),
+    (BUCKET, "../images2/a.jpg"),
+])
+def test_path_traversal_is_refused(storage, bucket, file_name):
+    with pytest.raises(ValueError, match="Invalid object name"):
+        storage.upload_image(bucket, file_name, image=image(10))
+    with pytest.raises(ValueError):
+        storage.load_image(bucket, file_name)
+    with pytest.raises(ValueError):
+        storage.get_file_etag(bucket, file_name)
+    assert files_under(os.path.dirname(storage.root)) == []
+
+def test_nested_names_and_prefixes(storage):
+    for name in ["m_2.jpg", "f_1.jpg", "thumb/f_1.webp", "thumb/deep/x.jpg", "mean_f_0.jpg"]:
+        storage.upload_image(BUCKET, name, image=image(10))
+
+    assert sorted(storage.list_files_in_bucket(BUCKET)) == [
+        "f_1.jpg", "m_2.jpg", "mean_f_0.jpg", "thumb/deep/x.jpg", "thumb/f_1.webp"]
+    assert storage.list_files_in_bucket(BUCKET, recursive=False) == ["f_1.jpg", "m_2.jpg", "mean_f_0.jpg"]
+    assert storage.list_files_in_bucket(BUCKET, prefix="thumb/d") == ["thumb/deep/x.jpg"]
+    assert storage.list_files_in_bucket("missing") == []
+
+    groups = storage.load_base_images_list(BUCKET, ["mean_f_", "f_", "m_"])
+    assert [len(groups[p]) for p in ("mean_f_", "f_", "m_")] == [1, 1, 1]
+
+    storage.delete_all_objects_batch(BUCKET)
+    assert storage.list_files_in_bucket(BUCKET) == []
+
+def test_urls(storage):
+    assert storage.get_file_url(BUCKET, "a b.jpg") == "/static/images/a%20b.jpg"
+    assert storage.get_file_urls(BUCKET, ["thumb/x.webp", "y.jpg"]) == [
+        "/static/images/thumb/x.webp", "/static/images/y.jpg"]
+
+def test_derivatives(tmp_path):
+    storage = LocalStorage(root=str(tmp_path), derivatives={"thumb": 16}, derivative_format="jpg")
+    storage.upload_image(BUCKET, "a.jpg", image=image(90, shape=(64, 128, 3)))
+    assert storage.list_files_in_bucket(BUCKET) == ["a.jpg", "thumb/a.jpg"]
+    assert storage.load_image(BUCKET, "thumb/a.jpg").shape == (8, 16, 3)
+
+def test_failed_derivative_keeps_the_original(tmp_path, caplog):
+    storage = LocalStorage(root=str(tmp_path), derivatives={"thumb": 16}, derivative_format="gif")
+    storage.upload_image(BUCKET, "a.jpg", image=image(90))
+    assert storage.list_files_in_bucket(BUCKET) == ["a.jpg"]
+    assert "Failed to write the derivatives of a.jpg" in caplog.text
@@ -0,0 +1,182 @@
+import numpy as np
+import pytest
+from library.mean_aggregator import MeanAggregator
+
+DIM = 8
+
+def page(n, seed=0):
+    rng = np.random.default_rng(seed)
+    vectors = rng.normal(size=(n, DIM)).astype(np.float32)
+    ages = rng.uniform(10, 80, size=n)
+    ages[::5] = np.nan
+    return vectors, ages
+
+def plain_means(vectors, keys, ages):
+    """
+    Mean per group with a plain loop, skipping None / NaN keys.
+    """
+    groups = {}
+    for vector, key, age in zip(vectors, keys, ages):
+        if key is None or key != key:
+            continue
+        groups.setdefault(key, []).append((vector, age))
+    means = {}
+    for key, members in groups.items():
+        member_ages = [age for _, age in members if not np.isnan(age)]
+        means[key] = (
+            np.mean([vector for vector, _ in members], axis=0, dtype=np.float64),
+            len(members),
+            np.mean(member_ages) if member_ages else None,
+        )
+    return means
+
+def assert_matches(aggregator, expected):
+    assert set(aggregator.sums) == set(expected)
+    for key, (mean, count, mean_age) in expected.items():
+        assert aggregator.count(key) == count
+        np.testing.assert_allclose(aggregator.mean(key), mean, rtol=1e-5, atol=1e-6)
+        if mean_age is None:
+            assert aggregator.mean_age(key) is None
+        else:
+            assert aggregator.mean_age(key) == pytest.approx(mean_age)
+
+def test_segment_sums_match_plain_mean():
+    vectors, ages = page(200)
+    rng = np.random.default_rng(1)
+    keys = rng.choice(["a", "b", "c", "d", None], size=200).tolist()
+    keys[3] = float("nan")
+
+    aggregator = MeanAggregator(dim=DIM)
+    aggregator.fold(vectors, keys, ages=ages)
+    assert_matches(aggregator, plain_means(vectors, keys, ages))
+    assert aggregator.mean("missing") is None and aggregator.count("missing") == 0
+
+def test_pages_add_up():
+    vectors, ages = page(300)
+    keys = np.array(["x", "y", "z"], dtype=object)[np.arange(300) % 3]
+
+    aggregator = MeanAggregator(dim=DIM)
+    for start in range(0, 300, 64):
+        aggregator.fold(vectors[start:start + 64], keys[start:start + 64], ages=ages[start:start + 64])
+    assert_matches(aggregator, plain_means(vectors, keys, ages))
+
+def test_rows_list_a_point_in_several_groupings():
+    vectors, ages = page(50)
+    titles = np.array([f"photo_title={i % 4}" if i % 6 else None for i in range(50)], dtype=object)
+    buckets = np.array([None if np.isnan(a) else f"age_bucket={int(a // 10) * 10}" for a in ages], dtype=object)
+
+    aggregator = MeanAggregator(dim=DIM)
+    aggregator.fold(vectors, np.concatenate((titles, buckets)), ages=ages, rows=np.tile(np.arange(50), 2))
+
+    expected = plain_means(vectors, titles, ages)
+    expected.update(plain_means(vectors, buckets, ages))
+    assert_matches(aggregator, expected)
+
+def test_gender_column_keys_become_int():
+    vectors, ages = page(30)
+    genders = (np.arange(30) % 2).astype(np.float64)
+    genders[7] = np.nan
+
+    aggregator = MeanAggregator(dim=DIM)
+    aggregator.fold(vectors, genders, ages=ages)
+    assert_matches(aggregator, {int(k): v for k, v in plain_means(vectors, genders, ages).items()})
+    assert all(type(k) is int for k in aggregator.sums)
+
+def test_tuple_keys():
+    vectors, ages = page(40)
+    keys = [("gender", i % 2) for i in range(40)]
+    aggregator = MeanAggregator(dim=DIM)
+    aggregator.fold(vectors, keys, ages=ages)
+    assert_matches(aggregator, plain_means(vectors, keys, ages))
+
+def test_without_ages():
+    vectors, _ = page(10)
+    aggregator = MeanAggregator(dim=DIM)
+    aggregator.fold(vectors, ["a"] * 10)
+    assert aggregator.count("a") == 10 and aggregator.mean_age("a") is None
+
+def test_merge_equals_one_fold():
+    vectors, ages = page(120)
+    keys = np.array(["a", "b", "c"], dtype=object)[np.arange(120) % 3]
+
+    first, second = MeanAggregator(dim=DIM), MeanAggregator(dim=DIM)
+    first.fold(vectors[:70], keys[:70], ages=ages[:70])
+    first.cursor = 10.0
+    second.fold(vectors[70:], keys[70:], ages=ages[70:])
+    second.cursor = 20.0
+    first.merge(second)
+
+    assert_matches(first, plain_means(vectors, keys, ages))
+    assert first.cursor == 20.0
+
+def test_seed_then_fold():
+    vectors, ages = page(20)
+    aggregator = MeanAggregator(dim=DIM)
+    aggregator.seed("a", vectors[:10].mean(axis=0), 10, mean_age=np.nanmean(ages[:10]))
+    aggregator.fold(vectors[10:], ["a"] * 10)
+    assert aggregator.count("a") == 20
+    np.testing.assert_allclose(aggregator.mean("a"), vectors.mean(axis=0), rtol=1e-5, atol=1e-6)
+    assert aggregator.mean_age("a") == pytest.approx(np.nanmean(ages[:10]))
+
+def test_fold_after_discard_does_not_double_count():
+    vectors, ages = page(90)
+    keys = np.array(["title=a", "title=b", "age_bucket=20"], dtype=object)[np.arange(90) % 3]
+
+    aggregator = MeanAggregator(dim=DIM)
+    aggregator.fold(vectors, keys, ages=ages)
+    aggregator.fold(vectors[:30], np.full(30, 0.0), ages=ages[:30])
+
+    # photo_title 그룹을 처음부터 다시 더한다 (backfill)
+    aggregator.discard([k for k in aggregator.sums if isinstance(k, str) and k.startswith("title=")])
+    assert set(aggregator.sums) == {"age_bucket=20", 0}
+    aggregator.fold(vectors, np.where(np.char.startswith(keys.astype(str), "title="), keys, None), ages=ages)
+
+    expected = plain_means(vectors, keys, ages)
+    expected[0] = plain_means(vectors[:30], [0] * 30, ages[:30])[0]
+    assert_matches(aggregator, expected)
+    aggregator.discard(["not a group"])
+
+@pytest.mark.parametrize("keys", [
+    ["photo_title=a", "photo_title=b's", "age_bucket=20"],
+    [("photo_title", "a"), ("gender_age_bucket", 1, 20), ("age_bucket", 20)],
+    [0, 1],
+])
+def test_save_load_round_trip(tmp_path, keys):
+    vectors, ages = page(60)
+    page_keys = [keys[i % len(keys)] for i in range(60)]
+    aggregator = MeanAggregator(dim=DIM)
+    aggregator.fold(vectors, page_keys, ages=ages)
+    aggregator.cursor = 1700000000.25
+    aggregator.groupings = ["photo_title", "age_bucket"]
+
+    path = str(tmp_path / "checkpoint" / "mean_faces.npz")
+    aggregator.save(path)
+    loaded = MeanAggregator.load(path)
+
+    assert loaded.dim == DIM
+    assert set(loaded.sums) == set(keys)
+    for key in keys:
+        assert type(key) is type(next(k for k in loaded.sums if k == key))
+        np.testing.assert_array_equal(loaded.sums[key], aggregator.sums[key])
+        assert loaded.counts[key] == aggregator.counts[key]
+        assert loaded.age_sums[key] == aggregator.age_sums[key]
+        assert loaded.age_counts[key] == aggregator.age_counts[key]
+    assert loaded.cursor == 1700000000.25
+    assert loaded.groupings == ["photo_title", "age_bucket"]
+
+    # 다시 불러온 상태에 이어서 더해도 합이 맞다
+    loaded.fold(vectors, page_keys, ages=ages)
+    expected = plain_means(np.concatenate((vectors, vectors)), page_keys * 2, np.concatenate((ages, ages)))
+    assert_matches(loaded, expected)
+
+def test_save_load_empty(tmp_path):
+    path = str(tmp_path / "mean_faces.npz")
+    MeanAggregator(dim=DIM).save(path)
+    loaded = MeanAggregator.load(path)
+    assert loaded.sums == {} and loaded.cursor is None and loaded.groupings == []
+
+def test_load_missing_or_broken(tmp_path):
+    assert MeanAggregator.load(str(tmp_path / "missing.npz")) is None
+    broken = tmp_path / "broken.npz"
+    broken.write_bytes(b"not an npz")
+    assert MeanAggregator.load(str(broken)) is None
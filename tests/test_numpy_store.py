@@ -0,0 +1,213 @@
+import os
+import json
+import numpy as np
+import pytest
+from database.ann import IVFIndex
+from database.models import FaceEmbeddings
+from database.numpy_store import NumpyDatabase, encode_vectors, decode_vectors
+
+# 512 차원 정규화 벡터의 성분은 0.5 보다 훨씬 작다 (int8 이 clip 하지 않는 범위)
+DIM = 512
+
+def unit_rows(n, seed=0):
+    vectors = np.random.default_rng(seed).normal(size=(n, DIM)).astype(np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+def faces(vectors, start=0, **payload):
+    return [
+        FaceEmbeddings(id=f"face-{start + i}", photo_id=f"photo-{(start + i) % 3}", face_index=start + i,
+                       embedding=vector, **payload)
+        for i, vector in enumerate(vectors)
+    ]
+
+def payload_lines(path):
+    with open(os.path.join(path, "payload.jsonl"), encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+@pytest.mark.parametrize("dtype, tolerance", [("float32", 1e-6), ("float16", 1e-3), ("int8", 0.5 / 254 + 1e-6)])
+def test_round_trip_after_growth(tmp_path, dtype, tolerance):
+    vectors = unit_rows(50)
+    db = NumpyDatabase(str(tmp_path), dim=DIM, initial_capacity=4, dtype=dtype)
+    db.save_data_batch(faces(vectors[:30]))
+    db.save_data_batch(faces(vectors[30:], start=30, age=31.5))
+    db.close()
+
+    db = NumpyDatabase(str(tmp_path), dim=1, dtype="float32")
+    try:
+        # 생성할 때의 dim / dtype 이 meta.json 에서 다시 읽힌다
+        assert (db.dim, db.dtype, db.count) == (DIM, dtype, 50)
+        records = db.get_data(with_vectors=True)
+        assert [r.id for r in records] == [f"face-{i}" for i in range(50)]
+        assert records[40].age == 31.5 and records[10].age is None
+        assert records[7].face_index == 7 and records[7].photo_id == "photo-1"
+        np.testing.assert_allclose(np.stack([r.embedding for r in records]), vectors, atol=tolerance)
+        assert db.get_data_by_id("face-12", with_vectors=True).embedding.dtype == np.float32
+    finally:
+        db.close()
+
+def test_vectors_are_normalized(tmp_path):
+    db = NumpyDatabase(str(tmp_path), dim=DIM)
+    try:
+        db.save_data(FaceEmbeddings(id="a", embedding=np.full(DIM, 3.0)))
+        np.testing.assert_allclose(db.get_data_by_id("a", with_vectors=True).embedding, np.full(DIM, DIM ** -0.5), rtol=1e-6)
+    finally:
+        db.close()
+
+@pytest.mark.parametrize("dtype", ["float16", "int8"])
+def test_compact_dtypes_decode_close_to_float32(dtype):
+    vectors = unit_rows(200)
+    stored = encode_vectors(vectors, dtype)
+    assert stored.dtype == np.dtype(dtype)
+    decoded = decode_vectors(stored, dtype)
+    assert decoded.dtype == np.float32
+    # cosine 유사도가 거의 바뀌지 않아야 한다
+    assert np.abs((decoded * vectors).sum(axis=1) - 1).max() < 1e-2
+
+def test_int8_clips_large_components():
+    stored = encode_vectors(np.array([[0.9, -0.9, 0.1]], dtype=np.float32), "int8")
+    assert stored.tolist() == [[127, -127, 25]]
+
+def test_second_open_is_refused(tmp_path):
+    db = NumpyDatabase(str(tmp_path), dim=DIM)
+    try:
+        with pytest.raises(RuntimeError, match="already opened"):
+            NumpyDatabase(str(tmp_path), dim=DIM)
+    finally:
+        db.close()
+    # close 후에는 다시 열 수 있다
+    NumpyDatabase(str(tmp_path), dim=DIM).close()
+
+def test_upsert_overwrites_and_log_is_compacted(tmp_path):
+    vectors = unit_rows(5)
+    db = NumpyDatabase(str(tmp_path), dim=DIM)
+    for age in range(4):
+        db.save_data_batch(faces(vectors[::-1] if age % 2 else vectors, age=float(age)))
+        # 이전 줄이 절반을 넘기 전에 로그를 다시 쓴다
+        assert len(payload_lines(str(tmp_path))) <= 10
+    assert db.count == 5
+    db.close()
+
+    lines = payload_lines(str(tmp_path))
+    assert [line["id"] for line in lines] == [f"face-{i}" for i in range(5)]
+    assert {line["payload"]["age"] for line in lines} == {3.0}
+
+    db = NumpyDatabase(str(tmp_path), dim=DIM)
+    try:
+        records = db.get_data(with_vectors=True)
+        assert [r.age for r in records] == [3.0] * 5
+        # 마지막 upsert 는 vectors 를 뒤집어서 저장했다
+        np.testing.assert_allclose(np.stack([r.embedding for r in records]), vectors[::-1], atol=1e-6)
+    finally:
+        db.close()
+
+def test_replay_without_compaction(tmp_path):
+    vectors = unit_rows(4)
+    db = NumpyDatabase(str(tmp_path), dim=DIM, compact_ratio=0)
+    db.save_data_batch(faces(vectors, age=1.0))
+    db.save_data_batch(faces(vectors[:2], age=2.0))
+    assert len(payload_lines(str(tmp_path))) == 6
+    # 닫지 않고 (로그를 다시 쓰지 않고) 잠금만 푼 다음 다시 연다
+    db._payload_file.close()
+    db._lock_file.close()
+
+    db = NumpyDatabase(str(tmp_path), dim=DIM)
+    try:
+        assert [r.age for r in db.get_data()] == [2.0, 2.0, 1.0, 1.0]
+    finally:
+        db.close()
+    assert len(payload_lines(str(tmp_path))) == 4
+
+def test_filtered_scroll(tmp_path):
+    db = NumpyDatabase(str(tmp_path), dim=DIM, scroll_page_size=2)
+    try:
+        db.save_data_batch(faces(unit_rows(10)))
+        expected = [f"face-{i}" for i in range(10) if i % 3 == 1]
+        assert [r.id for r in db.get_data({"photo_id": "photo-1"})] == expected
+        assert [r.id for r in db.iter_data({"photo_id": "photo-1"})] == expected
+        assert [r.id for r in db.iter_data({"photo_id": "photo-1", "face_index": 4}, page_size=1)] == ["face-4"]
+        # 빈 값은 필터로 쓰지 않는다
+        assert len(db.get_data({"photo_id": None}, limit=3)) == 3
+        assert db.get_data({"photo_id": "missing"}) == []
+    finally:
+        db.close()
+
+def test_created_at_range(tmp_path, monkeypatch):
+    import database.numpy_store as numpy_store
+
+    clock = iter([100.0, 200.0, 300.0, 400.0])
+
+    class Clock:
+        @staticmethod
+        def now(tz=None):
+            timestamp = next(clock)
+            return type("Now", (), {"timestamp": lambda self: timestamp})()
+
+    monkeypatch.setattr(numpy_store, "datetime", Clock)
+    vectors = unit_rows(7)
+    db = NumpyDatabase(str(tmp_path), dim=DIM, scroll_page_size=2)
+    try:
+        db.save_data_batch(faces(vectors[:2]))               # created_at 100
+        db.save_data_batch(faces(vectors[2:4], start=2))     # 200
+        db.save_data(faces(vectors[4:5], start=4)[0])        # created_at 없음
+        db.save_data_batch(faces(vectors[5:], start=5))      # 300
+        db.save_data_batch(faces(vectors[:1]))               # face-0 을 400 으로 다시 저장
+
+        ids = [r.id for r in db.iter_data_after_date(150)]
+        assert ids == ["face-2", "face-3", "face-5", "face-6", "face-0"]
+        assert [r.id for r in db.get_data_after_date(0)] == ["face-1"] + ids
+        assert db.get_data_after_date(400) == []
+
+        pages = list(db.iter_vector_pages_after_date(150, fields=("id", "created_at", "face_index")))
+        assert [len(vectors_page) for vectors_page, _ in pages] == [2, 2, 1]
+        columns = {field: np.concatenate([page[field] for _, page in pages]) for field in pages[0][1]}
+        assert columns["id"].tolist() == ids
+        assert columns["created_at"].tolist() == [200.0, 200.0, 300.0, 300.0, 400.0]
+        np.testing.assert_allclose(np.concatenate([v for v, _ in pages]), vectors[[2, 3, 5, 6, 0]], atol=1e-6)
+    finally:
+        db.close()
+
+def test_exact_search(tmp_path):
+    vectors = unit_rows(40)
+    db = NumpyDatabase(str(tmp_path), dim=DIM)
+    try:
+        db.save_data_batch(faces(vectors))
+        scores = vectors @ vectors[3]
+        order = np.argsort(-scores, kind="stable")
+
+        results = db.search_similar_vectors_by_id("face-3", top_n=5)
+        assert [r.id for r in results] == [f"face-{i}" for i in order[:5]]
+        np.testing.assert_allclose([r.score for r in results], scores[order[:5]], atol=1e-5)
+
+        threshold = float(scores[order[6]])
+        results = db.search_vectors_by_min_score("face-3", threshold)
+        assert [r.id for r in results] == [f"face-{i}" for i in order[1:7]]
+        assert len(db.search_vectors_by_min_score("face-3", threshold, include_self=True, limit=3)) == 3
+        assert db.search_similar_vectors_by_id("missing") == []
+    finally:
+        db.close()
+
+def test_index_is_saved_and_stale_rows_are_reindexed(tmp_path):
+    vectors = unit_rows(59)
+    index = IVFIndex(dim=DIM, nlist=4, nprobe=4, train_size=40)
+    db = NumpyDatabase(str(tmp_path), dim=DIM, index=index, index_save_rows=0)
+    db.save_data_batch(faces(vectors[:50]))
+    assert db.index.trained and os.path.exists(os.path.join(str(tmp_path), "index.npz"))
+    saved_at = db.index.saved_at
+
+    # 저장 이후 : row 3 을 반대 방향 벡터 (다른 list) 로 갱신하고 row 50.. 을 추가한 뒤 index 를 저장하지 않고 닫는다
+    db.save_data_batch(faces(-vectors[3:4], start=3))
+    db.save_data_batch(faces(vectors[50:], start=50))
+    db.save_index = lambda: None
+    db.close()
+
+    db = NumpyDatabase(str(tmp_path), dim=DIM, index=IVFIndex(dim=DIM, nlist=4, nprobe=4, train_size=40))
+    try:
+        assert db.index.saved_at == saved_at and db.index.count == 59
+        stored = np.asarray(db._stored())
+        np.testing.assert_allclose(stored[3], -vectors[3], atol=1e-6)
+        expected = np.argmax(db.index.centroids @ stored.T, axis=0)
+        np.testing.assert_array_equal(db.index._assign[:db.count], expected)
+        # nprobe = nlist 이면 index 검색이 exact 검색과 같다
+        assert db.index_recall(k=5, num_queries=20) == 1.0
+    finally:
+        db.close()
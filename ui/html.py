@@ -1,7 +1,11 @@
 from jinja2 import Environment, FileSystemLoader, Template
 import os
 from app import storage
-from config import S3_IMAGE_BUCKET
+from config import S3_IMAGE_BUCKET, IMAGE_DERIVATIVES, IMAGE_DERIVATIVE_FORMAT
+from library.image_derivatives import parse_derivative_sizes, derivative_name, pick_derivative
+
+# 그래프 노드 이미지의 최대 표시 크기 (갤러리 150px, 이미지 패널 180px)
+NODE_IMAGE_PIXELS = 180
 
 def average_faces_html(data, url):
     template_str = """
@@ -40,11 +44,17 @@ def network_graph_html(data, main_node_id):
     nodes = []
     links = []
 
-    # Prepare nodes and links
-    for item in data:
-        file_name = f"{item.id}.jpg"
-        file_url = storage.get_file_url(S3_IMAGE_BUCKET, file_name)
-        
+    # Prepare nodes and links (URLs of all nodes in one call)
+    # 갤러리와 패널은 충분히 큰 가장 작은 derivative 를, 팝업은 원본을 사용한다
+    file_names = [f"{item.id}.jpg" for item in data]
+    thumb = pick_derivative(parse_derivative_sizes(IMAGE_DERIVATIVES), NODE_IMAGE_PIXELS)
+    thumb_names = [derivative_name(f, thumb, IMAGE_DERIVATIVE_FORMAT) for f in file_names] if thumb else []
+
+    urls = storage.get_file_urls(S3_IMAGE_BUCKET, file_names + thumb_names)
+    file_urls = urls[:len(file_names)]
+    thumb_urls = urls[len(file_names):] or file_urls
+
+    for item, file_url, thumb_url in zip(data, file_urls, thumb_urls):
         nodes.append({
             'id': item.id,
             'photo_id': item.photo_id,
@@ -53,7 +63,8 @@ def network_graph_html(data, main_node_id):
             'age': item.age,
             'score': item.score,
             'face_index': item.face_index if item.face_index else 0,
-            'file_url': file_url
+            'file_url': file_url,
+            'thumb_url': thumb_url
         })
 
     for item in data: